@@ -1,3 +1,18 @@
+from .ccxtarrow import *
+from .ccxtbars import *
 from .ccxtbroker import *
+from .ccxtdatastore import *
 from .ccxtfeed import *
+from .ccxtfutures import *
+from .ccxtmetrics import *
+from .ccxtorderbook import *
+from .ccxtpaper import *
+from .ccxtprofile import *
+from .ccxtreplay import *
+from .ccxtscheduler import *
+from .ccxtshared import *
+from .ccxtstate import *
 from .ccxtstore import *
+from .ccxttrace import *
+from .ccxttrail import *
+from .ccxtwatchdog import *
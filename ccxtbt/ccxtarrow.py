@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; py-indent-offset:4 -*-
+###############################################################################
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+from datetime import datetime
+
+import backtrader as bt
+from backtrader.feed import DataBase
+
+try:
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency, only needed by this module
+    pa = None
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_NUM = bt.date2num(_EPOCH)
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("pyarrow is needed to read and write Parquet/Arrow "
+                          "files: pip install pyarrow")
+
+
+def _file_format(path):
+    if path.endswith('.parquet'):
+        return 'parquet'
+    elif path.endswith(('.arrow', '.feather', '.ipc')):
+        return 'arrow'
+    raise ValueError("unknown columnar format for %s, expected a .parquet or "
+                     ".arrow file" % path)
+
+
+class CCXTArrowWriter(object):
+    '''Writes OHLCV candles or trades to a Parquet (``.parquet``) or Arrow
+    IPC (``.arrow``) file.
+
+    Rows are buffered and written in batches of ``batch_size`` rows, which
+    become the Parquet row groups or the IPC record batches ``CCXTArrowFeed``
+    later skips when they fall outside ``fromdate``/``todate``.
+
+    Columns are ``timestamp`` (milliseconds) followed by ``open, high, low,
+    close, volume`` for candles or ``price, amount`` for trades.
+    '''
+
+    Columns = {
+        'ohlcv': ('timestamp', 'open', 'high', 'low', 'close', 'volume'),
+        'trades': ('timestamp', 'price', 'amount'),
+    }
+
+    def __init__(self, path, kind='ohlcv', batch_size=65536):
+        _require_pyarrow()
+        self.path = path
+        self.format = _file_format(path)
+        self.batch_size = batch_size
+
+        names = self.Columns[kind]
+        self.schema = pa.schema([(names[0], pa.int64())] +
+                                [(name, pa.float64()) for name in names[1:]])
+        self._columns = [[] for _ in names]
+        self._writer = None
+
+    def write(self, row):
+        for column, value in zip(self._columns, row):
+            column.append(value)
+        if len(self._columns[0]) >= self.batch_size:
+            self.flush()
+
+    def _open(self):
+        if self.format == 'parquet':
+            self._writer = pq.ParquetWriter(self.path, self.schema)
+        else:
+            self._writer = pa.ipc.new_file(self.path, self.schema)
+
+    def flush(self):
+        if not self._columns[0]:
+            return
+
+        if self._writer is None:
+            self._open()
+
+        arrays = [pa.array(column, type=field.type)
+                  for column, field in zip(self._columns, self.schema)]
+        if self.format == 'parquet':
+            self._writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+        else:
+            self._writer.write_batch(pa.record_batch(arrays, schema=self.schema))
+
+        self._columns = [[] for _ in self._columns]
+
+    def close(self):
+        self.flush()
+        if self._writer is None:
+            self._open()  # leave a valid empty file
+        self._writer.close()
+
+
+class CCXTArrowFeed(DataBase):
+    '''Backtesting feed for the files written by ``CCXTArrowWriter``, a
+    drop-in replacement for ``CCXTFeed(historical=True)`` which never
+    touches the exchange.
+
+    ``dataname`` is the path of a ``.parquet`` or ``.arrow`` file. Only the
+    rows within ``fromdate``/``todate`` are read:
+
+      - Arrow IPC files are memory-mapped. Record batches outside the range
+        are skipped and the others are sliced without copying, the columns
+        being NumPy views on the mapped file
+      - Parquet files are streamed batch by batch with the date range
+        pushed down, so that row groups outside the range are not decoded
+
+    Either way only the batch being delivered is resident, so histories
+    larger than the available memory can be backtested. Files with trades
+    produce one bar per trade, like ``CCXTFeed`` with ``TimeFrame.Ticks``.
+    '''
+
+    def start(self):
+        DataBase.start(self)
+        _require_pyarrow()
+
+        since = until = None
+        if self.p.fromdate:
+            since = int((self.p.fromdate - _EPOCH).total_seconds() * 1000)
+        if self.p.todate:
+            until = int((self.p.todate - _EPOCH).total_seconds() * 1000)
+
+        self._batches = self._read_batches(self.p.dataname, since, until)
+        self._columns = None
+        self._idx = self._len = 0
+
+    def stop(self):
+        DataBase.stop(self)
+        self._batches = self._columns = None
+
+    def _read_batches(self, path, since, until):
+        if _file_format(path) == 'arrow':
+            reader = pa.ipc.open_file(pa.memory_map(path, 'r'))
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                if not batch.num_rows:
+                    continue
+
+                tstamps = batch.column(0).to_numpy()
+                lo = 0 if since is None else int(np.searchsorted(tstamps, since, 'left'))
+                hi = len(tstamps) if until is None else int(np.searchsorted(tstamps, until, 'right'))
+                if lo < hi:
+                    yield batch.slice(lo, hi - lo)
+                if hi < len(tstamps):
+                    break  # past todate
+        else:
+            dataset = ds.dataset(path, format='parquet')
+            condition = None
+            if since is not None:
+                condition = ds.field('timestamp') >= since
+            if until is not None:
+                before = ds.field('timestamp') <= until
+                condition = before if condition is None else condition & before
+
+            for batch in dataset.to_batches(filter=condition):
+                if batch.num_rows:
+                    yield batch
+
+    def _load(self):
+        while self._idx >= self._len:
+            batch = next(self._batches, None)
+            if batch is None:
+                return False
+
+            self._columns = [column.to_numpy() for column in batch.columns]
+            self._idx, self._len = 0, batch.num_rows
+
+        i = self._idx
+        self._idx += 1
+        columns = self._columns
+
+        # same resolution as CCXTFeed: milliseconds for trades, seconds for candles
+        if len(columns) == 3:  # trades
+            self.lines.datetime[0] = _EPOCH_NUM + columns[0][i] / 86400000.0
+            price = columns[1][i]
+            self.lines.open[0] = price
+            self.lines.high[0] = price
+            self.lines.low[0] = price
+            self.lines.close[0] = price
+            self.lines.volume[0] = columns[2][i]
+        else:
+            self.lines.datetime[0] = _EPOCH_NUM + (columns[0][i] // 1000) / 86400.0
+            self.lines.open[0] = columns[1][i]
+            self.lines.high[0] = columns[2][i]
+            self.lines.low[0] = columns[3][i]
+            self.lines.close[0] = columns[4][i]
+            self.lines.volume[0] = columns[5][i]
+
+        return True
+
+    def islive(self):
+        return False
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; py-indent-offset:4 -*-
+###############################################################################
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+from datetime import datetime, timedelta
+
+import backtrader as bt
+
+_EPOCH = datetime(1970, 1, 1)
+
+# Exchanges start weekly candles on Monday, the epoch was a Thursday
+_WEEK_OFFSET = 4 * 24 * 3600 * 1000
+
+_PERIODS = {
+    bt.TimeFrame.Seconds: 1000,
+    bt.TimeFrame.Minutes: 60 * 1000,
+    bt.TimeFrame.Days: 24 * 3600 * 1000,
+    bt.TimeFrame.Weeks: 7 * 24 * 3600 * 1000,
+}
+
+
+def timeframe_to_ms(timeframe, compression=1):
+    '''Returns the length in milliseconds of a fixed size bar. Months and
+    Years have no fixed length and raise ``ValueError``'''
+    try:
+        return _PERIODS[timeframe] * compression
+    except KeyError:
+        raise ValueError("time frame %s has no fixed length" %
+                         bt.TimeFrame.getname(timeframe))
+
+
+def _ms_to_datetime(tstamp):
+    return _EPOCH + timedelta(milliseconds=tstamp)
+
+
+def _datetime_to_ms(dtime):
+    return int((dtime - _EPOCH).total_seconds() * 1000)
+
+
+def bar_bounds(tstamp, timeframe, compression=1):
+    '''Returns ``(start, end)`` in milliseconds of the bar of the given
+    timeframe/compression which contains ``tstamp``. Bars are aligned the
+    way exchanges align their candles: on the epoch for intraday and daily
+    bars, on Monday for weekly bars and on the calendar for Months/Years'''
+    if timeframe in (bt.TimeFrame.Months, bt.TimeFrame.Years):
+        dtime = _ms_to_datetime(tstamp)
+        months = compression * (12 if timeframe == bt.TimeFrame.Years else 1)
+        index = dtime.year * 12 + dtime.month - 1
+        index -= index % months
+        start = datetime(index // 12, index % 12 + 1, 1)
+        index += months
+        end = datetime(index // 12, index % 12 + 1, 1)
+        return _datetime_to_ms(start), _datetime_to_ms(end)
+
+    period = timeframe_to_ms(timeframe, compression)
+    offset = _WEEK_OFFSET if timeframe == bt.TimeFrame.Weeks else 0
+    start = tstamp - (tstamp - offset) % period
+    return start, start + period
+
+
+class CCXTBarBuilder(object):
+    '''Incremental aggregation of trades into OHLCV bars.
+
+    Every trade updates the bar under construction in O(1). Completed bars
+    are returned as ``[timestamp, open, high, low, close, volume]`` lists,
+    the same layout ``fetch_ohlcv`` returns, with the timestamp being the
+    start of the bar.
+
+    Bar types:
+
+      - ``time``: bars of any ``timeframe``/``compression``, e.g. 10
+        seconds or 7 minutes, aligned like exchange candles
+      - ``volume``: a bar closes once the traded amount reaches ``size``
+      - ``ticks``: a bar closes after ``size`` trades
+      - ``value``: a bar closes once the traded value (price * amount)
+        reaches ``size``
+
+    Time bars are never reopened: a record older than the start of the bar
+    under construction (or the end of the last completed bar) arrived too
+    late, it is dropped and counted in ``late``.
+    '''
+
+    BarTypes = ('time', 'volume', 'ticks', 'value')
+
+    def __init__(self, timeframe=bt.TimeFrame.Minutes, compression=1,
+                 bar_type='time', size=None):
+        if bar_type not in self.BarTypes:
+            raise ValueError("unknown bar type %s, expected one of %s" %
+                             (bar_type, ', '.join(self.BarTypes)))
+
+        if bar_type != 'time' and not size:
+            raise ValueError("a size is needed for %s bars" % bar_type)
+
+        self.timeframe = timeframe
+        self.compression = compression
+        self.bar_type = bar_type
+        self.size = size
+
+        self._bar = None  # bar under construction
+        self._end = None  # end timestamp of a time bar under construction
+        self._floor = None  # records of time bars before it are late
+        self._fill = 0.0  # accumulated volume, ticks or value
+        self.late = 0  # late records dropped
+
+    def _open(self, tstamp, open_, high, low, close, volume):
+        self._bar = [tstamp, open_, high, low, close, volume]
+        if self.bar_type == 'time':
+            tstamp, self._end = bar_bounds(tstamp, self.timeframe, self.compression)
+            self._bar[0] = self._floor = tstamp
+
+    def _close(self):
+        bar, self._bar, self._fill = self._bar, None, 0.0
+        if self.bar_type == 'time':
+            self._floor = self._end
+        return bar
+
+    def _measure(self, price, volume, ticks):
+        if self.bar_type == 'volume':
+            return volume
+        elif self.bar_type == 'ticks':
+            return ticks
+        return price * volume
+
+    def update(self, tstamp, open_, high, low, close, volume, ticks=1):
+        '''Adds an OHLCV record (a single trade is a record where the four
+        prices are equal) and returns the bar it completes, if any'''
+        if self._floor is not None and tstamp < self._floor:
+            self.late += 1  # its bar is gone
+            return None
+
+        bar = self._bar
+        done = None
+
+        if bar is not None and self.bar_type == 'time' and tstamp >= self._end:
+            done = self._close()
+            bar = None
+
+        if bar is None:
+            self._open(tstamp, open_, high, low, close, volume)
+        else:
+            if high > bar[2]:
+                bar[2] = high
+            if low < bar[3]:
+                bar[3] = low
+            bar[4] = close
+            bar[5] += volume
+
+        if self.bar_type != 'time':
+            self._fill += self._measure(close, volume, ticks)
+            if self._fill >= self.size:
+                done = self._close()
+
+        return done
+
+    def add_trade(self, tstamp, price, amount):
+        '''Adds a trade and returns the bar it completes, if any'''
+        return self.update(tstamp, price, price, price, price, amount)
+
+    def flush(self, tstamp):
+        '''Returns the time bar under construction if ``tstamp`` (usually the
+        current time) is past its end, so that a bar is delivered at its
+        close instead of when the next trade arrives'''
+        if self._bar is not None and self.bar_type == 'time' and tstamp >= self._end:
+            return self._close()
+        return None
+
+    def pending(self):
+        '''Returns a copy of the bar under construction or ``None``'''
+        return list(self._bar) if self._bar is not None else None
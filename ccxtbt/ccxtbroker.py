@@ -22,21 +22,33 @@ from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 
 import collections
+import itertools
 import json
+import time
 
+import ccxt
 from backtrader import BrokerBase, OrderBase, Order
 from backtrader.position import Position
 from backtrader.utils.py3 import queue, with_metaclass
 
+from .ccxtprofile import profiled
+from .ccxtscheduler import CCXTOrderScheduler
 from .ccxtstore import CCXTStore
+from .ccxttrace import CCXTOrderTracer
+from .ccxttrail import CCXTTrailingStops
 
 
 class CCXTOrder(OrderBase):
+    # ccxt order fields kept by compact()
+    compact_keys = ('id', 'clientOrderId', 'symbol', 'type', 'side', 'amount', 'price',
+                    'status', 'filled', 'remaining', 'timestamp', 'datetime')
+
     def __init__(self, owner, data, ccxt_order):
         self.owner = owner
         self.data = data
         self.ccxt_order = ccxt_order
-        self.executed_fills = []
+        self.executed_fills = set()  # ids of the fills already executed
+        self.prior_size = 0.0  # size executed by the ccxt orders it replaced
         self.ordtype = self.Buy if ccxt_order['side'] == 'buy' else self.Sell
         self.size = float(ccxt_order['amount'])
 
@@ -44,12 +56,18 @@ class CCXTOrder(OrderBase):
         super(CCXTOrder, self).__init__()
         self.p.data = data # fix params data not defined
 
+    def compact(self):
+        '''Drops the raw exchange payload (``info``, ``trades`` ...) keeping
+        only the fields needed to identify the order'''
+        self.ccxt_order = dict((k, self.ccxt_order.get(k)) for k in self.compact_keys)
+
 class MetaCCXTBroker(BrokerBase.__class__):
     def __init__(cls, name, bases, dct):
         '''Class has already been created ... register'''
         # Initialize the class
         super(MetaCCXTBroker, cls).__init__(name, bases, dct)
-        CCXTStore.BrokerCls = cls
+        if dct.get('_register', True):
+            CCXTStore.BrokerCls = cls
 
 
 class CCXTBroker(with_metaclass(MetaCCXTBroker, BrokerBase)):
@@ -94,6 +112,98 @@ class CCXTBroker(with_metaclass(MetaCCXTBroker, BrokerBase)):
 
     Added new private_end_point method to allow using any private non-unified end point
 
+    Memory bounded live sessions:
+
+      - ``compact_orders`` (default: ``False``): once an order has been
+        processed its raw ccxt payload is replaced by a compact record, see
+        ``CCXTOrder.compact``
+      - ``order_history`` (default: ``None``): number of completed (or
+        canceled) orders kept referenced. Older ones are evicted, including
+        from the ``_orders`` list of the strategy which created them.
+        ``None`` keeps all of them
+
+    Order modification (``modify``):
+
+      - ``edit_amount`` (default: ``None``): the amount sent with a native
+        ``edit_order``. ``'total'`` (ccxt's unified meaning) for exchanges
+        amending the order in place under the same id, e.g. OKX or Bybit:
+        the filled part counts in the amount. ``'remaining'`` for exchanges
+        replacing it with a new order (new id), whose fills start over.
+        ``None`` learns it from the first edit: until then the remaining
+        amount is sent and, if the order turns out to be amended in place,
+        edited again with the total one
+
+    Bracket and OCO orders:
+
+      ``parent``/``transmit`` (e.g. ``buy_bracket``) and ``oco`` are
+      honoured. A bracket is sent when its last order is transmitted: if
+      the exchange supports ``createOrderWithTakeProfitAndStopLoss`` the
+      stop and limit children are attached to the parent and rest on the
+      exchange with it (a child the exchange did not list among the open
+      orders is then sent on its own), otherwise (and for a ``StopLimit``
+      stop) they are sent by ``next`` as soon as the parent completes. When an order of a one-cancels-others group (which
+      includes the children of a bracket) completes or is canceled the
+      others are canceled.
+
+    Trailing stops:
+
+      ``StopTrail`` and ``StopTrailLimit`` orders (``trailamount`` or
+      ``trailpercent``) are kept by the broker in a ``CCXTTrailingStops``
+      and trail the closes of their feed. Nothing is sent to the exchange
+      until a bar (or tick) crosses the trigger, then a market order
+      (``StopTrail``) or a limit order ``price - plimit`` beyond the trigger
+      (``StopTrailLimit``) is sent. Trailing stops not triggered yet are
+      not checkpointed with ``state`` and are lost on restart.
+
+    Fees:
+
+      Fills are executed with their ``fee`` as commission, converted to the
+      quote currency when paid in the base currency or in another asset
+      (e.g. an exchange token, priced with ``fetch_ticker``). Without a
+      ``fee`` the maker/taker rate of the account fee tier
+      (``fetch_trading_fees``, fetched once) or of the market is used.
+
+      - ``sync_balance`` (default: ``True``): fetch the balance after each
+        completed order. With ``False`` the cash is updated locally from
+        the fills and their fees
+
+    Latency tracing:
+
+      ``tracer`` (a ``CCXTOrderTracer``) timestamps with a monotonic clock
+      the submission, sending, exchange answer, fills, completion and
+      notification of every order, along with the exchange timestamps of
+      the order and its fills. ``tracer.trace(order)`` returns the trace of
+      an order and ``tracer.snapshot()`` the histograms of the spans per
+      symbol and order type
+
+    Client order ids:
+
+      - ``client_order_ids`` (default: ``True``): every order is sent with
+        a unique ``clientOrderId``, so that ``CCXTStore.create_order`` can
+        look up an order whose creation timed out instead of sending it
+        twice. This makes short timeouts and fast retries safe on the
+        order path. Turn it off for exchanges rejecting the param
+
+    Order rate:
+
+      - ``order_rate`` (default: ``None``): ``(orders, seconds)`` order rate
+        limit of the exchange, e.g. ``(50, 10.0)``. Orders and cancels are
+        then queued by a ``CCXTOrderScheduler`` and sent within that budget,
+        cancels first, then orders reducing a position, then new entries.
+        What exceeds the budget waits for the following ``next`` calls
+        (orders stay ``Created`` meanwhile) and canceling an order not sent
+        yet just drops it. ``None`` sends everything at once
+
+    Checkpointed resume:
+
+      - ``state`` (default: ``None``): path of a ``CCXTStateStore``
+        checkpoint file, usually shared with the feeds. The open orders
+        (id, executed fills) and the positions are saved whenever they
+        change. On restart they are restored before the first ``next``,
+        which reconciles them against the exchange with one
+        ``fetch_order`` per saved open order: fills missed while stopped
+        are executed and orders closed or canceled meanwhile notified
+
     '''
 
     order_types = {Order.Market: 'market',
@@ -111,7 +221,11 @@ class CCXTBroker(with_metaclass(MetaCCXTBroker, BrokerBase)):
             'value': 'canceled'}
     }
 
-    def __init__(self, broker_mapping=None, debug=False, **kwargs):
+    conversion_ttl = 60.0  # seconds a fee currency conversion rate is reused
+
+    def __init__(self, broker_mapping=None, debug=False, compact_orders=False,
+                 order_history=None, state=None, sync_balance=True, order_rate=None,
+                 client_order_ids=True, edit_amount=None, **kwargs):
         super(CCXTBroker, self).__init__()
 
         if broker_mapping is not None:
@@ -125,6 +239,7 @@ class CCXTBroker(with_metaclass(MetaCCXTBroker, BrokerBase)):
                 pass
 
         self.store = CCXTStore(**kwargs)
+        self.engine = self.store  # order endpoints, a local engine for paper trading
 
         self.currency = self.store.currency
 
@@ -137,13 +252,102 @@ class CCXTBroker(with_metaclass(MetaCCXTBroker, BrokerBase)):
 
         self.open_orders = list()
 
+        self.compact_orders = compact_orders
+        self.order_history = order_history
+        self.closed_orders = collections.deque()  # completed/canceled orders
+
+        self.state = self.store.get_state(state) if state else None
+        self._saved_orders = None  # checkpointed open orders to adopt
+
+        self.sync_balance = sync_balance
+        self._trading_fees = None  # account fee tiers, fetched once
+        self._conversions = {}  # (currency, quote) -> (rate, time)
+
+        if edit_amount not in (None, 'total', 'remaining'):
+            raise ValueError("edit_amount must be None, 'total' or 'remaining'")
+        self.edit_amount = edit_amount
+        self._edit_keeps_id = None  # learned from the first native edit
+
+        self._brackets = {}  # parent ref -> bracket orders until transmitted
+        self._children = {}  # parent ref -> children sent when it completes
+        self._ocos = {}  # order ref -> its one-cancels-others group
+        self.trailing = CCXTTrailingStops()  # client side trailing stops
+
+        # outbound orders and cancels, sent within the exchange order rate
+        self.scheduler = CCXTOrderScheduler(*order_rate) if order_rate else None
+        self._dispatching = False
+        self._outbound = None  # order of the action being dispatched
+
+        self.tracer = CCXTOrderTracer()  # order lifecycle latencies
+
         self.startingcash = self.store._cash
         self.startingvalue = self.store._value
 
         self.use_order_params = False
 
+        # unique across sessions: the prefix is the session start
+        self.client_order_ids = client_order_ids
+        self._client_prefix = 'bt%x' % int(time.time() * 1000)
+        self._client_ids = itertools.count(1)
+
         self.markets = self.store.load_markets() # no need to frequently update
 
+    def start(self):
+        super(CCXTBroker, self).start()
+        if self.state is not None:
+            self._restore()
+
+    def _restore(self):
+        '''Reloads the checkpointed positions. The open orders need the
+        datas to have a bar and are adopted by the first ``next``'''
+        saved = self.state.get('broker')
+        if not saved:
+            return
+
+        for symbol, (size, price) in saved['positions'].items():
+            self.positions[symbol].set(size, price)
+        self._saved_orders = saved['orders']
+
+    def _adopt(self):
+        '''Recreates the checkpointed open orders, which are then reconciled
+        against the exchange like any other open order'''
+        datas = dict((data.p.dataname, data) for data in self.cerebro.datas)
+        for saved_order in self._saved_orders:
+            data = datas.get(saved_order['ccxt_order']['symbol'])
+            if data is None:  # the symbol is no longer traded
+                continue
+
+            order = CCXTOrder(None, data, saved_order['ccxt_order'])
+            order.price = saved_order['ccxt_order']['price']
+            order.executed_fills = set(saved_order['executed_fills'])
+            order.prior_size = saved_order.get('prior_size', 0.0)
+            size, price, dt = saved_order['executed']
+            if size:
+                order.execute(dt, size, price,
+                              0, 0.0, 0.0,
+                              0, 0.0, 0.0,
+                              0.0, 0.0,
+                              0, 0.0)
+            self.open_orders.append(order)
+        self._saved_orders = None
+
+    def _checkpoint(self):
+        '''Saves the open orders and positions if a ``state`` is set'''
+        if self.state is None:
+            return
+
+        orders = []
+        for order in self.open_orders:
+            ccxt_order = dict((k, order.ccxt_order.get(k)) for k in CCXTOrder.compact_keys)
+            orders.append({'ccxt_order': ccxt_order,
+                           'executed_fills': sorted(order.executed_fills),
+                           'prior_size': order.prior_size,
+                           'executed': [order.executed.size, order.executed.price,
+                                        order.executed.dt]})
+        positions = dict((symbol, [pos.size, pos.price])
+                         for symbol, pos in self.positions.items() if pos.size)
+        self.state.put('broker', {'orders': orders, 'positions': positions})
+
     def get_balance(self):
         self.store.get_balance()
         self.cash = self.store._cash
@@ -192,12 +396,16 @@ class CCXTBroker(with_metaclass(MetaCCXTBroker, BrokerBase)):
 
     def get_notification(self):
         try:
-            return self.notifs.get(False)
+            order = self.notifs.get(False)
         except queue.Empty:
             return None
+        if order.status == Order.Completed:
+            self.tracer.mark(order, 'notified')
+        return order
 
     def notify(self, order):
-        self.notifs.put(order)
+        # a clone marks the pending executions, which the strategy turns into trades
+        self.notifs.put(order.clone())
 
     def sync_exchange_positions(self, datas=None):
 
@@ -217,11 +425,24 @@ class CCXTBroker(with_metaclass(MetaCCXTBroker, BrokerBase)):
             pos = pos.clone()
         return pos
 
+    @profiled('broker.next')
     def next(self):
         if self.debug:
             print('Broker next() called')
 
+        if self._saved_orders:
+            self._adopt()
+
+        if self.scheduler is not None:
+            self._dispatch()
+
+        if self.trailing.books:
+            self._trail_next()
+
         for o_order in list(self.open_orders):
+            if o_order not in self.open_orders:
+                continue  # canceled with its one-cancels-others group
+
             oID = o_order.ccxt_order['id']
 
             # Print debug before fetching so we know which order is giving an
@@ -230,18 +451,10 @@ class CCXTBroker(with_metaclass(MetaCCXTBroker, BrokerBase)):
                 print('Fetching Order ID: {}'.format(oID))
 
             # Get the order
-            ccxt_order = self.store.fetch_order(oID, o_order.data.p.dataname)
+            ccxt_order = self.engine.fetch_order(oID, o_order.data.p.dataname)
 
             # Check for new fills
-            if 'trades' in ccxt_order and ccxt_order['trades'] is not None:
-                for fill in ccxt_order['trades']:
-                    if fill not in o_order.executed_fills:
-                        o_order.execute(fill['datetime'], fill['amount'], fill['price'],
-                                        0, 0.0, 0.0,
-                                        0, 0.0, 0.0,
-                                        0.0, 0.0,
-                                        0, 0.0)
-                        o_order.executed_fills.append(fill['id'])
+            self._execute_fills(o_order, ccxt_order)
 
             if self.debug:
                 print(json.dumps(ccxt_order, indent=self.indent))
@@ -249,32 +462,151 @@ class CCXTBroker(with_metaclass(MetaCCXTBroker, BrokerBase)):
             # Check if the order is closed
             if ccxt_order[self.mappings['closed_order']['key']] == self.mappings['closed_order']['value']:
 
-                """
-                futures trading doesn't return trades inside orders, 
-                so update order execution in one run
-                """
-                if self.store.get_type() == 'future':
-                    o_order.execute(ccxt_order['datetime'], ccxt_order['amount'], ccxt_order['price'],
-                                    0, 0.0, 0.0,
-                                    0, 0.0, 0.0,
-                                    0.0, 0.0,
-                                    0, 0.0)
-
-                pos = self.getposition(o_order.data, clone=False)
-                pos.update(o_order.size, o_order.price)
+                # futures trading (and some exchanges) don't return trades
+                # inside orders, execute what the fills did not cover
+                self._execute_rest(o_order, ccxt_order)
                 o_order.completed()
-                self.notify(o_order)
+                self.tracer.mark(o_order, 'completed')
                 self.open_orders.remove(o_order)
-                self.get_balance()
+                self._release(o_order)
+                self.notify(o_order)
+                if self.sync_balance:
+                    self.get_balance()
+                self._done(o_order)
 
             # Manage case when an order is being Canceled from the Exchange
             #  from https://github.com/juancols/bt-ccxt-store/
             if ccxt_order[self.mappings['canceled_order']['key']] == self.mappings['canceled_order']['value']:
                 self.open_orders.remove(o_order)
                 o_order.cancel()
+                self.tracer.mark(o_order, 'canceled')
+                self._release(o_order)
                 self.notify(o_order)
-
-    def _submit(self, owner, data, exectype, side, amount, price, params):
+                self._done(o_order)
+
+        self._checkpoint()
+
+    def _execute_fills(self, order, ccxt_order):
+        '''Executes the fills of ``ccxt_order`` not executed yet'''
+        for fill in ccxt_order.get('trades') or []:
+            if fill['id'] not in order.executed_fills:
+                fee = self._fill_fee(order, fill, fill['amount'], fill['price'])
+                self._execute(order, fill['datetime'], fill['amount'], fill['price'], fee)
+                self.tracer.fill(order, fill.get('timestamp'))
+                order.executed_fills.add(fill['id'])
+
+    def _execute_rest(self, order, ccxt_order):
+        '''Executes the part of a closed order not covered by its fills, at
+        the average price of the order'''
+        filled = ccxt_order.get('filled') or ccxt_order['amount']
+        # what the replaced ccxt orders executed is not part of ``filled``
+        rest = float(filled) - (abs(order.executed.size) - order.prior_size)
+        if rest <= float(filled) * 1e-9:
+            return
+
+        price = ccxt_order.get('average') or ccxt_order['price']
+        # the fee of the order is only the fee of the rest without fills
+        fill = ccxt_order if not order.executed_fills else {}
+        fee = self._fill_fee(order, fill, rest, price)
+        self._execute(order, ccxt_order['datetime'], rest, price, fee)
+        self.tracer.fill(order, ccxt_order.get('lastTradeTimestamp'))
+
+    def _settle(self, order, ccxt_order):
+        '''Executes what ``ccxt_order``, canceled or replaced by ``modify``,
+        filled since it was last polled'''
+        self._execute_fills(order, ccxt_order)
+        if ccxt_order.get('filled'):
+            self._execute_rest(order, ccxt_order)
+
+    def _execute(self, order, dt, amount, price, fee):
+        '''Executes a fill updating the position, with ``fee`` as commission
+        split between the closed and opened parts'''
+        size = amount if order.isbuy() else -amount
+        pos = self.getposition(order.data, clone=False)
+        pprice_orig = pos.price
+        psize, pprice, opened, closed = pos.update(size, price)
+
+        comminfo = self.getcommissioninfo(order.data)
+        order.addcomminfo(comminfo)  # used by the strategy to update the trades
+        closedvalue = comminfo.getoperationcost(closed, pprice_orig)
+        openedvalue = comminfo.getoperationcost(opened, price)
+        closedcomm = fee * closed / size
+        openedcomm = fee - closedcomm
+        pnl = comminfo.profitandloss(-closed, pprice_orig, price)
+
+        order.execute(dt, size, price,
+                      closed, closedvalue, closedcomm,
+                      opened, openedvalue, openedcomm,
+                      0.0, pnl,
+                      psize, pprice)
+
+        if not self.sync_balance:
+            self.store._cash -= size * price + fee
+            self.store._value -= fee
+
+    def _fill_fee(self, order, fill, amount, price):
+        '''Fee of a fill in the quote currency: the ``fee`` (or ``fees``)
+        reported by the exchange or, without it, the maker/taker rate of the
+        symbol'''
+        fees = fill.get('fees') or [fill.get('fee')]
+        fees = [f for f in fees if f and f.get('cost') is not None]
+        symbol = order.data.p.dataname
+        if fees:
+            return sum(self._to_quote(symbol, float(f['cost']), f.get('currency'), price)
+                       for f in fees)
+
+        taker = order.ccxt_order.get('type') == self.order_types.get(Order.Market)
+        taker = fill.get('takerOrMaker', 'taker' if taker else 'maker') == 'taker'
+        return abs(amount) * price * self._fee_rate(symbol, taker)
+
+    def _fee_rate(self, symbol, taker):
+        '''Taker or maker rate of the account fee tier, fetched once, or of
+        the market metadata'''
+        if self._trading_fees is None:
+            self._trading_fees = {}
+            if self.store.exchange.has.get('fetchTradingFees'):
+                try:
+                    self._trading_fees = self.store.fetch_trading_fees()
+                except ccxt.BaseError:  # e.g. no credentials
+                    pass
+
+        fees = self._trading_fees.get(symbol) or self.markets.get(symbol, {})
+        return fees.get('taker' if taker else 'maker') or 0.0
+
+    def _to_quote(self, symbol, cost, currency, price):
+        '''Converts a fee paid in ``currency`` to the quote currency of
+        ``symbol``'''
+        market = self.markets[symbol]
+        if currency is None or currency == market['quote']:
+            return cost
+        if currency == market['base']:
+            return cost * price
+        return cost * self._conversion(currency, market['quote'])
+
+    def _conversion(self, currency, quote):
+        '''Price of ``currency`` in ``quote`` (e.g. of a fee paid in an
+        exchange token), cached ``conversion_ttl`` seconds'''
+        now = time.time()
+        rate, stamp = self._conversions.get((currency, quote), (None, 0.0))
+        if rate is not None and now - stamp < self.conversion_ttl:
+            return rate
+
+        rate = 0.0
+        direct, inverse = '%s/%s' % (currency, quote), '%s/%s' % (quote, currency)
+        if direct in self.markets:
+            rate = self.store.fetch_ticker(direct)['last'] or 0.0
+        elif inverse in self.markets:
+            last = self.store.fetch_ticker(inverse)['last']
+            rate = 1.0 / last if last else 0.0
+        elif self.debug:
+            print('No market to convert {} fees to {}'.format(currency, quote))
+
+        self._conversions[(currency, quote)] = (rate, now)
+        return rate
+
+    def _submit(self, owner, data, exectype, side, amount, price, params,
+                parent=None, transmit=True, oco=None, plimit=None,
+                trailamount=None, trailpercent=None):
         if amount == 0 or price == 0:
         # do not allow failing orders
             return None
@@ -291,94 +623,355 @@ class CCXTBroker(with_metaclass(MetaCCXTBroker, BrokerBase)):
             return None
 
         order_type = self.order_types.get(exectype) if exectype else 'market'
-        created = int(data.datetime.datetime(0).timestamp()*1000)
         # Extract CCXT specific params if passed to the order
         params = params['params'] if 'params' in params else params
-        if not self.use_order_params:
-            ret_ord = self.store.create_order(symbol=data.p.dataname, order_type=order_type, side=side,
-                                              amount=formatted_amount, price=formatted_price, params={})
-        else:
+
+        # not sent yet, ccxt_order is replaced by the exchange answer
+        order = CCXTOrder(owner, data, {'id': None, 'clientOrderId': self._client_order_id(),
+                                        'symbol': data.p.dataname, 'type': order_type,
+                                        'side': side, 'amount': formatted_amount,
+                                        'price': formatted_price, 'status': None})
+        order.exectype = exectype or Order.Market
+        order.price = formatted_price
+        order.ccxt_params = params  # exchange specific, see use_order_params
+        self.tracer.mark(order, 'submit')
+        if exectype in (Order.StopTrail, Order.StopTrailLimit):
+            if not (trailamount or trailpercent):
+                return None
+            order.trailamount = trailamount
+            order.trailpercent = trailpercent
+            # StopTrailLimit: distance kept between the trigger and the limit
+            order.limitoffset = price - plimit if price is not None and plimit is not None else 0.0
+
+        if parent is not None:
+            # bracket child, the bracket is sent with its last order
+            group = self._brackets[parent.ref]
+            group.append(order)
+            if transmit:
+                self._transmit(group)
+            return order
+
+        if not transmit:
+            # bracket parent, wait for the children
+            self._brackets[order.ref] = [order]
+            return order
+
+        if not self._send(order):
+            return None
+
+        if oco is not None:
+            self._link(oco, order)
+        return order
+
+    def _send(self, order, native=None):
+        '''Sends ``order`` to the exchange, with the ``native`` ccxt params
+        of an exchange bracket, and processes the answer. Returns ``False``
+        if it could not be sent'''
+        data = order.data
+        ccxt_order = order.ccxt_order
+        params = dict(native or {})
+        if order.exectype in (Order.StopTrail, Order.StopTrailLimit) and ccxt_order['type'] is None:
+            self._trail(order)  # sent by _trail_next once triggered
+            return True
+
+        if self.scheduler is not None and order is not self._outbound:
+            self.scheduler.push(self._priority(order), ('send', order, native))
+            self._dispatch()
+            return True
+
+        self.tracer.mark(order, 'send')
+        if ccxt_order.get('clientOrderId') is not None:
+            # lets the store resolve a timed out create without a duplicate
+            params['clientOrderId'] = ccxt_order['clientOrderId']
+        if self.use_order_params:
             try:
                 # all params are exchange specific: https://github.com/ccxt/ccxt/wiki/Manual#custom-order-params
-                params['clientOrderId'] = created  # Add timestamp of order creation for backtesting
-                ret_ord = self.store.create_order(symbol=data.p.dataname, order_type=order_type, side=side,
-                                                  amount=formatted_amount, price=formatted_price, params=params)
+                params.update(order.ccxt_params)
+                ret_ord = self.engine.create_order(symbol=data.p.dataname, order_type=ccxt_order['type'],
+                                                   side=ccxt_order['side'], amount=ccxt_order['amount'],
+                                                   price=ccxt_order['price'], params=params)
             except:
                 # save some API calls after failure
                 self.use_order_params = False
-                return None
+                return False
+        else:
+            ret_ord = self.engine.create_order(symbol=data.p.dataname, order_type=ccxt_order['type'],
+                                               side=ccxt_order['side'], amount=ccxt_order['amount'],
+                                               price=ccxt_order['price'], params=params)
 
         # bug fix: there is a chance create_order returned with a closed order,\
         # or open order with trades, re-fetch order may lose trades \
-        # old way:
-        # _order = self.store.fetch_order(ret_ord['id'], data.p.dataname)
-        # order = CCXTOrder(owner, data, _order)
-
-        # new way:
-        order = CCXTOrder(owner, data, ret_ord)
+        # so the answer itself is processed
+        if not ret_ord.get('clientOrderId'):
+            ret_ord['clientOrderId'] = params.get('clientOrderId')
+        order.ccxt_order = ret_ord
         order.price = ret_ord['price']
         order.dt = ret_ord['datetime']
+        self.tracer.ack(order, ret_ord)
 
         # Check for new fills
-        if 'trades' in ret_ord and ret_ord['trades'] is not None:
-            for fill in ret_ord['trades']:
-                if fill not in order.executed_fills:
-                    order.execute(fill['datetime'], fill['amount'], fill['price'],
-                                    0, 0.0, 0.0,
-                                    0, 0.0, 0.0,
-                                    0.0, 0.0,
-                                    0, 0.0)
-                    order.executed_fills.append(fill['id'])
+        self._execute_fills(order, ret_ord)
 
         if self.debug:
-            log.debug(json.dumps(ret_ord, indent=self.indent))
+            print(json.dumps(ret_ord, indent=self.indent))
 
         # Check if the order is closed
         if ret_ord[self.mappings['closed_order']['key']] == self.mappings['closed_order']['value']:
 
-            """
-             futures trading doesn't return trades inside orders, 
-             so update order execution in one run
-             """
-            if self.store.get_type() == 'future':
-                order.execute(ret_ord['datetime'], ret_ord['amount'], ret_ord['price'],
-                                0, 0.0, 0.0,
-                                0, 0.0, 0.0,
-                                0.0, 0.0,
-                                0, 0.0)
-
-            pos = self.getposition(order.data, clone=False)
-            pos.update(order.size, order.price)
+            # futures trading (and some exchanges) don't return trades
+            # inside orders, execute what the fills did not cover
+            self._execute_rest(order, ret_ord)
             order.completed()
+            self.tracer.mark(order, 'completed')
+            self._release(order)
             self.notify(order)
-            self.get_balance()
-            return order # this order is not added into open order queue
+            if self.sync_balance:
+                self.get_balance()
+            self._done(order)
+            self._checkpoint()
+            return True # this order is not added into open order queue
 
         # if not closd, add into open order queue
         self.open_orders.append(order)
+        if self.compact_orders:
+            order.compact()
 
         self.notify(order)
-        return order
+        self._checkpoint()
+        return True
+
+    def _trail(self, order):
+        '''Registers a trailing stop, its reference being its price or the
+        last close'''
+        data = order.data
+        reference = order.price if order.price is not None else data.close[0]
+        self.trailing.add(data.p.dataname, order.ccxt_order['side'], reference, order,
+                          trailamount=order.trailamount, trailpercent=order.trailpercent)
+
+    def _trail_next(self):
+        '''Updates the trailing stops with the current bar of their feeds and
+        sends a market (``StopTrail``) or limit (``StopTrailLimit``) order
+        for each crossed trigger'''
+        datas = dict((data.p.dataname, data) for data in self.cerebro.datas)
+        for symbol in list(self.trailing.books):
+            data = datas.get(symbol)
+            if data is None or not len(data):
+                continue
+
+            for order, trigger in self.trailing.update(symbol, data.high[0], data.low[0],
+                                                       data.close[0]):
+                if not order.alive():
+                    continue  # canceled meanwhile
+
+                if order.exectype == Order.StopTrail:
+                    order_type, price = self.order_types[Order.Market], None
+                else:
+                    order_type = self.order_types[Order.Limit]
+                    price = self.store.price_to_precision(symbol, trigger - order.limitoffset)
+                order.ccxt_order = dict(order.ccxt_order, type=order_type, price=price)
+                order.price = price
+                if not self._send(order):
+                    order.reject()
+                    self.notify(order)
+                    self._done(order)
+
+    def _client_order_id(self):
+        '''New unique client order id, ``None`` if ``client_order_ids`` is
+        off'''
+        if not self.client_order_ids:
+            return None
+        # alphanumeric, some exchanges (e.g. OKX clOrdId) reject anything else
+        return '%s%d' % (self._client_prefix, next(self._client_ids))
+
+    def _priority(self, order):
+        '''Scheduling priority of sending ``order``: orders reducing the
+        position before new entries'''
+        if order.ccxt_params.get('reduceOnly'):
+            return CCXTOrderScheduler.REDUCE
+        pos = self.positions[order.data.p.dataname].size
+        if pos and (pos > 0) != order.isbuy() and abs(order.size) <= abs(pos):
+            return CCXTOrderScheduler.REDUCE
+        return CCXTOrderScheduler.ENTRY
+
+    def _dispatch(self):
+        '''Sends the queued actions the order rate allows, the others wait
+        for the next call. Actions throttled by the exchange are queued
+        again and the scheduler pauses for a period'''
+        if self._dispatching:
+            return  # queued by an action being dispatched
+        self._dispatching = True
+        try:
+            # throttled actions are re-queued here, not retried by the store
+            with self.store.raising(ccxt.DDoSProtection, ccxt.RateLimitExceeded):
+                self._dispatch_actions()
+        finally:
+            self._dispatching = False
+
+    def _dispatch_actions(self):
+        while True:
+            action = self.scheduler.pop()
+            if action is None:
+                break
+
+            kind, order = action[0], action[1]
+            self._outbound = order
+            try:
+                if kind == 'cancel':
+                    if order in self.open_orders:
+                        try:
+                            self._cancel(order)
+                        except (ccxt.OrderNotFound, ccxt.InvalidOrder):
+                            pass  # closed meanwhile, seen by the next poll
+                elif kind == 'modify':
+                    self._modify(order, action[2], action[3])
+                elif order.alive() and not self._send(order, action[2]):
+                    order.reject()
+                    self.notify(order)
+                    self._done(order)
+            except (ccxt.DDoSProtection, ccxt.RateLimitExceeded):
+                priority = CCXTOrderScheduler.CANCEL if kind == 'cancel' else self._priority(order)
+                self.scheduler.push(priority, action, cost=action[4] if kind == 'modify' else 1)
+                self.scheduler.pause()
+            finally:
+                self._outbound = None
+
+    def _link(self, oco, order):
+        '''Adds ``order`` to the one-cancels-others group of ``oco``'''
+        group = self._ocos.setdefault(oco.ref, [oco])
+        group.append(order)
+        self._ocos[order.ref] = group
+
+    def _transmit(self, group):
+        '''Sends a bracket: the parent order, with the children attached if
+        the exchange supports take profit and stop loss orders, otherwise
+        the children are sent once the parent completes'''
+        parent, children = group[0], group[1:]
+        del self._brackets[parent.ref]
+        for child in children[1:]:
+            self._link(children[0], child)
+
+        # the attached stop loss is a stop market order, a StopLimit child
+        # keeps its limit by being sent on its own
+        stops = [c for c in children if c.exectype == Order.Stop]
+        limits = [c for c in children if c.exectype == Order.Limit]
+        native = None
+        if len(stops) == 1 and len(limits) == 1 and len(children) == 2 and \
+                self.engine.has('createOrderWithTakeProfitAndStopLoss'):
+            native = {'stopLoss': {'triggerPrice': stops[0].price},
+                      'takeProfit': {'triggerPrice': limits[0].price,
+                                     'price': limits[0].price}}
+            for child in children:
+                child.native = True
+
+        self._children[parent.ref] = children
+        if not self._send(parent, native):
+            parent.reject()
+            self.notify(parent)
+            self._done(parent)
+
+    def _done(self, order):
+        '''Completed, canceled or rejected ``order``: activates or cancels
+        its bracket children and cancels its one-cancels-others group'''
+        children = self._children.pop(order.ref, [])
+        if order.status == Order.Completed:
+            if children and getattr(children[0], 'native', False):
+                self._adopt_children(order, children)
+            else:
+                for child in children:  # they rest on the exchange from now on
+                    if child.alive() and not self._send(child):
+                        child.reject()
+                        self.notify(child)
+                        self._done(child)
+        else:
+            for child in children:
+                self._ocos.pop(child.ref, None)
+                if child.alive():
+                    child.cancel()
+                    self.notify(child)
+
+        group = self._ocos.pop(order.ref, None)
+        for other in group or []:
+            self._ocos.pop(other.ref, None)
+            if other is order or not other.alive():
+                continue
+            if other in self.open_orders:
+                try:
+                    self.cancel(other)
+                except (ccxt.OrderNotFound, ccxt.InvalidOrder):
+                    pass  # closed meanwhile, seen by the next poll
+            elif other.ccxt_order['id'] is None:
+                self.cancel(other)
+
+    def _adopt_children(self, parent, children):
+        '''Tracks the take profit and stop loss orders created by the
+        exchange with ``parent``, found among the open orders by side and
+        price. Those not found (e.g. not created, or attached to the
+        position and not listed) are sent on their own like the children
+        of an emulated bracket, rather than left untracked'''
+        symbol = parent.data.p.dataname
+        open_orders = [o for o in self.engine.fetch_open_orders(symbol)
+                       if o['id'] != parent.ccxt_order['id']]
+        missing = []
+        for child in children:
+            for ccxt_order in open_orders:
+                prices = (ccxt_order.get('price'), ccxt_order.get('triggerPrice'),
+                          ccxt_order.get('stopPrice'))
+                if ccxt_order['side'] == child.ccxt_order['side'] and child.price in prices:
+                    open_orders.remove(ccxt_order)
+                    child.ccxt_order = ccxt_order
+                    self.open_orders.append(child)
+                    self.notify(child)
+                    break
+            else:
+                missing.append(child)
+
+        for child in missing:
+            if child.alive() and not self._send(child):
+                child.reject()
+                self.notify(child)
+                self._done(child)
 
     def buy(self, owner, data, size, price=None, plimit=None,
             exectype=None, valid=None, tradeid=0, oco=None,
             trailamount=None, trailpercent=None,
-            **kwargs):
-        del kwargs['parent']
-        del kwargs['transmit']
-        return self._submit(owner, data, exectype, 'buy', size, price, kwargs)
+            parent=None, transmit=True, **kwargs):
+        return self._submit(owner, data, exectype, 'buy', size, price, kwargs,
+                            parent=parent, transmit=transmit, oco=oco, plimit=plimit,
+                            trailamount=trailamount, trailpercent=trailpercent)
 
     def sell(self, owner, data, size, price=None, plimit=None,
              exectype=None, valid=None, tradeid=0, oco=None,
              trailamount=None, trailpercent=None,
-             **kwargs):
-        del kwargs['parent']
-        del kwargs['transmit']
-        return self._submit(owner, data, exectype, 'sell', size, price, kwargs)
+             parent=None, transmit=True, **kwargs):
+        return self._submit(owner, data, exectype, 'sell', size, price, kwargs,
+                            parent=parent, transmit=transmit, oco=oco, plimit=plimit,
+                            trailamount=trailamount, trailpercent=trailpercent)
 
     def cancel(self, order):
 
         oID = order.ccxt_order['id']
+        if oID is None:
+            # not sent: part of a bracket waiting for its parent, queued by
+            # the scheduler or a trailing stop not triggered
+            if self.scheduler is not None:
+                self.scheduler.discard(order)
+            if order.exectype in (Order.StopTrail, Order.StopTrailLimit):
+                self.trailing.remove(order.data.p.dataname, order)
+            if order.alive():
+                order.cancel()
+                self.notify(order)
+                self._done(order)
+            return order
+
+        if self.scheduler is not None and order is not self._outbound:
+            self.scheduler.push(CCXTOrderScheduler.CANCEL, ('cancel', order))
+            self._dispatch()
+            return order
+
+        return self._cancel(order)
+
+    def _cancel(self, order):
+        oID = order.ccxt_order['id']
 
         if self.debug:
             print('Broker cancel() called')
@@ -386,7 +979,7 @@ class CCXTBroker(with_metaclass(MetaCCXTBroker, BrokerBase)):
 
         # check first if the order has already been filled otherwise an error
         # might be raised if we try to cancel an order that is not open.
-        ccxt_order = self.store.fetch_order(oID, order.data.p.dataname)
+        ccxt_order = self.engine.fetch_order(oID, order.data.p.dataname)
 
         if self.debug:
             print(json.dumps(ccxt_order, indent=self.indent))
@@ -394,7 +987,7 @@ class CCXTBroker(with_metaclass(MetaCCXTBroker, BrokerBase)):
         if ccxt_order[self.mappings['closed_order']['key']] == self.mappings['closed_order']['value']:
             return order
 
-        ccxt_order = self.store.cancel_order(oID, order.data.p.dataname)
+        ccxt_order = self.engine.cancel_order(oID, order.data.p.dataname)
 
         if self.debug:
             print(json.dumps(ccxt_order, indent=self.indent))
@@ -404,16 +997,146 @@ class CCXTBroker(with_metaclass(MetaCCXTBroker, BrokerBase)):
         if ccxt_order[self.mappings['canceled_order']['key']] == self.mappings['canceled_order']['value']:
             self.open_orders.remove(order)
             order.cancel()
+            self.tracer.mark(order, 'canceled')
+            self._release(order)
             self.notify(order)
+            self._done(order)
+            self._checkpoint()
+        return order
+
+    def modify(self, order, price=None, size=None):
+        '''Changes the ``price`` and/or the total ``size`` of an open order.
+
+        The order is edited with ``edit_order`` if the exchange implements
+        it natively (ccxt's emulated ``editOrder`` resends the full amount),
+        sending the total or the remaining size, see ``edit_amount``.
+        Otherwise the order is canceled and the remaining size sent again
+        at the new price. Either way the backtrader order stays the same
+        and the fills of a replaced exchange order are executed before its
+        replacement takes over. With ``order_rate`` the modification is
+        queued like orders and cancels (a later one of the same order
+        replacing it) and counts as many actions as it sends requests.
+        Returns ``None`` if the order is no longer open or the new values
+        do not meet the exchange limits'''
+        if order not in self.open_orders:
+            return None
+
+        symbol = order.data.p.dataname
+        amount = abs(order.size) if size is None else abs(size)
+        price = order.price if price is None else price
+        formatted_amount = self.store.amount_to_precision(symbol, amount)
+        formatted_price = self.store.price_to_precision(symbol, price) if price is not None else None
+
+        executed = abs(order.executed.size)
+        if not self.check_exchange_limit(order.data, formatted_amount - executed, formatted_price,
+                                         reserved=self._reserved(order)):
+            return None
+
+        if self.scheduler is not None:
+            if self.engine.has('editOrder', native=True):
+                # the learning edit may have to be sent again
+                learning = self.edit_amount is None and self._edit_keeps_id is None
+                cost = 2 if learning and executed else 1
+            else:
+                cost = 2  # cancel and create
+            self.scheduler.push(self._priority(order),
+                                ('modify', order, formatted_amount, formatted_price, cost),
+                                cost=cost, replace=True)
+            self._dispatch()
+            return order
+
+        return self._modify(order, formatted_amount, formatted_price)
+
+    def _modify(self, order, amount, formatted_price):
+        '''Sends the modification of ``order`` to the total ``amount`` and
+        ``formatted_price``'''
+        if order not in self.open_orders:
+            return None  # closed or canceled while queued
+
+        symbol = order.data.p.dataname
+        ccxt_order = order.ccxt_order
+        formatted_amount = amount
+        executed = abs(order.executed.size)
+        if self.engine.has('editOrder', native=True):
+            keeps_id = {'total': True, 'remaining': False}.get(self.edit_amount,
+                                                               self._edit_keeps_id)
+            remaining = self.store.amount_to_precision(symbol, amount - executed)
+            ret_ord = self.engine.edit_order(ccxt_order['id'], symbol, ccxt_order['type'],
+                                             ccxt_order['side'],
+                                             formatted_amount if keeps_id else remaining,
+                                             formatted_price)
+            kept = ret_ord['id'] == ccxt_order['id']
+            if self.edit_amount is None:
+                if keeps_id is None and kept and executed:
+                    # amended in place, the filled part counts in the amount
+                    ret_ord = self.engine.edit_order(ccxt_order['id'], symbol,
+                                                     ccxt_order['type'], ccxt_order['side'],
+                                                     formatted_amount, formatted_price)
+                self._edit_keeps_id = kept
+            if not kept:  # replaced by a new exchange order
+                self._settle(order, self.engine.fetch_order(ccxt_order['id'], symbol))
+        else:
+            # cancel-replace: the fills done before the cancel are kept
+            ret_ord = self.engine.cancel_order(ccxt_order['id'], symbol)
+            if ret_ord.get('filled') is None:  # some exchanges only acknowledge
+                ret_ord = self.engine.fetch_order(ccxt_order['id'], symbol)
+            self._settle(order, ret_ord)
+            if ret_ord[self.mappings['canceled_order']['key']] != self.mappings['canceled_order']['value']:
+                return order  # filled meanwhile, completed by next
+
+            remaining = self.store.amount_to_precision(symbol, amount - abs(order.executed.size))
+            client_id = self._client_order_id()
+            params = {'clientOrderId': client_id} if client_id is not None else {}
+            ret_ord = self.engine.create_order(symbol=symbol, order_type=ccxt_order['type'],
+                                               side=ccxt_order['side'], amount=remaining,
+                                               price=formatted_price, params=params)
+
+        if ret_ord['id'] != ccxt_order['id']:
+            order.prior_size = abs(order.executed.size)
+        order.ccxt_order = ret_ord
+        order.size = formatted_amount if order.isbuy() else -formatted_amount
+        order.created.size = order.size
+        order.executed.remsize = order.size - order.executed.size
+        order.price = order.created.price = formatted_price
+        self._execute_fills(order, ret_ord)
+        if self.compact_orders:
+            order.compact()
+
+        self._checkpoint()
         return order
 
+    def _release(self, order):
+        '''Applies the memory policy to an order which is no longer open'''
+        if self.compact_orders:
+            order.compact()
+
+        if self.order_history is None:
+            return
+
+        self.closed_orders.append(order)
+        while len(self.closed_orders) > self.order_history:
+            evicted = self.closed_orders.popleft()
+            orders = getattr(evicted.owner, '_orders', None)
+            if orders is not None:
+                # one entry (a clone) per notification of the order
+                orders[:] = [o for o in orders if o.ref != evicted.ref]
+
     def get_orders_open(self, safe=False):
-        return self.store.fetch_open_orders()
+        return self.engine.fetch_open_orders()
+
+    def _reserved(self, order):
+        '''Cash locked on the exchange by the rest of an open buy order,
+        which the free balance of ``get_cash`` excludes'''
+        if not order.isbuy():
+            return 0.0
+        price = order.price if order.price is not None else order.data.close[0]
+        return abs(order.executed.remsize) * price
 
-    def check_exchange_limit(self, data, amount, price):
+    def check_exchange_limit(self, data, amount, price, reserved=0.0):
         '''
         https://github.com/ccxt/ccxt/wiki/Manual#precision-and-limits
-        check exchange limit met before issue an order
+        check exchange limit met before issue an order, ``reserved`` being
+        the cash already locked by the order being modified
 
         Order amount >= limits['amount']['min']
         Order amount <= limits['amount']['max']
@@ -455,7 +1178,7 @@ class CCXTBroker(with_metaclass(MetaCCXTBroker, BrokerBase)):
             print(f"{symbol} ORDER NOT SENT: VALUE({cost} EXCEED THE TOTAL PORTFOLIO VALUE({value}))")
             return False
 
-        cash = self.get_cash()
+        cash = self.get_cash() + reserved
         if cost >= cash:
             print(f"{symbol} ORDER NOT SENT: VALUE({cost} EXCEED THE REMAINING CASH({cash}))")
             return False
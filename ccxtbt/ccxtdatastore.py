@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; py-indent-offset:4 -*-
+###############################################################################
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import csv
+import io
+import os
+
+from .ccxtarrow import CCXTArrowWriter
+
+
+class CCXTDataStore(object):
+    '''Local store of downloaded OHLCV candles.
+
+    Candles are kept in one CSV file per exchange, symbol and granularity::
+
+      <root>/<exchange>/<BASE_QUOTE>/<granularity>.csv
+
+    with a ``timestamp,open,high,low,close,volume`` header and ascending
+    millisecond timestamps, so that a download can resume from the last
+    stored candle.
+
+    The candles are read by ``CCXTFeed`` (``datastore`` param), replayed by
+    ``CCXTReplayExchange.from_datastore`` or exported to a Parquet/Arrow
+    file for ``CCXTArrowFeed`` (needs ``pyarrow``).
+    '''
+
+    Header = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, exchange, symbol, granularity, extension='csv'):
+        symbol = symbol.replace('/', '_').replace(':', '-')
+        return os.path.join(self.root, exchange, symbol, '%s.%s' % (granularity, extension))
+
+    def last_timestamp(self, exchange, symbol, granularity):
+        '''Returns the timestamp of the last stored candle or ``None``'''
+        path = self.path(exchange, symbol, granularity)
+        if not os.path.exists(path):
+            return None
+
+        # only the tail of the file is read
+        with open(path, 'rb') as f:
+            f.seek(0, io.SEEK_END)
+            size = f.tell()
+            f.seek(max(0, size - 4096))
+            lines = f.read().splitlines()
+
+        for line in reversed(lines):
+            field = line.split(b',', 1)[0]
+            if field.isdigit():
+                return int(field)
+        return None
+
+    def append(self, exchange, symbol, granularity, rows):
+        '''Appends the candles newer than the last stored one. Returns the
+        number of candles written'''
+        path = self.path(exchange, symbol, granularity)
+        last_ts = self.last_timestamp(exchange, symbol, granularity)
+        rows = [r for r in rows if last_ts is None or r[0] > last_ts]
+        if not rows:
+            return 0
+
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        new = not os.path.exists(path)
+        with open(path, 'a', newline='') as f:
+            writer = csv.writer(f)
+            if new:
+                writer.writerow(self.Header)
+            writer.writerows(rows)
+        return len(rows)
+
+    def read(self, exchange, symbol, granularity, since=None, until=None):
+        '''Yields the stored candles as ``[timestamp, open, high, low, close,
+        volume]`` lists with ``since <= timestamp < until``'''
+        path = self.path(exchange, symbol, granularity)
+        if not os.path.exists(path):
+            return
+
+        with open(path, newline='') as f:
+            reader = csv.reader(f)
+            next(reader, None)  # header
+            for row in reader:
+                tstamp = int(row[0])
+                if since is not None and tstamp < since:
+                    continue
+                if until is not None and tstamp >= until:
+                    break
+                yield [tstamp] + [float(x) for x in row[1:]]
+
+    def export(self, exchange, symbol, granularity, path, since=None, until=None):
+        '''Writes the stored candles to the ``.parquet`` or ``.arrow`` file
+        ``path`` with ``CCXTArrowWriter``. Returns the number of candles
+        written'''
+        writer = CCXTArrowWriter(path)
+        count = 0
+        for row in self.read(exchange, symbol, granularity, since, until):
+            writer.write(row)
+            count += 1
+        writer.close()
+        return count
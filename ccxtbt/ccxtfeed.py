@@ -28,9 +28,14 @@ from datetime import datetime
 
 import backtrader as bt
 from backtrader.feed import DataBase
-from backtrader.utils.py3 import with_metaclass
+from backtrader.utils.py3 import string_types, with_metaclass
 
+from .ccxtarrow import CCXTArrowWriter
+from .ccxtbars import CCXTBarBuilder, bar_bounds, timeframe_to_ms
+from .ccxtdatastore import CCXTDataStore
+from .ccxtprofile import profiled
 from .ccxtstore import CCXTStore
+from .ccxtwatchdog import CCXTFreshness
 
 
 class MetaCCXTFeed(DataBase.__class__):
@@ -53,8 +58,98 @@ class CCXTFeed(with_metaclass(MetaCCXTFeed, DataBase)):
         The standard data feed parameters ``fromdate`` and ``todate`` will be
         used as reference.
       - ``backfill_start`` (default: ``True``)
-        Perform backfilling at the start. The maximum possible historical data
-        will be fetched in a single request.
+        Perform backfilling at the start when no ``fromdate`` is given: the
+        largest minimum period of the strategies using the feed plus
+        ``backfill_margin`` candles are fetched, in as few requests as the
+        exchange allows, before going live. The indicators are then valid
+        on the first live bar. Only for exchange candles, use ``fromdate``
+        with ticks, ``bar_type`` or ``base_timeframe``.
+      - ``backfill_margin`` (default: ``2``)
+        Candles fetched on top of the minimum period by ``backfill_start``.
+      - ``trades_limit`` (default: ``None``)
+        Maximum number of trades requested per ``fetch_trades`` call when the
+        feed runs with ``TimeFrame.Ticks``. ``None`` uses the exchange default.
+      - ``trades_dedup`` (default: ``1000``)
+        Number of recently seen trade ids kept to discard the overlapping
+        trades returned when polling from the last seen timestamp.
+      - ``bar_type`` (default: ``None``)
+        Build the bars locally from the trade stream instead of fetching the
+        exchange candles. One of ``time`` (any ``timeframe``/``compression``,
+        e.g. 10 seconds or 7 minutes), ``volume``, ``ticks`` or ``value``.
+        See ``CCXTBarBuilder``.
+      - ``bar_size`` (default: ``None``)
+        Amount, number of trades or traded value closing a ``volume``,
+        ``ticks`` or ``value`` bar.
+      - ``bar_grace`` (default: ``0.0``)
+        Seconds a ``time`` bar built from trades waits after its close for
+        the trades published late. Trades arriving after the bar was
+        delivered are dropped (see ``CCXTBarBuilder.late``).
+      - ``base_timeframe`` (default: ``None``)
+        Derive the bars of the feed's ``timeframe``/``compression`` from the
+        exchange candles of ``base_timeframe``/``base_compression``. The
+        base candles are fetched once per symbol by the store and shared by
+        every feed using the same base, e.g. 5m, 1h and 4h feeds all built
+        from the 1m candles.
+      - ``base_compression`` (default: ``1``)
+        Compression of the base candles.
+      - ``repair_gaps`` (default: ``False``)
+        Refetch the windows of the granularity grid with missing candles,
+        one extra request per gap. Off by default as illiquid markets
+        legitimately skip the candles without trades. Candles still missing
+        (or not refetched) are recorded in ``gaps`` as ``(start, end)``
+        millisecond timestamps.
+      - ``max_gaps`` (default: ``1000``)
+        Number of the most recent gaps kept in ``gaps``.
+      - ``fill_gaps`` (default: ``False``)
+        Forward-fill the candles which could not be repaired with the last
+        close and zero volume.
+      - ``datastore`` (default: ``None``)
+        A ``CCXTDataStore`` (or its root directory), e.g. filled by
+        ``python -m ccxtbt.download``. With ``fromdate`` the candles stored
+        for the exchange, symbol and granularity of the feed are loaded
+        first and only the newer ones are fetched from the exchange. Only
+        for exchange candles.
+      - ``export`` (default: ``None``)
+        Path of a ``.parquet`` or ``.arrow`` file where the delivered
+        candles (or trades with ``TimeFrame.Ticks``) are persisted, to be
+        replayed later with ``CCXTArrowFeed``. Needs ``pyarrow``.
+      - ``state`` (default: ``None``)
+        Path of a ``CCXTStateStore`` checkpoint file, usually shared with
+        the broker. The last ``state_bars`` live candles are saved and,
+        after a restart, replayed as delayed bars followed by the candles
+        missed in between, instead of the ``fromdate`` or ``backfill_start``
+        backfill. Only for exchange candles.
+      - ``state_bars`` (default: ``100``)
+        Candles kept in the checkpoint, at least the lookback of the
+        strategies for the indicators to be valid after a restart.
+      - ``drop_incomplete`` (default: ``False``)
+        Ignore the candles which have not closed yet at the exchange time
+        (see ``CCXTStore`` ``clock_sync``), they are fetched again once
+        closed. Unlike ``drop_newest`` a closed last candle is kept.
+      - ``poll_at_close`` (default: ``False``)
+        Poll live candles when the next one closes at the exchange time
+        instead of on every load, sleeping at most ``poll_wait`` seconds per
+        load in between. Implies ``drop_incomplete``: a poll right at the
+        close would otherwise deliver the candle just opened.
+      - ``poll_wait`` (default: ``1.0``)
+      - ``stale_after`` (default: ``2.0``)
+        Watch the freshness of a live feed: once its last bar closed more
+        than ``stale_after`` periods of its timeframe ago at the exchange
+        time, e.g. because the exchange keeps returning the same candles,
+        a ``STALE`` data notification is sent (``LIVE`` again when bars
+        flow) together with a ``'STALE'``/``'FRESH'`` store notification.
+        The age, the lag of every bar and the breaches are recorded in the
+        store ``metrics`` as ``feed.<symbol>.<granularity>.*``. Checked on
+        every live load without any request. ``None`` disables the watch.
+      - ``max_lag`` (default: ``None``)
+        Seconds between the close of a live bar and its delivery over which
+        a ``'LAGGING'`` store notification is sent.
+      - ``maxbars`` (default: ``None``)
+        Bound the memory of a long running live session: the lines of the
+        feed only keep the last ``maxbars`` bars, and never fewer than the
+        largest minimum period of the strategies using the feed (``0``
+        keeps just that). ``None`` keeps every bar. Run cerebro with
+        ``exactbars`` to bound the indicators as well.
 
     Changes From Ed's pacakge
 
@@ -68,9 +163,30 @@ class CCXTFeed(with_metaclass(MetaCCXTFeed, DataBase)):
     params = (
         ('historical', False),  # only historical download
         ('backfill_start', True),  # do backfilling at the start
+        ('backfill_margin', 2),
         ('fetch_ohlcv_params', {}),
         ('ohlcv_limit', 20),
         ('drop_newest', False),
+        ('drop_incomplete', False),
+        ('poll_at_close', False),
+        ('poll_wait', 1.0),
+        ('stale_after', 2.0),
+        ('max_lag', None),
+        ('trades_limit', None),
+        ('trades_dedup', 1000),
+        ('bar_type', None),
+        ('bar_size', None),
+        ('bar_grace', 0.0),
+        ('base_timeframe', None),
+        ('base_compression', 1),
+        ('repair_gaps', False),
+        ('max_gaps', 1000),
+        ('fill_gaps', False),
+        ('datastore', None),
+        ('export', None),
+        ('maxbars', None),
+        ('state', None),
+        ('state_bars', 100),
         ('debug', False),
         # ('base_symbol', ''),
         # ('quote_symbol','')
@@ -81,13 +197,28 @@ class CCXTFeed(with_metaclass(MetaCCXTFeed, DataBase)):
     # States for the Finite State Machine in _load
     _ST_LIVE, _ST_HISTORBACK, _ST_OVER = range(3)
 
+    # Data notification of a live feed whose bars stopped advancing
+    STALE = len(DataBase._NOTIFNAMES)
+    _NOTIFNAMES = DataBase._NOTIFNAMES + ['STALE']
+
     # def __init__(self, exchange, symbol, ohlcv_limit=None, config={}, retries=5):
     def __init__(self, **kwargs):
         # self.store = CCXTStore(exchange, config, retries)
         self.store = self._store(**kwargs)
         self._data = deque()  # data queue for price data
-        self._last_id = ''  # last processed trade id for ohlcv
-        self._last_ts = 0  # last processed timestamp for ohlcv
+        self._last_ts = 0  # last processed timestamp for ohlcv or trades
+        self._trade_ids = deque()  # recently processed trade ids, oldest first
+        self._trade_idset = set()  # same ids for O(1) lookups
+        self._builder = None  # local bar builder for bar_type or base_timeframe
+        self._series = None  # shared base candles when base_timeframe is set
+        self._last_close = None  # close of the last queued candle, to fill gaps
+        self.gaps = deque(maxlen=self.p.max_gaps)  # last (start, end) candle gaps
+        self._writer = None  # CCXTArrowWriter when export is set
+        self._sized = False  # lines buffer bounded according to maxbars
+        self._warmup = False  # backfill_start pending until the first load
+        self._checkpoint = None  # CCXTStateStore when state is set
+        self._tail = deque()  # last delivered candles, for the checkpoint
+        self.freshness = None  # CCXTFreshness of a live feed with stale_after
 
         # # Binance symbol is like BNB/USDT,
         # # BNB is base_symbol, USDT is quote_symbol or currency
@@ -102,32 +233,147 @@ class CCXTFeed(with_metaclass(MetaCCXTFeed, DataBase)):
     def start(self, ):
         DataBase.start(self)
 
-        if self.p.fromdate:
+        if self.p.export:
+            kind = 'trades' if self._timeframe == bt.TimeFrame.Ticks else 'ohlcv'
+            self._writer = CCXTArrowWriter(self.p.export, kind=kind)
+
+        if self.p.bar_type:
+            self._builder = CCXTBarBuilder(self._timeframe, self._compression,
+                                           bar_type=self.p.bar_type, size=self.p.bar_size)
+
+        elif self.p.base_timeframe is not None:
+            granularity = self.store.get_granularity(self.p.base_timeframe, self.p.base_compression)
+            self._series = self.store.get_series(self.p.dataname, granularity,
+                                                 limit=self.p.ohlcv_limit,
+                                                 params=self.p.fetch_ohlcv_params)
+            self._builder = CCXTBarBuilder(self._timeframe, self._compression)
+            since = None
+            if self.p.fromdate:
+                # start at the beginning of the bar containing fromdate
+                since = int((self.p.fromdate - datetime(1970, 1, 1)).total_seconds() * 1000)
+                since = bar_bounds(since, self._timeframe, self._compression)[0]
+            self._series.subscribe(id(self), since)
+
+        candles = self._builder is None and self._series is None and \
+            self._timeframe not in (bt.TimeFrame.Ticks, bt.TimeFrame.Months, bt.TimeFrame.Years)
+
+        if self.p.stale_after is not None and not self.p.historical and \
+                self._timeframe != bt.TimeFrame.Ticks and self.p.bar_type in (None, 'time'):
+            try:
+                period = timeframe_to_ms(self._timeframe, self._compression)
+            except ValueError:
+                period = None  # months and years have no fixed cadence
+            if period:
+                # locally built bars, e.g. 10 seconds, have no exchange granularity
+                granularity = self.store._GRANULARITIES.get((self._timeframe, self._compression),
+                                                            '{}s'.format(period // 1000))
+                self.freshness = CCXTFreshness('feed.{}.{}'.format(self.p.dataname, granularity),
+                                               period, self.store.metrics,
+                                               self.p.stale_after * period / 1000.0,
+                                               self.p.max_lag)
+
+        saved = None
+        if self.p.state and candles:
+            self._checkpoint = self.store.get_state(self.p.state)
+            self._tail = deque(maxlen=self.p.state_bars)
+            saved = self._checkpoint.get(self._state_key())
+
+        if saved and saved['bars'] and not self.p.historical:
+            self._state = self._ST_HISTORBACK
+            self.put_notification(self.DELAYED)
+            self._restore(saved)
+
+        elif self.p.fromdate:
+            self._state = self._ST_HISTORBACK
+            self.put_notification(self.DELAYED)
+            # a shared series fetched its history when subscribing, it is
+            # read on the first load once every feed has subscribed
+            if self._series is None:
+                if self._builder is not None:
+                    self._fetch_bars(self.p.fromdate)
+                elif self.p.datastore is not None and candles and self._read_stored():
+                    self._fetch_ohlcv()  # after the last stored candle
+                else:
+                    self._fetch_ohlcv(self.p.fromdate)
+
+        elif self.p.backfill_start and not self.p.historical and candles:
+            # the strategies, and so the warm-up size, exist on the first load
+            self._warmup = True
             self._state = self._ST_HISTORBACK
             self.put_notification(self.DELAYED)
-            self._fetch_ohlcv(self.p.fromdate)
 
         else:
             self._state = self._ST_LIVE
             self.put_notification(self.LIVE)
 
+    def stop(self):
+        DataBase.stop(self)
+        if self._series is not None:
+            self._series.unsubscribe(id(self))
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def _state_key(self):
+        granularity = self.store.get_granularity(self._timeframe, self._compression)
+        return 'feed:{}:{}'.format(self.p.dataname, granularity)
+
+    def _restore(self, saved):
+        """Queue the checkpointed candles and those missed since then"""
+        for ohlcv in saved['bars']:
+            self._data.append(ohlcv)
+        self._last_ts = saved['last_ts']
+        self._last_close = saved['bars'][-1][4]
+        self._fetch_ohlcv()
+
+    def _lookback(self):
+        '''Largest minimum period of the running strategies on this feed,
+        ``0`` if there are none yet'''
+        strats = [s for s in getattr(self._env, 'runningstrats', []) if self in s.datas]
+        return max([s._minperiods[s.datas.index(self)] for s in strats] or [0])
+
+    def _size_buffer(self):
+        '''Turns the lines into circular buffers holding ``maxbars`` bars or
+        the longest lookback of the strategies. Called on the first load,
+        once the strategies and their minimum periods exist'''
+        self._sized = True
+        lookback = self._lookback()
+        if self.p.historical or not lookback:
+            return  # preloaded or nothing to size for
+
+        size = max(self.p.maxbars, lookback)
+        for line in self.lines:
+            if line.mode == line.QBuffer:  # already bounded by exactbars
+                size = max(size, line.maxlen)
+
+        # both calls reset the buffers, undoing the forward done by load
+        self.qbuffer()
+        for line in self.lines:
+            line.minbuffer(size)
+        self.forward()
+
+    @profiled(lambda self: '_load ' + self.p.dataname)
     def _load(self):
         if self._state == self._ST_OVER:
             return False
 
+        if self.p.maxbars is not None and not self._sized:
+            self._size_buffer()
+
+        if self._warmup:
+            self._warmup = False
+            self._backfill()
+
         while True:
             if self._state == self._ST_LIVE:
-                if self._timeframe == bt.TimeFrame.Ticks:
-                    return self._load_ticks()
-                else:
-                    self._fetch_ohlcv()
-                    ret = self._load_ohlcv()
-                    if self.p.debug:
-                        print('----     LOAD    ----')
-                        print('{} Load OHLCV Returning: {}'.format(datetime.utcnow(), ret))
-                    return ret
+                ret = self._load_live()
+                if self.freshness is not None and self._state == self._ST_LIVE:
+                    self._watch()
+                return ret
 
             elif self._state == self._ST_HISTORBACK:
+                if self._series is not None and not self._data:
+                    self._fetch_resampled()
                 ret = self._load_ohlcv()
                 if ret:
                     return ret
@@ -142,19 +388,118 @@ class CCXTFeed(with_metaclass(MetaCCXTFeed, DataBase)):
                         self.put_notification(self.LIVE)
                         continue
 
-    def _fetch_ohlcv(self, fromdate=None):
+    def _load_live(self):
+        if self._timeframe == bt.TimeFrame.Ticks:
+            return self._load_ticks()
+        elif self._series is not None:
+            self._fetch_resampled()
+            return self._load_ohlcv()
+        elif self._builder is not None:
+            self._fetch_bars()
+            return self._load_ohlcv()
+
+        # checked before fetching, so that the fetch sees the last candles
+        exhausted = self.store.exhausted()
+        if not exhausted and not self._poll_due():
+            return None
+        self._fetch_ohlcv()
+        ret = self._load_ohlcv()
+        if self.p.debug:
+            print('----     LOAD    ----')
+            print('{} Load OHLCV Returning: {}'.format(datetime.utcnow(), ret))
+        if ret is None and exhausted:
+            self.put_notification(self.DISCONNECTED)
+            self._state = self._ST_OVER
+            return False
+        return ret
+
+    def _watch(self):
+        '''Checks the freshness of the live feed after a load, notifying the
+        strategies (``notify_data``) and the store (``notify_store``) of the
+        changes'''
+        stale = self.freshness.check(self.store.milliseconds())
+        if stale is None:
+            return
+        age = self.freshness.age
+        if stale:
+            self.put_notification(self.STALE, age=age)
+            self.store.put_notification('STALE', self, age=age)
+        else:
+            self.put_notification(self.LIVE)
+            self.store.put_notification('FRESH', self, age=age)
+
+    def _poll_due(self):
+        '''With ``poll_at_close``, sleeps until the exchange time reaches the
+        close of the next candle, at most ``poll_wait`` seconds. Returns
+        whether it is time to poll'''
+        if not self.p.poll_at_close or self._data or not self._last_ts:
+            return True
+        try:
+            period = timeframe_to_ms(self._timeframe, self._compression)
+        except ValueError:
+            return True  # months and years are not on a fixed grid
+
+        # the same margin as drop_incomplete for the uncertainty of the clock
+        close = self._last_ts + 2 * period + (self.store.clock_rtt or 0)
+        wait = (close - self.store.milliseconds()) / 1000.0
+        if wait > self.p.poll_wait:
+            self.store.sleep(self.p.poll_wait)
+            return False
+        self.store.sleep(wait)
+        return True
+
+    def _backfill(self):
+        """Queue the warm-up candles of backfill_start: the bar in progress
+        and the closed candles needed by the strategies"""
+        bars = self._lookback() + self.p.backfill_margin
+        period = timeframe_to_ms(self._timeframe, self._compression)
+        current = bar_bounds(self.store.milliseconds(), self._timeframe, self._compression)[0]
+        # a single request if the exchange allows that many candles
+        self._fetch_ohlcv(since=current - bars * period, limit=max(bars + 1, self.p.ohlcv_limit))
+
+    def _read_stored(self):
+        """Queue the candles of the datastore from fromdate (to todate).
+        Returns whether there were any"""
+        datastore = self.p.datastore
+        if isinstance(datastore, string_types):
+            datastore = CCXTDataStore(datastore)
+
+        epoch = datetime(1970, 1, 1)
+        since = int((self.p.fromdate - epoch).total_seconds() * 1000)
+        until = None
+        if self.p.todate:
+            until = int((self.p.todate - epoch).total_seconds() * 1000) + 1
+        granularity = self.store.get_granularity(self._timeframe, self._compression)
+        for ohlcv in datastore.read(self.store.exchange.id, self.p.dataname, granularity,
+                                    since, until):
+            self._data.append(ohlcv)
+            self._last_ts = ohlcv[0]
+            self._last_close = ohlcv[4]
+        return self._last_ts > 0
+
+    @profiled('_fetch_ohlcv')
+    def _fetch_ohlcv(self, fromdate=None, since=None, limit=None):
         """Fetch OHLCV data into self._data queue"""
         granularity = self.store.get_granularity(self._timeframe, self._compression)
+        try:
+            period = timeframe_to_ms(self._timeframe, self._compression)
+        except ValueError:
+            period = None  # months and years are not on a fixed grid
 
         if fromdate:
             since = int((fromdate - datetime(1970, 1, 1)).total_seconds() * 1000)
-        else:
+        elif since is None:
             if self._last_ts > 0:
                 since = self._last_ts
             else:
                 since = None
 
-        limit = self.p.ohlcv_limit
+        limit = limit or self.p.ohlcv_limit
+        # candles still forming at the exchange time are left for later, the
+        # clock offset being off by up to half a round trip either way
+        now = None
+        if (self.p.drop_incomplete or self.p.poll_at_close) and period:
+            now = self.store.milliseconds() - (self.store.clock_rtt or 0)
 
         while True:
             dlen = len(self._data)
@@ -198,14 +543,18 @@ class CCXTFeed(with_metaclass(MetaCCXTFeed, DataBase)):
                 tstamp = ohlcv[0]
 
                 # Prevent from loading incomplete data
-                # if tstamp > (time.time() * 1000):
-                #    continue
+                if now is not None and tstamp + period > now:
+                    break
 
                 if tstamp > self._last_ts:
+                    if period and self._last_ts > 0 and tstamp - self._last_ts > period:
+                        self._fix_gap(granularity, period, tstamp)
+
                     if self.p.debug:
                         print('Adding: {}'.format(ohlcv))
                     self._data.append(ohlcv)
                     self._last_ts = tstamp
+                    self._last_close = ohlcv[4]
 
             # update since to position new batch
             since = self._last_ts
@@ -214,29 +563,135 @@ class CCXTFeed(with_metaclass(MetaCCXTFeed, DataBase)):
             if dlen == len(self._data):
                 break
 
-    def _load_ticks(self):
-        if self._last_id is None:
-            # first time get the latest trade only
-            trades = [self.store.fetch_trades(self.p.dataname)[-1]]
+    def _fix_gap(self, granularity, period, tstamp):
+        """Queue the candles missing between self._last_ts and tstamp,
+        refetching only that window"""
+        start = self._last_ts + period
+        found = {}
+
+        if self.p.repair_gaps:
+            since = start
+            while since < tstamp:
+                data = self.store.fetch_ohlcv(self.p.dataname, timeframe=granularity, since=since,
+                                              limit=(tstamp - since) // period,
+                                              params=self.p.fetch_ohlcv_params)
+                rows = [r for r in data if None not in r and since <= r[0] < tstamp]
+                if not rows:
+                    break
+                found.update((r[0], r) for r in rows)
+                since = max(found) + period
+
+        missing = None  # start of the current run of missing candles
+        for ts in range(start, tstamp, period):
+            ohlcv = found.get(ts)
+            if ohlcv is None:
+                if missing is None:
+                    missing = ts
+                if self.p.fill_gaps:
+                    close = self._last_close
+                    ohlcv = [ts, close, close, close, close, 0.0]
+            elif missing is not None:
+                self.gaps.append((missing, ts))
+                missing = None
+
+            if ohlcv is not None:
+                self._data.append(ohlcv)
+                self._last_close = ohlcv[4]
+
+        if missing is not None:
+            self.gaps.append((missing, tstamp))
+
+        if self.p.debug:
+            print('Gap {} - {}: {} candles repaired, {} gaps recorded'.format(
+                start, tstamp, len(found), len(self.gaps)))
+
+    def _fetch_trades(self):
+        """Fetch trades newer than the last seen timestamp. Returns a list of
+        (timestamp, price, amount) tuples"""
+        if self._last_ts > 0:
+            # the trades at exactly _last_ts are returned again and are
+            # discarded below by id
+            trades = self.store.fetch_trades(self.p.dataname, since=self._last_ts,
+                                             limit=self.p.trades_limit)
         else:
-            trades = self.store.fetch_trades(self.p.dataname)
+            # first time get the latest trade only
+            trades = self.store.fetch_trades(self.p.dataname, limit=self.p.trades_limit)[-1:]
 
+        new_trades = []
         for trade in trades:
+            tstamp = trade['timestamp']
+            if tstamp is None or tstamp < self._last_ts:
+                continue
+
             trade_id = trade['id']
+            if trade_id is None:  # some exchanges do not publish trade ids
+                trade_id = (tstamp, trade['price'], trade['amount'])
+
+            if trade_id in self._trade_idset:
+                continue
+
+            self._trade_ids.append(trade_id)
+            self._trade_idset.add(trade_id)
+            if len(self._trade_ids) > self.p.trades_dedup:
+                self._trade_idset.discard(self._trade_ids.popleft())
 
-            if trade_id > self._last_id:
-                trade_time = datetime.strptime(trade['datetime'], '%Y-%m-%dT%H:%M:%S.%fZ')
-                self._data.append((trade_time, float(trade['price']), float(trade['amount'])))
-                self._last_id = trade_id
+            new_trades.append((tstamp, float(trade['price']), float(trade['amount'])))
+            self._last_ts = tstamp
+
+        return new_trades
+
+    def _fetch_bars(self, fromdate=None):
+        """Fetch trades and aggregate them into bars in self._data queue"""
+        if fromdate:
+            self._last_ts = int((fromdate - datetime(1970, 1, 1)).total_seconds() * 1000)
+
+        while True:
+            trades = self._fetch_trades()
+            for tstamp, price, amount in trades:
+                bar = self._builder.add_trade(tstamp, price, amount)
+                if bar is not None:
+                    self._data.append(bar)
+
+            # keep paging while the exchange returns new trades
+            if not trades or not fromdate:
+                break
+
+        if not fromdate:
+            # deliver a time bar at its close even if no trade follows it
+            bar = self._builder.flush(self.store.milliseconds() - self.p.bar_grace * 1000)
+            if bar is not None:
+                self._data.append(bar)
+
+    def _fetch_resampled(self):
+        """Aggregate the new candles of the shared base series into bars in
+        self._data queue"""
+        self._series.refresh()
+        period = self._series.period
+        for ohlcv in self._series.read(id(self)):
+            bar = self._builder.update(*ohlcv)
+            if bar is not None:
+                self._data.append(bar)
+
+            # the last base candle of a bar completes it
+            bar = self._builder.flush(ohlcv[0] + period)
+            if bar is not None:
+                self._data.append(bar)
+
+    def _load_ticks(self):
+        if not self._data:
+            self._data.extend(self._fetch_trades())
 
         try:
             trade = self._data.popleft()
         except IndexError:
             return None  # no data in the queue
 
-        trade_time, price, size = trade
+        if self._writer is not None:
+            self._writer.write(trade)
 
-        self.lines.datetime[0] = bt.date2num(trade_time)
+        tstamp, price, size = trade
+
+        self.lines.datetime[0] = bt.date2num(datetime.utcfromtimestamp(tstamp / 1000.0))
         self.lines.open[0] = price
         self.lines.high[0] = price
         self.lines.low[0] = price
@@ -251,8 +706,22 @@ class CCXTFeed(with_metaclass(MetaCCXTFeed, DataBase)):
         except IndexError:
             return None  # no data in the queue
 
+        if self._writer is not None:
+            self._writer.write(ohlcv)
+
         tstamp, open_, high, low, close, volume = ohlcv
 
+        if self.freshness is not None and self._state == self._ST_LIVE:
+            lag = self.freshness.delivered(tstamp, self.store.milliseconds())
+            if lag is not None:
+                self.store.put_notification('LAGGING', self, lag=lag)
+
+        if self._checkpoint is not None:
+            self._tail.append(ohlcv)
+            if self._state == self._ST_LIVE:
+                self._checkpoint.put(self._state_key(),
+                                     {'last_ts': tstamp, 'bars': list(self._tail)})
+
         dtime = datetime.utcfromtimestamp(tstamp // 1000)
 
         self.lines.datetime[0] = bt.date2num(dtime)
@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; py-indent-offset:4 -*-
+###############################################################################
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import collections
+from datetime import datetime
+
+import backtrader as bt
+from backtrader.feed import DataBase
+
+from .ccxtstore import CCXTStore
+
+NAN = float('nan')
+
+
+class CCXTFuturesPoller(object):
+    '''Polls funding rate, mark/index price and open interest for all the
+    registered symbols at once, at most every ``interval`` seconds.
+
+    Funding rates and mark prices come from a single ``fetch_funding_rates``
+    call when the exchange supports it (one ``fetch_funding_rate`` per
+    symbol otherwise). Open interest uses ``fetch_open_interests`` or one
+    ``fetch_open_interest`` per symbol. The interval is measured on the
+    store clock (``CCXTStore.milliseconds``), the exchange time.
+
+    Instances are created and cached by ``CCXTStore.get_futures_poller``.
+    '''
+
+    def __init__(self, store, interval=60.0, open_interest=True):
+        self.store = store
+        self.interval = interval
+        self.open_interest = open_interest
+        self.symbols = []
+        self.snapshots = {}  # symbol -> latest snapshot dict
+        self._polled = 0.0
+
+    def register(self, symbol):
+        if symbol not in self.symbols:
+            self.symbols.append(symbol)
+            self._polled = 0.0  # include it on the next call
+
+    def _snapshot(self, symbol, funding, interest):
+        funding = funding or {}
+        interest = interest or {}
+        tstamp = funding.get('timestamp') or interest.get('timestamp') or self.store.milliseconds()
+        return {
+            'timestamp': tstamp,
+            'fundingRate': funding.get('fundingRate'),
+            'fundingTimestamp': funding.get('fundingTimestamp'),
+            'markPrice': funding.get('markPrice'),
+            'indexPrice': funding.get('indexPrice'),
+            'openInterest': interest.get('openInterestAmount'),
+        }
+
+    def poll(self):
+        '''Refreshes the snapshots if ``interval`` has elapsed. Returns
+        ``True`` if a refresh happened'''
+        now = self.store.milliseconds() / 1000.0
+        if now - self._polled < self.interval or not self.symbols:
+            return False
+        self._polled = now
+
+        has = self.store.exchange.has
+        if has.get('fetchFundingRates'):
+            rates = self.store.fetch_funding_rates(self.symbols)
+        else:
+            rates = dict((s, self.store.fetch_funding_rate(s)) for s in self.symbols)
+
+        interests = {}
+        if self.open_interest:
+            if has.get('fetchOpenInterests'):
+                interests = self.store.fetch_open_interests(self.symbols)
+            elif has.get('fetchOpenInterest'):
+                interests = dict((s, self.store.fetch_open_interest(s)) for s in self.symbols)
+
+        for symbol in self.symbols:
+            self.snapshots[symbol] = self._snapshot(symbol, rates.get(symbol), interests.get(symbol))
+
+        return True
+
+
+class CCXTFuturesFeed(DataBase):
+    '''Futures auxiliary data feed: funding rate, mark price, index price
+    and open interest of ``dataname``.
+
+    All the futures feeds of a store share a ``CCXTFuturesPoller``, so the
+    exchange is polled for every symbol at once on its own cadence instead
+    of per feed or from the strategy's ``next``. ``close`` (and ``open``,
+    ``high``, ``low``) carries the mark price.
+
+    With ``fromdate`` the funding rate history is backfilled from
+    ``fetch_funding_rate_history``, ``history_limit`` rates per request,
+    before going live (the other lines are ``NaN`` for those bars).
+
+    Params:
+
+      - ``poll_interval`` (default: ``60.0``)
+        Seconds between two polls of the shared poller
+      - ``open_interest`` (default: ``True``)
+        Also poll the open interest
+      - ``history_limit`` (default: ``100``)
+        Funding rates requested per ``fetch_funding_rate_history`` page,
+        at most the exchange maximum
+    '''
+
+    lines = ('fundingrate', 'markprice', 'indexprice', 'openinterest')
+
+    params = (
+        ('poll_interval', 60.0),
+        ('open_interest', True),
+        ('history_limit', 100),
+        ('debug', False),
+    )
+
+    def __init__(self, **kwargs):
+        self.store = CCXTStore(**kwargs)
+        self._data = collections.deque()  # queued snapshots
+        self._last_ts = 0
+
+    def start(self):
+        DataBase.start(self)
+        self.poller = self.store.get_futures_poller(interval=self.p.poll_interval,
+                                                    open_interest=self.p.open_interest)
+        self.poller.register(self.p.dataname)
+
+        if self.p.fromdate:
+            self.put_notification(self.DELAYED)
+            self._backfill(int((self.p.fromdate - datetime(1970, 1, 1)).total_seconds() * 1000))
+
+        self.put_notification(self.LIVE)
+
+    def _backfill(self, since):
+        '''Queues the funding rates from ``since``, page by page until a
+        short page'''
+        limit = self.p.history_limit
+        while True:
+            rates = self.store.fetch_funding_rate_history(self.p.dataname, since=since,
+                                                          limit=limit)
+            dlen = len(self._data)
+            for rate in sorted(rates, key=lambda r: r['timestamp']):
+                if rate['timestamp'] > self._last_ts:
+                    self._data.append({'timestamp': rate['timestamp'],
+                                       'fundingRate': rate['fundingRate']})
+                    self._last_ts = rate['timestamp']
+
+            if len(rates) < limit or dlen == len(self._data):
+                break
+            since = self._last_ts + 1
+
+    def _load(self):
+        if not self._data:
+            self.poller.poll()
+            snapshot = self.poller.snapshots.get(self.p.dataname)
+            if snapshot is not None and snapshot['timestamp'] > self._last_ts:
+                self._data.append(snapshot)
+                self._last_ts = snapshot['timestamp']
+
+        try:
+            snapshot = self._data.popleft()
+        except IndexError:
+            return None
+
+        def value(key):
+            val = snapshot.get(key)
+            return NAN if val is None else float(val)
+
+        mark = value('markPrice')
+        self.lines.datetime[0] = bt.date2num(datetime.utcfromtimestamp(snapshot['timestamp'] // 1000))
+        self.lines.open[0] = mark
+        self.lines.high[0] = mark
+        self.lines.low[0] = mark
+        self.lines.close[0] = mark
+        self.lines.volume[0] = 0.0
+        self.lines.fundingrate[0] = value('fundingRate')
+        self.lines.markprice[0] = mark
+        self.lines.indexprice[0] = value('indexPrice')
+        self.lines.openinterest[0] = value('openInterest')
+
+        if self.p.debug:
+            print('{} - Futures {}: {}'.format(datetime.utcnow(), self.p.dataname, snapshot))
+
+        return True
+
+    def haslivedata(self):
+        return bool(self._data)
+
+    def islive(self):
+        return True
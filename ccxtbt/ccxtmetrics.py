@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; py-indent-offset:4 -*-
+###############################################################################
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import bisect
+import collections
+import math
+
+
+class LatencyWindow(object):
+    '''Rolling window of the last ``size`` latencies (seconds)'''
+
+    def __init__(self, size=256):
+        self.samples = collections.deque(maxlen=size)
+
+    def __len__(self):
+        return len(self.samples)
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+
+    def percentile(self, q):
+        '''Nearest-rank ``q`` percentile, ``None`` without samples'''
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        rank = int(math.ceil(q / 100.0 * len(ordered))) - 1
+        return ordered[min(max(rank, 0), len(ordered) - 1)]
+
+
+class LatencyHistogram(object):
+    '''Histogram of latencies (seconds) with buckets bounded by
+    ``bounds`` (1-2-5 steps from 1ms to 60s by default), the last bucket
+    holding everything above'''
+
+    BOUNDS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5,
+              1.0, 2.0, 5.0, 10.0, 20.0, 60.0)
+
+    def __init__(self, bounds=BOUNDS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def percentile(self, q):
+        '''Upper bound of the bucket holding the ``q`` percentile'''
+        if not self.count:
+            return None
+        rank = q / 100.0 * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def snapshot(self):
+        return {'count': self.count,
+                'mean': self.total / self.count if self.count else None,
+                'p50': self.percentile(50), 'p99': self.percentile(99),
+                'buckets': list(zip(self.bounds + (float('inf'),), self.counts))}
+
+
+class CCXTMetrics(object):
+    '''Metrics of a ``CCXTStore``: counters (e.g. ``fetch_ohlcv.calls``,
+    ``fetch_ohlcv.errors``, ``fetch_ohlcv.timeouts``), gauges and rolling
+    latencies per endpoint.
+
+    ``snapshot`` returns them as plain dicts, e.g. to be logged or exported
+    periodically.
+    '''
+
+    def __init__(self, window=256):
+        self.window = window
+        self.counters = collections.Counter()
+        self.gauges = {}
+        self.latencies = {}  # endpoint -> LatencyWindow
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def gauge(self, name, value):
+        self.gauges[name] = value
+
+    def observe(self, endpoint, seconds):
+        window = self.latencies.get(endpoint)
+        if window is None:
+            window = self.latencies[endpoint] = LatencyWindow(self.window)
+        window.add(seconds)
+
+    def percentile(self, endpoint, q):
+        window = self.latencies.get(endpoint)
+        return window.percentile(q) if window is not None else None
+
+    def snapshot(self):
+        latencies = dict((endpoint, {'count': len(window),
+                                     'p50': window.percentile(50),
+                                     'p90': window.percentile(90),
+                                     'p99': window.percentile(99)})
+                         for endpoint, window in self.latencies.items())
+        return {'counters': dict(self.counters), 'gauges': dict(self.gauges),
+                'latencies': latencies}
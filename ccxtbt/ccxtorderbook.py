@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; py-indent-offset:4 -*-
+###############################################################################
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import collections
+import time
+from datetime import datetime
+
+import backtrader as bt
+from backtrader.feed import DataBase
+
+from .ccxtstore import CCXTStore
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency, only needed by this module
+    np = None
+
+
+class CCXTOrderBook(object):
+    '''Top ``depth`` levels of an order book kept in two preallocated
+    ``(depth, 2)`` NumPy arrays of ``[price, amount]`` rows: ``bids`` in
+    descending and ``asks`` in ascending price order. Only the first
+    ``nbids``/``nasks`` rows are valid.
+
+    ``update`` copies a full ccxt order book snapshot and ``apply_diff``
+    applies incremental level updates from a streaming source, neither of
+    them allocating per level.
+    '''
+
+    def __init__(self, depth=10):
+        if np is None:
+            raise ImportError("numpy is needed by the order book: pip install numpy")
+
+        self.depth = depth
+        self.bids = np.zeros((depth, 2))
+        self.asks = np.zeros((depth, 2))
+        self.nbids = self.nasks = 0
+        self.timestamp = None
+        self.nonce = None
+
+    def _copy(self, levels, array):
+        n = 0
+        for level in levels:
+            if n == self.depth:
+                break
+            array[n, 0] = level[0]
+            array[n, 1] = level[1]
+            n += 1
+        return n
+
+    def update(self, snapshot):
+        '''Replaces the book with a ccxt ``fetch_order_book`` snapshot'''
+        self.nbids = self._copy(snapshot['bids'], self.bids)
+        self.nasks = self._copy(snapshot['asks'], self.asks)
+        self.timestamp = snapshot.get('timestamp')
+        self.nonce = snapshot.get('nonce')
+
+    def _apply(self, array, n, price, amount, descending):
+        # binary search of the level position
+        lo, hi = 0, n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            level = array[mid, 0]
+            if (level > price) if descending else (level < price):
+                lo = mid + 1
+            else:
+                hi = mid
+
+        found = lo < n and array[lo, 0] == price
+        if not amount:
+            if found:  # remove the level
+                array[lo:n - 1] = array[lo + 1:n]
+                n -= 1
+        elif found:
+            array[lo, 1] = amount
+        elif lo < self.depth:  # insert, dropping the worst level if full
+            last = min(n, self.depth - 1)
+            array[lo + 1:last + 1] = array[lo:last]
+            array[lo, 0] = price
+            array[lo, 1] = amount
+            n = last + 1
+        return n
+
+    def apply_diff(self, bids=(), asks=(), timestamp=None):
+        '''Applies ``[price, amount]`` level updates, an amount of 0
+        removing the level'''
+        for level in bids:
+            self.nbids = self._apply(self.bids, self.nbids, level[0], level[1], True)
+        for level in asks:
+            self.nasks = self._apply(self.asks, self.nasks, level[0], level[1], False)
+        if timestamp is not None:
+            self.timestamp = timestamp
+
+    def best_bid(self):
+        return self.bids[0, 0] if self.nbids else float('nan')
+
+    def best_ask(self):
+        return self.asks[0, 0] if self.nasks else float('nan')
+
+    def bid_depth(self, levels=None):
+        return self.bids[:min(levels or self.nbids, self.nbids), 1].sum()
+
+    def ask_depth(self, levels=None):
+        return self.asks[:min(levels or self.nasks, self.nasks), 1].sum()
+
+    def imbalance(self, levels=None):
+        '''(bid depth - ask depth) / (bid depth + ask depth) over the top
+        ``levels`` levels, between -1 (all asks) and 1 (all bids)'''
+        bid, ask = self.bid_depth(levels), self.ask_depth(levels)
+        total = bid + ask
+        return (bid - ask) / total if total else 0.0
+
+
+class CCXTOrderBookFeed(DataBase):
+    '''Live order book (L2) data feed.
+
+    Every bar is a book snapshot: ``close`` (and ``open``, ``high``,
+    ``low``) is the mid price and the extra lines carry the best bid/ask,
+    their amounts, the spread, the depth of the top ``depth`` levels and
+    the book imbalance. The levels themselves are available in ``book``, a
+    ``CCXTOrderBook``.
+
+    Params:
+
+      - ``depth`` (default: ``10``)
+        Number of levels kept and requested from the exchange
+      - ``imbalance_levels`` (default: ``None``)
+        Levels used for the imbalance, all of them if ``None``
+      - ``poll_interval`` (default: ``1.0``)
+        Minimum seconds between two ``fetch_order_book`` requests
+      - ``stream`` (default: ``False``)
+        Do not poll: the book is updated by the diffs given to
+        ``push_diff`` (e.g. from a websocket client) and by the snapshots
+        given to ``push_snapshot``
+    '''
+
+    lines = ('bid', 'ask', 'bidsize', 'asksize', 'spread',
+             'biddepth', 'askdepth', 'imbalance')
+
+    params = (
+        ('depth', 10),
+        ('imbalance_levels', None),
+        ('poll_interval', 1.0),
+        ('stream', False),
+        ('debug', False),
+    )
+
+    def __init__(self, **kwargs):
+        self.store = CCXTStore(**kwargs)
+        self.book = CCXTOrderBook(self.p.depth)
+        self._updates = collections.deque()  # streamed (kind, payload) updates
+        self._last_poll = 0.0
+
+    def start(self):
+        DataBase.start(self)
+        self.put_notification(self.LIVE)
+
+    def push_snapshot(self, snapshot):
+        '''Queues a full order book snapshot, thread safe'''
+        self._updates.append((True, snapshot))
+
+    def push_diff(self, bids=(), asks=(), timestamp=None):
+        '''Queues incremental ``[price, amount]`` level updates, thread safe'''
+        self._updates.append((False, (bids, asks, timestamp)))
+
+    def _update_book(self):
+        if self.p.stream:
+            if not self._updates:
+                return False
+            while self._updates:
+                snapshot, payload = self._updates.popleft()
+                if snapshot:
+                    self.book.update(payload)
+                else:
+                    self.book.apply_diff(*payload)
+            return True
+
+        now = time.time()
+        if now - self._last_poll < self.p.poll_interval:
+            return False
+
+        self._last_poll = now
+        self.book.update(self.store.fetch_order_book(self.p.dataname, limit=self.p.depth))
+        return True
+
+    def _load(self):
+        if not self._update_book():
+            return None
+
+        book = self.book
+        tstamp = book.timestamp or int(time.time() * 1000)
+        bid, ask = book.best_bid(), book.best_ask()
+        mid = (bid + ask) / 2.0
+
+        self.lines.datetime[0] = bt.date2num(datetime.utcfromtimestamp(tstamp / 1000.0))
+        self.lines.open[0] = mid
+        self.lines.high[0] = mid
+        self.lines.low[0] = mid
+        self.lines.close[0] = mid
+        self.lines.volume[0] = 0.0
+        self.lines.bid[0] = bid
+        self.lines.ask[0] = ask
+        self.lines.bidsize[0] = book.bids[0, 1] if book.nbids else 0.0
+        self.lines.asksize[0] = book.asks[0, 1] if book.nasks else 0.0
+        self.lines.spread[0] = ask - bid
+        self.lines.biddepth[0] = book.bid_depth()
+        self.lines.askdepth[0] = book.ask_depth()
+        self.lines.imbalance[0] = book.imbalance(self.p.imbalance_levels)
+
+        if self.p.debug:
+            print('{} - Book {}: bid {} ask {} imbalance {}'.format(
+                datetime.utcnow(), self.p.dataname, bid, ask, self.lines.imbalance[0]))
+
+        return True
+
+    def haslivedata(self):
+        return bool(self._updates)
+
+    def islive(self):
+        return True
@@ -0,0 +1,326 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; py-indent-offset:4 -*-
+###############################################################################
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import collections
+import itertools
+from datetime import datetime
+
+from backtrader import Order
+from ccxt.base.errors import OrderNotFound
+
+from .ccxtbroker import CCXTBroker
+from .ccxtstore import CCXTStore
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class CCXTMatchingEngine(object):
+    '''Local stand-in for the order endpoints of ``CCXTStore``
+    (``create_order``, ``edit_order``, ``fetch_order``, ``cancel_order``
+    and ``fetch_open_orders``) returning ccxt structured orders.
+
+    Open orders are matched against the current bar of the feed of their
+    symbol, at most once per bar and only from the first bar starting
+    ``latency`` seconds after their creation:
+
+      - market orders fill at the open
+      - limit orders marketable on arrival (their first bar, or the bar
+        triggering a stop limit) fill at the open as taker, otherwise they
+        rest and fill at their price as maker once a bar trades through it,
+        gaps included
+      - stop and stop limit orders are triggered by the bar reaching their
+        price and then behave as market/limit orders
+
+    The ``stopLoss``/``takeProfit`` params of an order create, once it
+    closes, a stop and a limit order canceling each other like an exchange
+    bracket.
+
+    With ``volume_ratio`` a bar fills at most that fraction of its volume,
+    leaving the rest of the order open for the following bars. Fees are
+    the ``maker``/``taker`` rates of the market metadata, paid in the quote
+    currency and taken from ``cash``.
+    '''
+
+    def __init__(self, broker, cash=10000.0, latency=0.0, volume_ratio=None, fees=True):
+        self.broker = broker
+        self.cash = cash
+        self.latency = latency
+        self.volume_ratio = volume_ratio
+        self.fees = fees
+
+        self.holdings = collections.defaultdict(float)  # symbol -> base amount
+        self.orders = collections.OrderedDict()
+        self._meta = {}  # id -> [data, kind, first eligible dt, last matched dt, resting]
+        self._ids = itertools.count(1)
+        self._datas = None
+        self._attached = {}  # id -> (stopLoss, takeProfit) params
+        self._ocos = {}  # id -> ids canceled when it closes
+        # ccxt order type -> backtrader execution type
+        self._kinds = dict((v, k) for k, v in broker.order_types.items())
+
+    def _data(self, symbol):
+        if self._datas is None:
+            self._datas = dict((data.p.dataname, data) for data in self.broker.cerebro.datas)
+        return self._datas[symbol]
+
+    @staticmethod
+    def _timestamp(data):
+        return int((data.datetime.datetime(0) - _EPOCH).total_seconds() * 1000)
+
+    @staticmethod
+    def _copy(order):
+        return dict(order, trades=list(order['trades']))
+
+    def value(self):
+        '''Cash plus the holdings at the last close of their feeds'''
+        value = self.cash
+        for symbol, amount in self.holdings.items():
+            if amount:
+                value += amount * self._data(symbol).close[0]
+        return value
+
+    def create_order(self, symbol, order_type, side, amount, price, params):
+        data = self._data(symbol)
+        tstamp = self._timestamp(data)
+        oid = str(next(self._ids))
+        kind = self._kinds.get(order_type, Order.Market)
+        order = {
+            'id': oid, 'clientOrderId': params.get('clientOrderId'), 'symbol': symbol,
+            'type': order_type, 'side': side, 'amount': amount,
+            'price': None if kind == Order.Market else price,
+            'filled': 0.0, 'remaining': amount, 'average': None, 'cost': 0.0,
+            'status': 'open', 'timestamp': tstamp,
+            'datetime': self.broker.store.exchange.iso8601(tstamp),
+            'trades': [], 'fee': None, 'info': {},
+        }
+        self.orders[oid] = order
+        eligible = data.datetime[0] + self.latency / 86400.0
+        self._meta[oid] = [data, kind, eligible, data.datetime[0], False]
+        if 'stopLoss' in params or 'takeProfit' in params:
+            self._attached[oid] = (params.get('stopLoss'), params.get('takeProfit'))
+        return self._copy(order)
+
+    def _order(self, oid):
+        try:
+            return self.orders[oid]
+        except KeyError:
+            raise OrderNotFound('paper order %s not found' % oid)
+
+    def fetch_order(self, oid, symbol=None):
+        order = self._order(oid)
+        self._match(order)
+        return self._copy(order)
+
+    def fetch_open_orders(self, symbol=None):
+        orders = []
+        for order in self.orders.values():
+            self._match(order)
+            if order['status'] == 'open' and symbol in (None, order['symbol']):
+                orders.append(self._copy(order))
+        return orders
+
+    def has(self, feature, native=False):
+        return feature in ('editOrder', 'createOrderWithTakeProfitAndStopLoss')
+
+    def edit_order(self, oid, symbol, order_type, side, amount, price, params={}):
+        '''Amends the order in place under the same id, ``amount`` being its
+        new total amount (filled included) like ccxt defines it'''
+        order = self._order(oid)
+        self._match(order)
+        if order['status'] == 'open':
+            if price is not None:
+                order['price'] = price
+                self._meta[oid][4] = False  # arrives again at its new price
+            if amount is not None:
+                order['amount'] = max(amount, order['filled'])
+                order['remaining'] = order['amount'] - order['filled']
+                if not order['remaining']:
+                    order['status'] = 'closed'
+        return self._copy(order)
+
+    def cancel_order(self, oid, symbol=None):
+        order = self._order(oid)
+        self._match(order)
+        if order['status'] == 'open':
+            order['status'] = 'canceled'
+        return self._copy(order)
+
+    def _match(self, order):
+        if order['status'] != 'open':
+            return
+
+        meta = self._meta[order['id']]
+        data, kind, eligible, matched, resting = meta
+        dt = data.datetime[0]
+        if dt <= matched or dt < eligible:
+            return
+        meta[3] = dt
+
+        open_, high, low = data.open[0], data.high[0], data.low[0]
+        buy = order['side'] == 'buy'
+        price = order['price']
+
+        if kind in (Order.Stop, Order.StopLimit) and not order.get('triggered'):
+            if not (high >= price if buy else low <= price):
+                return
+            order['triggered'] = True
+            if kind == Order.Stop:  # market order at the trigger, or the open of a gap
+                self._fill(order, data, max(open_, price) if buy else min(open_, price), True)
+                return
+
+        meta[4] = True
+        if kind == Order.Market:
+            self._fill(order, data, open_, True)
+        elif not resting and (buy and open_ <= price or not buy and open_ >= price):
+            self._fill(order, data, open_, True)  # marketable on arrival
+        elif buy and low <= price or not buy and high >= price:
+            self._fill(order, data, price, False)  # resting in the book
+
+    def _closed(self, order):
+        '''Cancels the orders linked to ``order`` and creates the take profit
+        and stop loss orders attached to it'''
+        for oid in self._ocos.pop(order['id'], []):
+            other = self.orders[oid]
+            if other['status'] == 'open':
+                other['status'] = 'canceled'
+
+        stop_loss, take_profit = self._attached.pop(order['id'], (None, None))
+        side = 'sell' if order['side'] == 'buy' else 'buy'
+        types = self.broker.order_types
+        children = []
+        if stop_loss:
+            children.append(self.create_order(order['symbol'], types[Order.Stop], side,
+                                              order['amount'], stop_loss['triggerPrice'], {}))
+        if take_profit:
+            children.append(self.create_order(order['symbol'], types[Order.Limit], side,
+                                              order['amount'], take_profit['price'], {}))
+        if len(children) == 2:
+            self._ocos[children[0]['id']] = [children[1]['id']]
+            self._ocos[children[1]['id']] = [children[0]['id']]
+
+    def _fill(self, order, data, price, taker):
+        amount = order['remaining']
+        if self.volume_ratio is not None:
+            amount = min(amount, data.volume[0] * self.volume_ratio)
+            amount = self.broker.store.amount_to_precision(order['symbol'], amount)
+            if amount <= 0:
+                return
+
+        market = self.broker.markets[order['symbol']]
+        rate = (market.get('taker' if taker else 'maker') or 0.0) if self.fees else 0.0
+        cost = amount * price
+        fee = {'cost': cost * rate, 'currency': market.get('quote'), 'rate': rate}
+
+        tstamp = self._timestamp(data)
+        order['trades'].append({
+            'id': '%s-%d' % (order['id'], len(order['trades']) + 1), 'order': order['id'],
+            'symbol': order['symbol'], 'side': order['side'], 'amount': amount, 'price': price,
+            'cost': cost, 'fee': fee, 'takerOrMaker': 'taker' if taker else 'maker',
+            'timestamp': tstamp, 'datetime': self.broker.store.exchange.iso8601(tstamp),
+        })
+
+        order['filled'] += amount
+        order['remaining'] = max(order['amount'] - order['filled'], 0.0)
+        order['cost'] += cost
+        order['average'] = order['cost'] / order['filled']
+        if order['fee'] is None:
+            order['fee'] = dict(fee)
+        else:
+            order['fee']['cost'] += fee['cost']
+        if not order['remaining']:
+            order['status'] = 'closed'
+            if order['price'] is None:
+                order['price'] = order['average']
+            self._closed(order)
+
+        sign = 1.0 if order['side'] == 'buy' else -1.0
+        self.holdings[order['symbol']] += sign * amount
+        self.cash -= sign * cost + fee['cost']
+
+
+class CCXTPaperBroker(CCXTBroker):
+    '''``CCXTBroker`` sending its orders to a local ``CCXTMatchingEngine``
+    instead of the exchange.
+
+    Everything else is the live broker: ``order_types`` and ``mappings``,
+    the store precision functions, ``check_exchange_limit`` and the order
+    polling of ``next``, so that backtests and dry runs exercise the live
+    order path at full speed. Only public endpoints are used (to load the
+    markets, unless ``markets`` is given), so no API keys are needed.
+
+    Params (besides those of ``CCXTBroker``):
+
+      - ``cash`` (default: ``10000.0``): starting cash in the store currency
+      - ``latency`` (default: ``0.0``): seconds before an order reaches the
+        engine, i.e. orders are matched from the first bar starting that
+        long after their creation
+      - ``volume_ratio`` (default: ``None``): fraction of the bar volume an
+        order can fill per bar, ``None`` fills it at once
+      - ``fees`` (default: ``True``): charge the maker/taker fees of the
+        market metadata
+      - ``markets`` (default: ``None``): ccxt markets to use instead of
+        loading them from the exchange
+    '''
+
+    _register = False  # store.getbroker() keeps returning the live broker
+
+    def __init__(self, broker_mapping=None, debug=False, compact_orders=False,
+                 order_history=None, state=None, sync_balance=True, order_rate=None,
+                 client_order_ids=True, edit_amount=None, cash=10000.0, latency=0.0, volume_ratio=None, fees=True, markets=None,
+                 **kwargs):
+        # kwargs are the params of the store only
+        store = CCXTStore(**kwargs)
+        if markets is not None:
+            store.exchange.set_markets(markets)  # load_markets returns them
+
+        super(CCXTPaperBroker, self).__init__(broker_mapping=broker_mapping, debug=debug,
+                                              compact_orders=compact_orders,
+                                              order_history=order_history, state=state,
+                                              sync_balance=sync_balance,
+                                              order_rate=order_rate,
+                                              client_order_ids=client_order_ids,
+                                              edit_amount=edit_amount, **kwargs)
+
+        self.engine = CCXTMatchingEngine(self, cash=cash, latency=latency,
+                                         volume_ratio=volume_ratio, fees=fees)
+        self.cash = self.value = self.startingcash = self.startingvalue = cash
+
+    def _reserved(self, order):
+        return 0.0  # the engine cash is not locked by the open orders
+
+    def get_balance(self):
+        self.cash = self.engine.cash
+        self.value = self.engine.value()
+        return self.cash, self.value
+
+    def getcash(self):
+        self.cash = self.engine.cash
+        return self.cash
+
+    get_cash = getcash
+
+    def getvalue(self, datas=None):
+        if datas is None:
+            self.value = self.engine.value()
+            return self.value
+        return super(CCXTPaperBroker, self).getvalue(datas)
+
+    get_value = getvalue
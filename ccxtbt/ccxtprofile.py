@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; py-indent-offset:4 -*-
+###############################################################################
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import contextlib
+import time
+from functools import wraps
+
+import backtrader as bt
+
+NO_SECTION = contextlib.nullcontext()  # what sections are when not profiling
+
+
+def profiled(name):
+    '''Decorator timing a method of an object with a ``store`` (feeds and
+    brokers) as the section ``name`` of the store profiler. ``name`` can be
+    a function of the object, e.g. to include the symbol of a feed'''
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            profiler = self.store.profiler
+            if profiler is None or not profiler.active:
+                return method(self, *args, **kwargs)
+            with profiler.section(name(self) if callable(name) else name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class _Section(object):
+    __slots__ = ('profiler', 'key', 'start', 'child')
+
+    def __init__(self, profiler, key):
+        self.profiler = profiler
+        self.key = key
+
+    def __enter__(self):
+        self.child = 0.0
+        self.profiler._stack.append(self)
+        self.start = self.profiler.p.clock()
+        return self
+
+    def __exit__(self, *exc):
+        profiler = self.profiler
+        elapsed = profiler.p.clock() - self.start
+        profiler._stack.pop()
+        if profiler._stack:
+            profiler._stack[-1].child += elapsed
+        else:
+            profiler._top += elapsed
+
+        stats = profiler.stats.get(self.key)
+        if stats is None:
+            stats = profiler.stats[self.key] = [0, 0.0, 0.0, 0.0]
+        stats[0] += 1
+        stats[1] += elapsed
+        stats[2] = max(stats[2], elapsed)
+        stats[3] += elapsed - self.child
+        return False
+
+
+class CCXTProfiler(bt.Analyzer):
+    '''Breaks each engine cycle of a live run into the time spent in:
+
+      - ``_load <symbol>`` of every ``CCXTFeed`` and, within it,
+        ``_fetch_ohlcv``
+      - ``broker.next``, order polling included
+      - ``limiter.sleep``: the rate limit sleeps of ``CCXTStore``
+      - every store endpoint call, e.g. ``fetch_ohlcv``
+      - ``strategy.next``
+
+    and the rest of the cycle (backtrader itself), the self time of
+    ``cycle``.
+
+    The sections nest, e.g. ``cycle;_load BTC/USDT;_fetch_ohlcv;fetch_ohlcv``.
+    It attaches to the stores of the datas and of the broker while the
+    strategy runs. Outside of a profiled cycle a section is a single
+    attribute check.
+
+    Params:
+
+      - ``interval`` (default: ``60.0``): seconds between two summaries
+        printed to stdout, ``None`` for none
+      - ``sample`` (default: ``1``): profile one cycle out of ``sample``
+      - ``flamegraph`` (default: ``None``): path of a collapsed stacks file
+        (``flamegraph.pl``, speedscope ...) written when the run stops,
+        see ``dump``
+      - ``clock`` (default: ``time.perf_counter``)
+
+    ``get_analysis`` returns the number of cycles and, per section key,
+    ``count``, ``total``, ``max`` and ``self`` (excluding nested sections)
+    seconds.
+    '''
+
+    params = (
+        ('interval', 60.0),
+        ('sample', 1),
+        ('flamegraph', None),
+        ('clock', time.perf_counter),
+    )
+
+    def __init__(self):
+        self.stats = {}  # key -> [count, total, max, self]
+        self.cycles = 0  # profiled cycles
+        self.active = True
+        self._stack = []
+        self._top = 0.0  # time in top level sections during the cycle
+        self._seen = 0
+        self._stores = []
+
+    def start(self):
+        stores = [getattr(data, 'store', None) for data in self.strategy.datas]
+        stores.append(getattr(self.strategy.broker, 'store', None))
+        for store in stores:
+            if hasattr(store, 'profiler') and store not in self._stores:
+                store.profiler = self
+                self._stores.append(store)
+
+        self.strategy.next = self._timed(self.strategy.next)
+        self._cycle_start = self._summary = self.p.clock()
+
+    def stop(self):
+        for store in self._stores:
+            if store.profiler is self:
+                store.profiler = None
+        if self.p.flamegraph:
+            self.dump(self.p.flamegraph)
+
+    def _timed(self, method):
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            with self.section('strategy.next'):
+                return method(*args, **kwargs)
+        return wrapper
+
+    def section(self, name):
+        '''Context timing ``name``, nested in the current section'''
+        if not self.active:
+            return NO_SECTION
+        parent = self._stack[-1].key if self._stack else 'cycle'
+        return _Section(self, parent + ';' + name)
+
+    def next(self):
+        # the cycle ends with the analyzers, after the strategy
+        now = self.p.clock()
+        if self.active:
+            self.cycles += 1
+            cycle = now - self._cycle_start
+            stats = self.stats.setdefault('cycle', [0, 0.0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += cycle
+            stats[2] = max(stats[2], cycle)
+            stats[3] += max(cycle - self._top, 0.0)
+
+        self._seen += 1
+        self.active = self._seen % self.p.sample == 0
+        self._top = 0.0
+        self._cycle_start = self.p.clock()
+
+        if self.p.interval is not None and now - self._summary >= self.p.interval:
+            self._summary = now
+            print(self.summary())
+
+    prenext = next
+
+    def get_analysis(self):
+        sections = dict((key, {'count': s[0], 'total': s[1], 'max': s[2], 'self': s[3]})
+                        for key, s in self.stats.items())
+        return {'cycles': self.cycles, 'sections': sections}
+
+    def summary(self):
+        '''Table of the sections: total and per cycle milliseconds, max and
+        share of the cycle time'''
+        cycles = max(self.cycles, 1)
+        cycle = self.stats.get('cycle', [0, 0.0])[1] or 1.0
+        lines = ['{:<48} {:>10} {:>10} {:>10} {:>6}'.format('section', 'total ms', 'ms/cycle',
+                                                            'max ms', '%')]
+        for key, (count, total, top, _) in sorted(self.stats.items(), key=lambda kv: -kv[1][1]):
+            lines.append('{:<48} {:>10.1f} {:>10.3f} {:>10.1f} {:>6.1f}'.format(
+                key, total * 1000, total * 1000 / cycles, top * 1000, 100 * total / cycle))
+        return '\n'.join(lines)
+
+    def dump(self, path):
+        '''Writes the self time of every section in microseconds as
+        collapsed stacks (one ``cycle;section;nested <count>`` per line),
+        the ``cycle`` frame itself being the time outside the sections'''
+        with open(path, 'w') as f:
+            for key, stats in sorted(self.stats.items()):
+                micros = int(round(stats[3] * 1e6))
+                if micros > 0:
+                    f.write('{} {}\n'.format(key, micros))
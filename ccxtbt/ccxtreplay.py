@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; py-indent-offset:4 -*-
+###############################################################################
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import bisect
+import collections
+import itertools
+import time
+
+import ccxt
+from ccxt.base.errors import OrderNotFound
+
+
+class VirtualClock(object):
+    '''Clock starting at ``start`` (milliseconds) and running ``speed``
+    times faster than the wall clock. A ``manual`` clock only moves when
+    slept, which makes a replay independent of the wall clock'''
+
+    def __init__(self, start, speed=1.0, manual=False):
+        self.start = start
+        self.speed = float(speed)
+        self.manual = manual
+        self._t0 = time.monotonic()
+
+    def milliseconds(self):
+        if self.manual:
+            return int(self.start)
+        return int(self.start + (time.monotonic() - self._t0) * 1000 * self.speed)
+
+    def sleep(self, seconds):
+        '''Sleeps ``seconds`` of virtual time'''
+        if seconds <= 0:
+            return
+        if self.manual:
+            self.start += seconds * 1000
+        else:
+            time.sleep(seconds / self.speed)
+
+
+class CCXTReplayExchange(ccxt.Exchange):
+    '''Exchange replaying cached candles under a ``VirtualClock``.
+
+    It is given to ``CCXTStore`` instead of an exchange name, so that
+    ``CCXTFeed`` and ``CCXTBroker`` run their live code path (``_ST_LIVE``,
+    order polling in ``next``) against history at ``speed`` times real time:
+    a month of live behaviour can be soak-tested in minutes.
+
+    ``history`` maps ``(symbol, granularity)`` to ccxt OHLCV rows, e.g. as
+    read from a ``CCXTDataStore`` by ``from_datastore``. ``fetch_ohlcv`` only
+    returns candles closed at the virtual time. Every call waits
+    ``latency`` seconds of virtual time to simulate the exchange round
+    trip, and the rate limit is scaled down by ``speed``.
+
+    Orders are matched against the candles of the smallest granularity of
+    their symbol: market orders fill at the last close, limit orders once a
+    closed candle trades through their price, stop orders once it reaches
+    their trigger.
+
+    ``stats`` counts the calls per endpoint. ``finished`` becomes true when
+    the virtual time is past the last candle, which ends the live feeds.
+    '''
+
+    def __init__(self, history, speed=1.0, latency=0.0, start=None,
+                 balance=None, currency='USDT', rate_limit=50, config=None):
+        super(CCXTReplayExchange, self).__init__(config or {})
+        self.id = 'replay'
+        self.name = 'Replay'
+        self.rateLimit = rate_limit / float(speed)
+        self.latency = latency
+        self.has = dict(self.has, fetchOHLCV=True, fetchTime=True, fetchOrder=True,
+                        fetchOpenOrders=True, fetchClosedOrders=True, createOrder=True,
+                        cancelOrder=True, fetchBalance=True)
+
+        self._history = {}
+        self._times = {}
+        self._periods = {}
+        for (symbol, granularity), rows in history.items():
+            rows = sorted(r for r in rows if None not in r)
+            self._history[(symbol, granularity)] = rows
+            self._times[(symbol, granularity)] = [r[0] for r in rows]
+            self._periods[(symbol, granularity)] = self.parse_timeframe(granularity) * 1000
+
+        self.timeframes = dict((g, g) for _, g in self._history)
+        self._end = max(self._times[k][-1] + self._periods[k] for k in self._times)
+        if start is None:
+            start = min(self._times[k][0] + self._periods[k] for k in self._times)
+        self.clock = VirtualClock(start, speed)
+
+        self.currency = currency
+        self.balances = collections.defaultdict(float, balance or {currency: 10000.0})
+        self.orders = collections.OrderedDict()
+        self._ids = itertools.count(1)
+        self.stats = collections.Counter()
+
+    @classmethod
+    def from_datastore(cls, datastore, exchange, pairs, since=None, until=None, **kwargs):
+        '''Builds the exchange from the ``(symbol, granularity)`` pairs of a
+        ``CCXTDataStore``'''
+        history = dict(((symbol, granularity),
+                        list(datastore.read(exchange, symbol, granularity, since, until)))
+                       for symbol, granularity in pairs)
+        return cls(history, **kwargs)
+
+    @property
+    def finished(self):
+        return self.milliseconds() >= self._end
+
+    def milliseconds(self):
+        return self.clock.milliseconds()
+
+    def _call(self, endpoint):
+        self.stats[endpoint] += 1
+        self.clock.sleep(self.latency)
+
+    def _closed(self, key):
+        '''Returns the rows of ``key`` and the number of them closed at the
+        virtual time'''
+        idx = bisect.bisect_right(self._times[key], self.milliseconds() - self._periods[key])
+        return self._history[key], idx
+
+    def fetch_time(self, params={}):
+        # stamped halfway through the round trip
+        self.stats['fetch_time'] += 1
+        self.clock.sleep(self.latency / 2.0)
+        now = self.milliseconds()
+        self.clock.sleep(self.latency / 2.0)
+        return now
+
+    def load_markets(self, reload=False, params={}):
+        self._call('load_markets')
+        if self.markets is None or reload:
+            markets = {}
+            for symbol, _ in self._history:
+                base, quote = symbol.split(':')[0].split('/')
+                markets[symbol] = {
+                    'id': symbol, 'symbol': symbol, 'base': base, 'quote': quote,
+                    'active': True, 'maker': 0.0, 'taker': 0.0, 'precision': {},
+                    'limits': {'amount': {'min': None, 'max': None},
+                               'price': {'min': None, 'max': None},
+                               'cost': {'min': None, 'max': None}},
+                }
+            self.markets = markets
+        return self.markets
+
+    def amount_to_precision(self, symbol, amount):
+        return str(amount)
+
+    def price_to_precision(self, symbol, price):
+        return str(price)
+
+    def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None, params={}):
+        self._call('fetch_ohlcv')
+        key = (symbol, timeframe)
+        rows, end = self._closed(key)
+        start = 0 if since is None else bisect.bisect_left(self._times[key], since)
+        if since is None and limit:
+            start = max(0, end - limit)
+        stop = end if not limit else min(end, start + limit)
+        return [list(r) for r in rows[start:stop]]
+
+    def fetch_balance(self, params={}):
+        self._call('fetch_balance')
+        balances = dict(self.balances)
+        return {'free': balances, 'total': dict(balances)}
+
+    def fetch_positions(self, symbols=None, params={}):
+        self._call('fetch_positions')
+        return []
+
+    def _candles(self, symbol):
+        # smallest granularity of the symbol
+        keys = [k for k in self._history if k[0] == symbol]
+        return min(keys, key=lambda k: self._periods[k])
+
+    def _fill(self, order, price):
+        amount = order['remaining']
+        cost = amount * price
+        order.update({'status': 'closed', 'filled': order['amount'], 'remaining': 0.0,
+                      'average': price, 'cost': cost})
+        if order['price'] is None or order['type'] == 'stop':
+            order['price'] = price
+        order['trades'].append({
+            'id': '%s-%d' % (order['id'], len(order['trades']) + 1), 'order': order['id'],
+            'symbol': order['symbol'], 'side': order['side'], 'amount': amount, 'price': price,
+            'cost': cost, 'timestamp': self.milliseconds(),
+            'datetime': self.iso8601(self.milliseconds()), 'fee': None,
+        })
+        base, quote = order['symbol'].split(':')[0].split('/')
+        sign = 1.0 if order['side'] == 'buy' else -1.0
+        self.balances[base] += sign * amount
+        self.balances[quote] -= sign * cost
+
+    def _match(self, order):
+        if order['status'] != 'open':
+            return
+
+        key = self._candles(order['symbol'])
+        rows, end = self._closed(key)
+        start = bisect.bisect_left(self._times[key], order['timestamp'])
+        buy = order['side'] == 'buy'
+        for row in rows[start:end]:
+            _, open_, high, low, close, _ = row
+            trigger = order['triggerPrice']
+            if trigger is not None and not order.get('triggered'):
+                if not (high >= trigger if buy else low <= trigger):
+                    continue
+                order['triggered'] = True
+                if order['price'] is None or order['type'] == 'stop':
+                    # stop market, filled at the trigger or at the open of a gap
+                    self._fill(order, max(open_, trigger) if buy else min(open_, trigger))
+                    return
+
+            price = order['price']
+            if (buy and low <= price) or (not buy and high >= price):
+                self._fill(order, min(open_, price) if buy else max(open_, price))
+                return
+
+    def create_order(self, symbol, type, side, amount, price=None, params={}):
+        self._call('create_order')
+        key = self._candles(symbol)
+        rows, end = self._closed(key)
+        now = self.milliseconds()
+        oid = str(next(self._ids))
+        order = {
+            'id': oid, 'clientOrderId': params.get('clientOrderId'), 'symbol': symbol,
+            'type': type, 'side': side, 'amount': amount, 'price': price,
+            'filled': 0.0, 'remaining': amount, 'average': None, 'cost': 0.0,
+            'status': 'open', 'timestamp': now, 'datetime': self.iso8601(now),
+            'triggerPrice': params.get('stopPrice', params.get('triggerPrice')),
+            'trades': [], 'fee': None, 'info': {},
+        }
+        if order['triggerPrice'] is None and type.startswith('stop'):
+            order['triggerPrice'] = price
+
+        self.orders[oid] = order
+        if type == 'market' and end:
+            self._fill(order, rows[end - 1][4])
+        return dict(order, trades=list(order['trades']))
+
+    def fetch_order(self, id, symbol=None, params={}):
+        self._call('fetch_order')
+        try:
+            order = self.orders[id]
+        except KeyError:
+            raise OrderNotFound('replay order %s not found' % id)
+        self._match(order)
+        return dict(order, trades=list(order['trades']))
+
+    def _orders(self, status, symbol):
+        orders = []
+        for order in self.orders.values():
+            self._match(order)
+            if order['status'] == status and symbol in (None, order['symbol']):
+                orders.append(dict(order, trades=list(order['trades'])))
+        return orders
+
+    def fetch_open_orders(self, symbol=None, since=None, limit=None, params={}):
+        self._call('fetch_open_orders')
+        return self._orders('open', symbol)
+
+    def fetch_closed_orders(self, symbol=None, since=None, limit=None, params={}):
+        self._call('fetch_closed_orders')
+        return self._orders('closed', symbol)
+
+    def cancel_order(self, id, symbol=None, params={}):
+        self._call('cancel_order')
+        order = self.orders.get(id)
+        if order is None:
+            raise OrderNotFound('replay order %s not found' % id)
+        self._match(order)
+        if order['status'] == 'open':
+            order['status'] = 'canceled'
+        return dict(order, trades=list(order['trades']))
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; py-indent-offset:4 -*-
+###############################################################################
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import collections
+import heapq
+import itertools
+import time
+
+
+class CCXTOrderScheduler(object):
+    '''Queue of the outbound order actions of a broker, sent within the
+    order rate limit of the exchange: at most ``rate`` actions per
+    ``period`` seconds (sliding window).
+
+    Actions are ``('cancel', order)``, ``('send', order, native)`` and
+    ``('modify', order, amount, price, cost)``, popped by priority then in
+    arrival order, an action sending several requests (its ``cost``)
+    waiting for as much budget:
+
+      - ``CANCEL``: cancels, which free margin and stop exposure
+      - ``REDUCE``: orders reducing a position (incl. ``reduceOnly``)
+      - ``ENTRY``: new entries
+
+    Redundant actions are coalesced: a second cancel of an order is
+    ignored, a modification pushed with ``replace`` supersedes the queued
+    one and ``discard`` drops the queued send of an order canceled before
+    it left.
+    '''
+
+    CANCEL, REDUCE, ENTRY = range(3)
+
+    def __init__(self, rate, period=1.0, clock=time.monotonic):
+        self.rate = rate
+        self.period = period
+        self.clock = clock
+        self.queue = []  # heap of (priority, seq, cost, action)
+        self.sent = collections.deque()  # times of the actions in the window
+        self.pending = {}  # (kind, order ref) -> queued action
+        self._seq = itertools.count()
+        self._paused = 0.0
+
+    def __len__(self):
+        return len(self.pending)
+
+    def push(self, priority, action, cost=1, replace=False):
+        key = (action[0], action[1].ref)
+        if key in self.pending and not replace:
+            return False  # coalesced
+        self.pending[key] = action  # a replaced action is dropped when popped
+        heapq.heappush(self.queue, (priority, next(self._seq), cost, action))
+        return True
+
+    def discard(self, order):
+        '''Drops the queued send of ``order``. Returns whether there was one'''
+        return self.pending.pop(('send', order.ref), None) is not None
+
+    def budget(self):
+        '''Number of actions which can be sent now'''
+        now = self.clock()
+        if now < self._paused:
+            return 0
+        while self.sent and self.sent[0] <= now - self.period:
+            self.sent.popleft()
+        return max(self.rate - len(self.sent), 0)
+
+    def pause(self, seconds=None):
+        '''Stops sending for ``seconds`` (default: a full period), e.g. once
+        the exchange throttled an action'''
+        self._paused = self.clock() + (self.period if seconds is None else seconds)
+
+    def spend(self):
+        '''Accounts for an action sent outside the queue'''
+        self.sent.append(self.clock())
+
+    def pop(self):
+        '''Next action within the budget, or ``None``'''
+        while self.queue:
+            _, _, cost, action = self.queue[0]
+            key = (action[0], action[1].ref)
+            if self.pending.get(key) is not action:
+                heapq.heappop(self.queue)
+                continue  # discarded or replaced
+
+            cost = min(cost, self.rate)  # never more than a full window
+            if self.budget() < cost:
+                return None
+            heapq.heappop(self.queue)
+            del self.pending[key]
+            for _ in range(cost):
+                self.spend()
+            return action
+        return None
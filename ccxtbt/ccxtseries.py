@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; py-indent-offset:4 -*-
+###############################################################################
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+
+class CCXTBaseSeries(object):
+    '''Candles of a single symbol and granularity shared by several feeds.
+
+    The series is fetched once and every subscribed feed reads it through
+    its own cursor, so feeds deriving different timeframes from the same
+    base granularity cost a single set of requests. Only closed candles are
+    kept and candles already read by every subscriber are released.
+
+    Instances are created and cached by ``CCXTStore.get_series``.
+    '''
+
+    def __init__(self, store, symbol, granularity, limit=100, params=None):
+        self.store = store
+        self.symbol = symbol
+        self.granularity = granularity
+        self.limit = limit
+        self.params = params or {}
+        self.period = store.exchange.parse_timeframe(granularity) * 1000
+
+        self._candles = []  # closed candles, ascending
+        self._offset = 0  # absolute index of self._candles[0]
+        self._cursors = {}  # subscriber -> absolute index of next candle
+        self._last_ts = None  # timestamp of the last closed candle
+
+    def subscribe(self, key, since=None):
+        '''Registers a reader. With ``since`` (milliseconds) the candles from
+        that time on are fetched if the series does not hold them yet'''
+        if since is not None:
+            if self._candles:
+                first = self._candles[0][0]
+            else:
+                first = self._last_ts + 1 if self._last_ts is not None else None
+
+            if first is None:
+                self._fetch(since)
+            elif since < first:
+                older = [c for c in self._fetch_range(since, first) if c[0] < first]
+                self._candles[:0] = older
+                # cursors are absolute and keep pointing at the same candles
+                self._offset -= len(older)
+
+            start = self._offset
+            for candle in self._candles:
+                if candle[0] >= since:
+                    break
+                start += 1
+            self._cursors[key] = start
+        else:
+            self._cursors[key] = self._offset + len(self._candles)
+
+    def unsubscribe(self, key):
+        self._cursors.pop(key, None)
+        self._trim()
+
+    def _now(self):
+        return self.store.milliseconds()
+
+    def _fetch_range(self, since, until=None):
+        '''Pages closed candles from ``since`` up to ``until`` (excluded)'''
+        rows = []
+        last_ts = since - 1
+        now = self._now()
+        while True:
+            data = sorted(self.store.fetch_ohlcv(self.symbol, timeframe=self.granularity,
+                                                 since=since, limit=self.limit,
+                                                 params=self.params))
+            added = 0
+            for ohlcv in data:
+                if None in ohlcv:
+                    continue
+                tstamp = ohlcv[0]
+                if tstamp + self.period > now:
+                    break  # candle not closed yet
+                if until is not None and tstamp >= until:
+                    break
+                if tstamp > last_ts:
+                    rows.append(ohlcv)
+                    last_ts = tstamp
+                    added += 1
+
+            if not added:
+                break
+            since = last_ts + 1
+
+        return rows
+
+    def _fetch(self, since=None):
+        if since is None:
+            since = self._last_ts + 1 if self._last_ts is not None else None
+
+        if since is None:
+            # nothing known yet, a single page of the most recent candles
+            now = self._now()
+            rows = [c for c in sorted(self.store.fetch_ohlcv(self.symbol, timeframe=self.granularity,
+                                                             since=None, limit=self.limit,
+                                                             params=self.params))
+                    if None not in c and c[0] + self.period <= now]
+        else:
+            rows = self._fetch_range(since)
+
+        for ohlcv in rows:
+            if self._last_ts is None or ohlcv[0] > self._last_ts:
+                self._candles.append(ohlcv)
+                self._last_ts = ohlcv[0]
+
+    def refresh(self):
+        '''Fetches the candles closed since the last refresh. No request is
+        issued until a new candle can have closed, which is what makes the
+        series be fetched once per candle however many feeds read it'''
+        if self._last_ts is not None and self._now() < self._last_ts + 2 * self.period:
+            return
+        self._fetch()
+
+    def read(self, key):
+        '''Returns the candles the subscriber ``key`` has not read yet'''
+        start = self._cursors[key] - self._offset
+        candles = self._candles[start:]
+        self._cursors[key] = self._offset + len(self._candles)
+        self._trim()
+        return candles
+
+    def _trim(self):
+        if not self._cursors:
+            return
+        consumed = min(self._cursors.values()) - self._offset
+        if consumed > 0:
+            del self._candles[:consumed]
+            self._offset += consumed
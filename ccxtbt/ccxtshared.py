@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; py-indent-offset:4 -*-
+###############################################################################
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+import backtrader as bt
+from backtrader.feed import DataBase
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency, only needed by this module
+    np = None
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_NUM = bt.date2num(_EPOCH)
+
+
+class CCXTSharedHistory(object):
+    '''OHLCV candles stored once in a memory-mapped ``(n, 6)`` float64 file
+    of ``[timestamp, open, high, low, close, volume]`` rows (timestamps in
+    milliseconds), shared by the worker processes of ``cerebro.optstrategy``.
+
+    It pickles as the path and the number of rows of the file: a worker
+    maps the same pages read-only (``array``) instead of receiving a copy
+    of the candles or fetching them again. The process creating it owns
+    the file, written in a temporary directory unless ``path`` is given,
+    and removes it on ``close``.
+    '''
+
+    Columns = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, rows, path=None):
+        if np is None:
+            raise ImportError("numpy is needed to share the history: pip install numpy")
+
+        self._tmpdir = None
+        if path is None:
+            self._tmpdir = tempfile.mkdtemp(prefix='ccxtbt-')
+            path = os.path.join(self._tmpdir, 'ohlcv.f8')
+        self.path = path
+        self.length = len(rows)
+
+        if self.length:
+            array = np.memmap(path, dtype=np.float64, mode='w+', shape=(self.length, 6))
+            array[:] = rows
+            array.flush()
+            del array
+        else:
+            open(path, 'wb').close()
+        self._owner = True
+        self._attach()
+
+    @classmethod
+    def from_feed(cls, feed, path=None):
+        '''Shares the candles of ``feed``, a ``CCXTFeed`` with ``fromdate``
+        (and ``todate``) downloading them with its usual paging and gap
+        repair, outside of cerebro'''
+        if not feed.p.fromdate:
+            # without it the feed starts live, with no history to share
+            raise ValueError('sharing the history of %s needs a fromdate' % feed.p.dataname)
+        feed.start()
+        try:
+            rows = list(feed._data)
+        finally:
+            feed.stop()
+        if feed.p.todate:
+            until = (feed.p.todate - _EPOCH).total_seconds() * 1000
+            rows = [row for row in rows if row[0] <= until]
+        return cls(rows, path=path)
+
+    def _attach(self):
+        if self.length:
+            self.array = np.memmap(self.path, dtype=np.float64, mode='r',
+                                   shape=(self.length, 6))
+        else:
+            self.array = np.empty((0, 6))
+            self.array.flags.writeable = False
+
+    def __len__(self):
+        return self.length
+
+    def __getstate__(self):
+        return {'path': self.path, 'length': self.length}
+
+    def __setstate__(self, state):
+        self.path = state['path']
+        self.length = state['length']
+        self._tmpdir = None
+        self._owner = False
+        self._attach()
+
+    def close(self):
+        '''Unmaps the file, removing it in the owning process'''
+        self.array = None
+        if self._owner:
+            self._owner = False
+            if self._tmpdir is not None:
+                shutil.rmtree(self._tmpdir, ignore_errors=True)
+            elif os.path.exists(self.path):
+                os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class CCXTSharedFeed(DataBase):
+    '''Backtesting feed delivering the candles of a ``CCXTSharedHistory``
+    (``dataname``) within ``fromdate``/``todate``, like
+    ``CCXTFeed(historical=True)`` without a store or an exchange.
+
+    For the workers of ``cerebro.optstrategy`` to map the history instead
+    of receiving the preloaded bars of every data with each strategy run,
+    run cerebro with ``optdatas=False``: each worker then preloads the
+    feed from its read-only view of the shared file::
+
+        history = CCXTSharedHistory.from_feed(store.getdata(
+            dataname='BTC/USDT', timeframe=bt.TimeFrame.Minutes,
+            fromdate=datetime(2024, 1, 1), historical=True))
+        cerebro.adddata(CCXTSharedFeed(dataname=history,
+                                       timeframe=bt.TimeFrame.Minutes))
+        cerebro.optstrategy(MyStrategy, period=range(10, 74))
+        cerebro.run(maxcpus=8, optdatas=False)
+        history.close()
+    '''
+
+    def start(self):
+        DataBase.start(self)
+        tstamps = self.p.dataname.array[:, 0]
+        self._idx, self._end = 0, len(tstamps)
+        if self.p.fromdate:
+            since = (self.p.fromdate - _EPOCH).total_seconds() * 1000
+            self._idx = int(np.searchsorted(tstamps, since, 'left'))
+        if self.p.todate:
+            until = (self.p.todate - _EPOCH).total_seconds() * 1000
+            self._end = int(np.searchsorted(tstamps, until, 'right'))
+
+    def _load(self):
+        if self._idx >= self._end:
+            return False
+
+        tstamp, open_, high, low, close, volume = self.p.dataname.array[self._idx]
+        self._idx += 1
+
+        # same resolution as CCXTFeed candles: seconds
+        self.lines.datetime[0] = _EPOCH_NUM + (int(tstamp) // 1000) / 86400.0
+        self.lines.open[0] = open_
+        self.lines.high[0] = high
+        self.lines.low[0] = low
+        self.lines.close[0] = close
+        self.lines.volume[0] = volume
+
+        return True
+
+    def islive(self):
+        return False
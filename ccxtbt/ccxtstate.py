@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; py-indent-offset:4 -*-
+###############################################################################
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import json
+import os
+
+
+class CCXTStateStore(object):
+    '''Checkpoints of a live session kept in the JSON file ``path``, so that
+    feeds and broker resume from where they stopped after a restart.
+
+    Each feed and the broker own a key. ``put`` only rewrites the file when
+    the value changed, and the file is replaced atomically so that a crash
+    while writing leaves the previous checkpoint intact.
+
+    Instances are created and cached by ``CCXTStore.get_state``, which lets
+    every feed and the broker of a session share the same file.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self._state = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self._state = json.load(f)
+
+    def get(self, key, default=None):
+        return self._state.get(key, default)
+
+    def put(self, key, value):
+        if self._state.get(key) != value:
+            self._state[key] = value
+            self._save()
+
+    def _save(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self._state, f)
+        os.replace(tmp, self.path)
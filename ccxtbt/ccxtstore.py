@@ -21,6 +21,8 @@
 from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 
+import collections
+import contextlib
 import time
 from datetime import datetime
 from functools import wraps
@@ -28,8 +30,14 @@ from functools import wraps
 import backtrader as bt
 import ccxt
 from backtrader.metabase import MetaParams
-from backtrader.utils.py3 import with_metaclass
-from ccxt.base.errors import NetworkError, ExchangeError
+from backtrader.utils.py3 import string_types, with_metaclass
+from ccxt.base.errors import NetworkError, ExchangeError, DuplicateOrderId, RequestTimeout
+
+from .ccxtmetrics import CCXTMetrics
+from .ccxtprofile import NO_SECTION
+from .ccxtreplay import CCXTReplayExchange, VirtualClock
+from .ccxtseries import CCXTBaseSeries
+from .ccxtstate import CCXTStateStore
 
 
 class MetaSingleton(MetaParams):
@@ -55,6 +63,34 @@ class CCXTStore(with_metaclass(MetaSingleton, object)):
 
     Added new private_end_point method to allow using any private non-unified end point
 
+    Every call is timed into ``metrics`` (a ``CCXTMetrics``): calls, errors,
+    timeouts and rolling latencies per endpoint.
+
+    Adaptive timeouts (``timeout_factor`` set): the ccxt ``timeout`` of each
+    call is the p99 latency of its endpoint times ``timeout_factor``,
+    clamped to ``[timeout_floor, timeout_ceiling]`` seconds. The ceiling
+    defaults to the exchange ``timeout`` and is used until
+    ``timeout_samples`` latencies were observed. A timeout is a
+    ``NetworkError`` and is retried, so a hung connection costs a few
+    times the usual latency of the endpoint instead of the full timeout.
+
+    Exchange clock (``clock_sync`` set): every ``clock_sync`` seconds the
+    offset of the exchange clock is estimated from ``clock_samples``
+    ``fetch_time`` round trips, keeping the sample with the shortest round
+    trip among the last ones (its error is at most half of it), and
+    ``milliseconds`` returns the exchange time instead of the local one.
+    ``clock_offset`` and ``clock_rtt`` (milliseconds) are also published as
+    ``metrics`` gauges.
+
+    Pacing: every attempt of a call first sleeps the exchange ``rateLimit``.
+    With a ``limiter`` (an object with ``wait()`` and ``backoff()``, e.g.
+    the ``RateLimiter`` shared by the workers of ``ccxtbt.download``) it
+    waits for the limiter instead, and a failed attempt backs the limiter
+    off, so that the retries of all its users stay within one budget.
+
+    Notifications (e.g. the ``STALE``, ``FRESH`` and ``LAGGING`` freshness
+    breaches of the feeds) reach ``notify_store`` once the store is added
+    with ``cerebro.addstore(store)``.
     '''
 
     # Supported granularities
@@ -95,13 +131,40 @@ class CCXTStore(with_metaclass(MetaSingleton, object)):
         '''Returns broker with *args, **kwargs from registered ``BrokerCls``'''
         return cls.BrokerCls(*args, **kwargs)
 
-    def __init__(self, exchange, currency, config, retries, debug=False, sandbox=False):
-        self.exchange = getattr(ccxt, exchange)(config)
+    def __init__(self, exchange, currency, config, retries, debug=False, sandbox=False,
+                 timeout_factor=None, timeout_floor=1.0, timeout_ceiling=None,
+                 timeout_samples=20, clock_sync=None, clock_samples=3, limiter=None):
+        if isinstance(exchange, string_types):
+            self.exchange = getattr(ccxt, exchange)(config)
+        else:  # an exchange instance, e.g. a CCXTReplayExchange
+            self.exchange = exchange
         if sandbox:
             self.exchange.set_sandbox_mode(True)
         self.currency = currency
         self.retries = retries
         self.debug = debug
+        self.limiter = limiter  # shared pacing of the calls instead of rateLimit
+        self._raising = ()  # errors not retried, see raising
+        self._series = {}  # (symbol, granularity) -> shared CCXTBaseSeries
+        self._futures_poller = None  # shared CCXTFuturesPoller
+        self._states = {}  # path -> shared CCXTStateStore
+        self.notifs = collections.deque()  # store notifications, see put_notification
+        self._started = False  # added to cerebro, which drains the notifications
+
+        self.metrics = CCXTMetrics()
+        self.profiler = None  # CCXTProfiler attached while profiling
+        self.timeout_factor = timeout_factor
+        self.timeout_floor = timeout_floor
+        self.timeout_ceiling = timeout_ceiling or self.exchange.timeout / 1000.0
+        self._exchange_timeout = self.exchange.timeout  # restored after each timed call
+        self.timeout_samples = timeout_samples
+
+        self.clock_sync = clock_sync if self.has('fetchTime') else None
+        self.clock_offset = 0.0  # exchange minus local time, milliseconds
+        self.clock_rtt = None
+        self.clock_samples = clock_samples  # fetch_time round trips per sync
+        self._clock_samples = collections.deque(maxlen=max(8, clock_samples))  # (rtt, offset)
+        self._clock_synced = None  # monotonic time of the last sync
 
         # if binance and futures, set hedge mode
         # if exchange == 'binance':
@@ -145,25 +208,202 @@ class CCXTStore(with_metaclass(MetaSingleton, object)):
 
         return granularity
 
+    def get_series(self, symbol, granularity, limit=100, params=None):
+        '''Returns the ``CCXTBaseSeries`` shared by all feeds reading the
+        candles of ``symbol`` at ``granularity``'''
+        key = (symbol, granularity)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = CCXTBaseSeries(self, symbol, granularity,
+                                                        limit=limit, params=params)
+        return series
+
+    def get_futures_poller(self, interval=60.0, open_interest=True):
+        '''Returns the ``CCXTFuturesPoller`` shared by all futures feeds. The
+        shortest interval and any request for open interest win'''
+        from .ccxtfutures import CCXTFuturesPoller
+
+        poller = self._futures_poller
+        if poller is None:
+            poller = self._futures_poller = CCXTFuturesPoller(self, interval=interval,
+                                                              open_interest=open_interest)
+        else:
+            poller.interval = min(poller.interval, interval)
+            poller.open_interest = poller.open_interest or open_interest
+        return poller
+
+    def get_state(self, path):
+        '''Returns the ``CCXTStateStore`` checkpointing to ``path`` shared by
+        the feeds and the broker'''
+        state = self._states.get(path)
+        if state is None:
+            state = self._states[path] = CCXTStateStore(path)
+        return state
+
+    def start(self, data=None, broker=None):
+        '''Called by cerebro for a store added with ``cerebro.addstore``,
+        which delivers its notifications to ``notify_store``'''
+        self._started = True
+
+    def stop(self):
+        self._started = False
+        self.notifs.clear()
+
+    def put_notification(self, msg, *args, **kwargs):
+        '''Queues a store notification, e.g. ``'STALE'`` from a feed. They
+        are dropped unless the store was added to cerebro, as nothing would
+        consume them'''
+        if self._started:
+            self.notifs.append((msg, args, kwargs))
+
+    def get_notifications(self):
+        '''Returns the pending store notifications'''
+        self.notifs.append(None)  # mark, the feeds could still append
+        return [x for x in iter(self.notifs.popleft, None)]
+
+    def has(self, feature, native=False):
+        '''Whether the exchange supports ``feature``, e.g. ``fetchOrders``.
+        With ``native`` the features ccxt emulates (``'emulated'``, e.g. an
+        ``editOrder`` which cancels and creates the full amount again) do
+        not count'''
+        if native:
+            return self.exchange.has.get(feature) is True
+        return bool(self.exchange.has.get(feature))
+
+    def milliseconds(self):
+        '''Current time in milliseconds as seen by the exchange (the virtual
+        time of a replay), corrected by the clock offset with
+        ``clock_sync``'''
+        if self.clock_sync is not None and (
+                self._clock_synced is None or
+                time.monotonic() - self._clock_synced >= self.clock_sync):
+            self.sync_clock()
+        return int(self.exchange.milliseconds() + self.clock_offset)
+
+    def sync_clock(self):
+        '''Samples the exchange clock ``clock_samples`` times with
+        ``fetch_time`` and returns the estimated offset: the exchange time
+        minus the local time at the middle of the round trip, of the sample
+        with the shortest round trip'''
+        self._clock_synced = time.monotonic()
+        for _ in range(self.clock_samples):
+            sent = self.exchange.milliseconds()
+            try:
+                server = self._timed('fetch_time', self.exchange.fetch_time)
+            except (NetworkError, ExchangeError) as e:
+                print(str(e))
+                continue
+            received = self.exchange.milliseconds()
+            self._clock_samples.append((received - sent, server - (sent + received) / 2.0))
+
+        if not self._clock_samples:
+            return self.clock_offset  # never sampled, the local time is used
+        self.clock_rtt, self.clock_offset = min(self._clock_samples)
+        self.metrics.gauge('clock.offset', self.clock_offset)
+        self.metrics.gauge('clock.rtt', self.clock_rtt)
+        return self.clock_offset
+
+    def exhausted(self):
+        '''Whether the exchange has no more candles to give, which ends the
+        live feeds. Only a replayed history (``CCXTReplayExchange``) ends'''
+        return isinstance(self.exchange, CCXTReplayExchange) and self.exchange.finished
+
+    def sleep(self, seconds):
+        '''Sleeps ``seconds`` of exchange time (virtual time for a replay)'''
+        clock = getattr(self.exchange, 'clock', None)
+        if isinstance(clock, VirtualClock):
+            clock.sleep(seconds)
+        elif seconds > 0:
+            time.sleep(seconds)
+
     def get_type(self):
         if "defaultType" in self.exchange.options:
             return self.exchange.options['defaultType']
         return None
 
+    def timeout(self, endpoint):
+        '''Timeout in seconds of the next call to ``endpoint``, ``None`` if
+        timeouts are not adaptive'''
+        if self.timeout_factor is None:
+            return None
+        window = self.metrics.latencies.get(endpoint)
+        if window is None or len(window) < self.timeout_samples:
+            return self.timeout_ceiling
+        timeout = window.percentile(99) * self.timeout_factor
+        return min(max(timeout, self.timeout_floor), self.timeout_ceiling)
+
+    def section(self, name):
+        '''Profiler section ``name``, a no-op when not profiling'''
+        if self.profiler is None:
+            return NO_SECTION
+        return self.profiler.section(name)
+
+    def _timed(self, endpoint, call, *args, **kwargs):
+        '''Calls ``call`` with the timeout of ``endpoint`` and records the
+        call in ``metrics``. ccxt has no per call timeout: the exchange
+        ``timeout`` is set for the call and then set back to the configured
+        one, which the calls made outside of the store keep'''
+        timeout = self.timeout(endpoint)
+        if timeout is not None:
+            self.exchange.timeout = int(timeout * 1000)
+
+        self.metrics.count(endpoint + '.calls')
+        started = time.monotonic()
+        try:
+            with self.section(endpoint):
+                return call(*args, **kwargs)
+        except RequestTimeout:
+            self.metrics.count(endpoint + '.timeouts')
+            raise
+        except (NetworkError, ExchangeError):
+            self.metrics.count(endpoint + '.errors')
+            raise
+        finally:
+            if timeout is not None:
+                self.exchange.timeout = self._exchange_timeout
+            # a timeout counts for its duration, raising the next timeouts
+            self.metrics.observe(endpoint, time.monotonic() - started)
+
+    @contextlib.contextmanager
+    def raising(self, *errors):
+        '''Within the block the calls raise ``errors`` at once instead of
+        retrying them, for a caller retrying on its own, e.g. the order
+        scheduler of the broker re-queuing throttled actions'''
+        saved, self._raising = self._raising, errors
+        try:
+            yield
+        finally:
+            self._raising = saved
+
+    def _pace(self):
+        '''Waits before an attempt: the ``limiter`` or the exchange
+        ``rateLimit``'''
+        with self.section('limiter.sleep'):
+            if self.limiter is not None:
+                self.limiter.wait()
+            else:
+                time.sleep(self.exchange.rateLimit / 1000)
+
+    def _failed(self):
+        if self.limiter is not None:
+            self.limiter.backoff()
+
     def retry(method):
         @wraps(method)
         def retry_method(self, *args, **kwargs):
             for i in range(self.retries):
                 if self.debug:
                     print('{} - {} - Attempt {}'.format(datetime.now(), method.__name__, i))
-                time.sleep(self.exchange.rateLimit / 1000)
+                self._pace()
                 try:
-                    return method(self, *args, **kwargs)
+                    # RequestTimeout is a NetworkError, timeouts are retried
+                    return self._timed(method.__name__, method, self, *args, **kwargs)
                 except (NetworkError , ExchangeError) as e:
                     # if exchange error, should return the error msg
                     print( str(e) )
-                    if i == self.retries - 1:
+                    if i == self.retries - 1 or isinstance(e, self._raising):
                         raise
+                    self._failed()
 
         return retry_method
 
@@ -198,19 +438,105 @@ class CCXTStore(with_metaclass(MetaSingleton, object)):
         return positions
         # return self.getvalue(currency)
 
-    @retry
     def create_order(self, symbol, order_type, side, amount, price, params):
-        # returns the order
-        return self.exchange.create_order(symbol=symbol, type=order_type, side=side,
-                                          amount=amount, price=price, params=params)
+        '''Creates an order and returns it, retried like ``retry``.
+
+        With a ``clientOrderId`` in ``params`` a network error (e.g. a
+        timeout) is not blindly retried, as the order may have reached the
+        exchange: it is first looked up by its client order id and only
+        sent again if not found. A duplicate client order id rejected by
+        the exchange is resolved the same way'''
+        client_id = params.get('clientOrderId')
+        for i in range(self.retries):
+            if self.debug:
+                print('{} - create_order - Attempt {}'.format(datetime.now(), i))
+            self._pace()
+            try:
+                return self._timed('create_order', self.exchange.create_order, symbol=symbol,
+                                   type=order_type, side=side, amount=amount, price=price,
+                                   params=params)
+            except (NetworkError, DuplicateOrderId) as e:
+                print(str(e))
+                if isinstance(e, self._raising):
+                    raise
+                if client_id is not None:
+                    order = self.fetch_order_by_client_id(symbol, client_id)
+                    if order is not None:
+                        return order
+                if i == self.retries - 1:
+                    raise
+                self._failed()
+            except ExchangeError as e:
+                print(str(e))
+                if i == self.retries - 1 or isinstance(e, self._raising):
+                    raise
+                self._failed()
+
+    def fetch_order_by_client_id(self, symbol, client_id):
+        '''Returns the order of ``symbol`` with ``client_id`` among the open
+        and recent orders, ``None`` if the exchange does not know it (or
+        could not be asked)'''
+        try:
+            if self.has('fetchOrders'):
+                orders = self.fetch_orders(symbol)
+            else:
+                orders = self.fetch_open_orders(symbol)
+                if self.has('fetchClosedOrders'):
+                    orders = orders + self.fetch_closed_orders(symbol)
+        except (NetworkError, ExchangeError):
+            return None  # printed by retry
+
+        for order in orders:
+            if order.get('clientOrderId') == client_id:
+                return order
+        return None
+
+    @retry
+    def edit_order(self, order_id, symbol, order_type, side, amount, price, params={}):
+        return self.exchange.edit_order(order_id, symbol, order_type, side,
+                                        amount=amount, price=price, params=params)
 
     @retry
     def cancel_order(self, order_id, symbol):
         return self.exchange.cancel_order(order_id, symbol)
 
     @retry
-    def fetch_trades(self, symbol):
-        return self.exchange.fetch_trades(symbol)
+    def fetch_trades(self, symbol, since=None, limit=None, params={}):
+        if self.debug:
+            print('Fetching Trades: {}, Since: {}, Limit: {}'.format(symbol, since, limit))
+        return self.exchange.fetch_trades(symbol, since=since, limit=limit, params=params)
+
+    @retry
+    def fetch_funding_rate(self, symbol):
+        return self.exchange.fetch_funding_rate(symbol)
+
+    @retry
+    def fetch_funding_rates(self, symbols=None):
+        return self.exchange.fetch_funding_rates(symbols)
+
+    @retry
+    def fetch_funding_rate_history(self, symbol, since=None, limit=None):
+        return self.exchange.fetch_funding_rate_history(symbol, since=since, limit=limit)
+
+    @retry
+    def fetch_open_interest(self, symbol):
+        return self.exchange.fetch_open_interest(symbol)
+
+    @retry
+    def fetch_open_interests(self, symbols=None):
+        return self.exchange.fetch_open_interests(symbols)
+
+    @retry
+    def fetch_ticker(self, symbol):
+        return self.exchange.fetch_ticker(symbol)
+
+    @retry
+    def fetch_trading_fees(self):
+        return self.exchange.fetch_trading_fees()
+
+    @retry
+    def fetch_order_book(self, symbol, limit=None, params={}):
+        return self.exchange.fetch_order_book(symbol, limit=limit, params=params)
 
     @retry
     def fetch_ohlcv(self, symbol, timeframe, since, limit, params={}):
@@ -222,6 +548,14 @@ class CCXTStore(with_metaclass(MetaSingleton, object)):
     def fetch_order(self, oid, symbol):
         return self.exchange.fetch_order(oid, symbol)
 
+    @retry
+    def fetch_orders(self, symbol=None):
+        return self.exchange.fetch_orders(symbol)
+
+    @retry
+    def fetch_closed_orders(self, symbol=None):
+        return self.exchange.fetch_closed_orders(symbol)
+
     @retry
     def fetch_open_orders(self, symbol=None):
         if symbol == None:
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; py-indent-offset:4 -*-
+###############################################################################
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import collections
+import time
+
+from .ccxtmetrics import LatencyHistogram
+
+
+class CCXTOrderTrace(object):
+    '''Lifecycle of an order: the monotonic time (seconds) of each stage
+    (``submit``, ``send``, ``ack``, ``completed``, ``canceled``,
+    ``notified``), of each fill (``fills``) and the exchange timestamps
+    (milliseconds) of the order creation and of its fills'''
+
+    __slots__ = ('ref', 'symbol', 'type', 'stages', 'fills', 'exchange')
+
+    def __init__(self, ref, symbol, type):
+        self.ref = ref
+        self.symbol = symbol
+        self.type = type
+        self.stages = {}
+        self.fills = []
+        self.exchange = {'created': None, 'fills': []}
+
+    def span(self, start, end):
+        '''Seconds between two stages (``fill`` is the first fill), ``None``
+        if one did not happen'''
+        times = [self.fills[0] if s == 'fill' and self.fills else self.stages.get(s)
+                 for s in (start, end)]
+        if None in times:
+            return None
+        return times[1] - times[0]
+
+    def asdict(self):
+        return {'ref': self.ref, 'symbol': self.symbol, 'type': self.type,
+                'stages': dict(self.stages), 'fills': list(self.fills),
+                'exchange': {'created': self.exchange['created'],
+                             'fills': list(self.exchange['fills'])}}
+
+
+class CCXTOrderTracer(object):
+    '''Traces the lifecycle of the orders of a broker with ``clock``
+    (monotonic) and aggregates, once an order is completed, these spans in
+    a ``LatencyHistogram`` per symbol and order type:
+
+      - ``queued``: submit to send (brackets, scheduler, trailing stops)
+      - ``ack``: send to the answer of the exchange
+      - ``first_fill``: send to the first fill seen
+      - ``completed``: submit to completion
+      - ``notified``: completion to the delivery of its notification
+      - ``exchange_fill``: order creation to its first fill, both as
+        timestamped by the exchange
+
+    The last ``history`` traces are kept.
+    '''
+
+    SPANS = (('queued', 'submit', 'send'), ('ack', 'send', 'ack'),
+             ('first_fill', 'send', 'fill'), ('completed', 'submit', 'completed'))
+
+    def __init__(self, history=1000, clock=time.monotonic):
+        self.history = history
+        self.clock = clock
+        self.traces = collections.OrderedDict()  # order ref -> CCXTOrderTrace
+        self.histograms = {}  # (symbol, type) -> {span: LatencyHistogram}
+
+    def trace(self, order):
+        '''Trace of ``order`` (or of its ref), ``None`` if not traced'''
+        return self.traces.get(getattr(order, 'ref', order))
+
+    def _trace(self, order):
+        trace = self.traces.get(order.ref)
+        if trace is None:
+            trace = self.traces[order.ref] = CCXTOrderTrace(order.ref, order.data.p.dataname,
+                                                             order.ccxt_order.get('type'))
+            while len(self.traces) > self.history:
+                self.traces.popitem(last=False)
+        return trace
+
+    def mark(self, order, stage):
+        '''Records the first time ``order`` reaches ``stage``'''
+        trace = self._trace(order)
+        if stage not in trace.stages:
+            trace.stages[stage] = self.clock()
+            if stage == 'completed':
+                self._aggregate(trace)
+            elif stage == 'notified' and 'completed' in trace.stages:
+                self._add(trace, 'notified', trace.span('completed', 'notified'))
+
+    def ack(self, order, ccxt_order):
+        trace = self._trace(order)
+        trace.type = ccxt_order.get('type') or trace.type
+        trace.exchange['created'] = ccxt_order.get('timestamp')
+        self.mark(order, 'ack')
+
+    def fill(self, order, timestamp=None):
+        '''Records a fill, ``timestamp`` being its exchange timestamp'''
+        trace = self._trace(order)
+        trace.fills.append(self.clock())
+        trace.exchange['fills'].append(timestamp)
+
+    def _add(self, trace, span, seconds):
+        if seconds is None:
+            return
+        spans = self.histograms.setdefault((trace.symbol, trace.type), {})
+        histogram = spans.get(span)
+        if histogram is None:
+            histogram = spans[span] = LatencyHistogram()
+        histogram.add(seconds)
+
+    def _aggregate(self, trace):
+        for span, start, end in self.SPANS:
+            self._add(trace, span, trace.span(start, end))
+
+        created, fills = trace.exchange['created'], trace.exchange['fills']
+        if created is not None and fills and fills[0] is not None:
+            self._add(trace, 'exchange_fill', max(fills[0] - created, 0) / 1000.0)
+
+    def snapshot(self):
+        '''Histograms as ``{'symbol type': {span: histogram snapshot}}``'''
+        return dict(('%s %s' % key, dict((span, h.snapshot()) for span, h in spans.items()))
+                    for key, spans in self.histograms.items())
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; py-indent-offset:4 -*-
+###############################################################################
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import heapq
+import itertools
+
+
+class _Generation(object):
+    '''Stops sharing the same reference price ``ref``: the best (highest)
+    price seen since the creation of the oldest of them. ``heap`` is keyed
+    by the trail (amount or percent), the smallest trail having the
+    highest trigger'''
+
+    __slots__ = ('ref', 'heap', 'version')
+
+    def __init__(self, ref):
+        self.ref = ref
+        self.heap = []
+        self.version = 0
+
+
+class TrailBook(object):
+    '''Trailing stops of one symbol, side and kind of trail.
+
+    Prices are mirrored (negated) for buy stops, so that every stop
+    triggers when the price falls to ``trigger(ref, trail)`` with ``ref``
+    the highest price since its creation.
+
+    Stops created at different times only differ by their reference until
+    a new high, which gives all of them the same one. They are kept in a
+    stack of generations whose references decrease from the oldest to the
+    newest: a new high merges the generations at the top of the stack
+    (smaller heap into larger one) and a lazy heap over the generations,
+    keyed by their best trigger, finds the crossed triggers. Adding,
+    ratcheting and firing are O(log n) amortized (times the merges).
+    '''
+
+    def __init__(self, trigger):
+        self.trigger = trigger
+        self.stack = []  # generations, oldest first
+        self.triggers = []  # lazy heap of (-trigger, seq, version, generation)
+        self._seq = itertools.count()
+
+    def __len__(self):
+        return sum(len(g.heap) for g in self.stack)
+
+    def _push(self, gen):
+        gen.version += 1
+        if gen.heap:
+            best = self.trigger(gen.ref, gen.heap[0][0])
+            heapq.heappush(self.triggers, (-best, next(self._seq), gen.version, gen))
+
+    def add(self, price, trail, stop):
+        '''Adds ``stop`` trailing by ``trail``, ``price`` being the current
+        (mirrored) price'''
+        self.ratchet(price)
+        if self.stack and self.stack[-1].ref == price:
+            gen = self.stack[-1]
+        else:
+            gen = _Generation(price)
+            self.stack.append(gen)
+        heapq.heappush(gen.heap, (trail, next(self._seq), stop))
+        self._push(gen)
+
+    def ratchet(self, price):
+        '''Moves to ``price`` the reference of the stops which have not seen
+        it yet'''
+        if not self.stack or self.stack[-1].ref >= price:
+            return
+
+        merged = []
+        while self.stack and self.stack[-1].ref < price:
+            merged.append(self.stack.pop())
+
+        gen = max(merged, key=lambda g: len(g.heap))
+        for other in merged:
+            if other is not gen:
+                other.version += 1  # its entries in triggers are stale
+                for item in other.heap:
+                    heapq.heappush(gen.heap, item)
+        gen.ref = price
+        self.stack.append(gen)
+        self._push(gen)
+
+    def remove(self, stop):
+        '''Removes ``stop`` (e.g. canceled before its trigger), ``False`` if
+        it is not in the book. O(n), cancels being rare'''
+        for gen in self.stack:
+            heap = [item for item in gen.heap if item[2] is not stop]
+            if len(heap) == len(gen.heap):
+                continue
+
+            heapq.heapify(heap)
+            gen.heap = heap
+            self._push(gen)  # also turns its old entries stale
+            if not heap:
+                self.stack.remove(gen)
+            return True
+        return False
+
+    def crossed(self, price):
+        '''Pops and returns the stops whose trigger is at or above
+        ``price``'''
+        fired = []
+        while self.triggers and -self.triggers[0][0] >= price:
+            _, _, version, gen = heapq.heappop(self.triggers)
+            if version != gen.version:
+                continue  # stale
+
+            while gen.heap and self.trigger(gen.ref, gen.heap[0][0]) >= price:
+                trail, _, stop = heapq.heappop(gen.heap)
+                fired.append((stop, self.trigger(gen.ref, trail)))
+            self._push(gen)
+
+        if fired:  # drop the emptied generations
+            self.stack = [g for g in self.stack if g.heap]
+        return fired
+
+
+# trigger(ref, trail) of the 4 books, buy prices being mirrored
+_TRIGGERS = {
+    ('sell', 'amount'): lambda ref, trail: ref - trail,
+    ('sell', 'percent'): lambda ref, trail: ref * (1.0 - trail),
+    ('buy', 'amount'): lambda ref, trail: ref - trail,
+    ('buy', 'percent'): lambda ref, trail: ref * (1.0 + trail),
+}
+
+
+class CCXTTrailingStops(object):
+    '''Client-side trailing stops of a broker, kept in one ``TrailBook``
+    per symbol, side and kind of trail (``trailamount`` or
+    ``trailpercent``).
+
+    ``update`` is given the bars (or ticks) of a symbol: the stops crossed
+    by the bar are returned with their trigger price, then the remaining
+    stops ratchet with the close. Nothing is sent to the exchange before a
+    stop fires.
+    '''
+
+    def __init__(self):
+        self.books = {}  # symbol -> {(side, kind): TrailBook}
+
+    def __len__(self):
+        return sum(len(b) for books in self.books.values() for b in books.values())
+
+    def add(self, symbol, side, price, stop, trailamount=None, trailpercent=None):
+        kind, trail = ('amount', trailamount) if trailamount else ('percent', trailpercent)
+        books = self.books.setdefault(symbol, {})
+        book = books.get((side, kind))
+        if book is None:
+            book = books[(side, kind)] = TrailBook(_TRIGGERS[(side, kind)])
+        book.add(price if side == 'sell' else -price, trail, stop)
+
+    def remove(self, symbol, stop):
+        '''Removes a stop not triggered yet, dropping the emptied books'''
+        books = self.books.get(symbol, {})
+        for key, book in list(books.items()):
+            if book.remove(stop):
+                if not len(book):
+                    del books[key]
+                if not books:
+                    del self.books[symbol]
+                return True
+        return False
+
+    def update(self, symbol, high, low, close):
+        '''Returns the ``(stop, trigger price)`` crossed by a bar, dropping
+        the emptied books'''
+        fired = []
+        books = self.books.get(symbol, {})
+        for (side, kind), book in list(books.items()):
+            if side == 'sell':
+                fired.extend(book.crossed(low))
+                book.ratchet(close)
+            else:
+                fired.extend((stop, -trigger) for stop, trigger in book.crossed(-high))
+                book.ratchet(-close)
+            if not len(book):
+                del books[(side, kind)]
+        if symbol in self.books and not books:
+            del self.books[symbol]
+        return fired
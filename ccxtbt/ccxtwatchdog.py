@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; py-indent-offset:4 -*-
+###############################################################################
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+
+class CCXTFreshness(object):
+    '''Freshness of a live feed delivering a bar every ``period``
+    milliseconds, measured against the exchange time without any request:
+
+      - age: seconds since the close of the last delivered bar, stale once
+        over ``stale_after`` seconds
+      - lag: seconds between the close of a bar and its delivery, a breach
+        when over ``max_lag`` seconds (``None`` for no limit)
+
+    Both are recorded in ``metrics`` (a ``CCXTMetrics``) under ``name``:
+    the ``<name>.age`` gauge, the ``<name>.lag`` latencies and the
+    ``<name>.stale`` and ``<name>.lagging`` breach counters.
+    '''
+
+    def __init__(self, name, period, metrics, stale_after, max_lag=None):
+        self.name = name
+        self.period = period
+        self.metrics = metrics
+        self.stale_after = stale_after
+        self.max_lag = max_lag
+        self.last = None  # timestamp of the last delivered bar
+        self.since = None  # exchange time the watch started, for the first bar
+        self.age = 0.0
+        self.lag = None
+        self.stale = False
+
+    def delivered(self, tstamp, now):
+        '''Records the delivery of the bar starting at ``tstamp`` at the
+        exchange time ``now``. Returns the lag if it breaches ``max_lag``'''
+        self.last = tstamp
+        # a bar still forming (exchanges returning it) is not late
+        self.lag = max(now - tstamp - self.period, 0) / 1000.0
+        self.metrics.observe(self.name + '.lag', self.lag)
+        if self.max_lag is not None and self.lag > self.max_lag:
+            self.metrics.count(self.name + '.lagging')
+            return self.lag
+        return None
+
+    def check(self, now):
+        '''Updates the age at the exchange time ``now``. Returns ``True``
+        when the feed turns stale, ``False`` when it is fresh again and
+        ``None`` if nothing changed'''
+        if self.last is None:
+            if self.since is None:
+                self.since = now
+            closed = self.since
+        else:
+            closed = self.last + self.period
+        self.age = max(now - closed, 0) / 1000.0
+        self.metrics.gauge(self.name + '.age', self.age)
+
+        stale = self.age > self.stale_after
+        if stale == self.stale:
+            return None
+        self.stale = stale
+        if stale:
+            self.metrics.count(self.name + '.stale')
+        return stale
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- coding: utf-8; py-indent-offset:4 -*-
+###############################################################################
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+###############################################################################
+'''Bulk download of OHLCV history into a local ``CCXTDataStore``.
+
+Example::
+
+  python -m ccxtbt.download --exchange binance \\
+      --symbols BTC/USDT ETH/USDT --timeframes 1m 1h \\
+      --fromdate 2021-01-01 --todate 2021-06-01 --root data
+
+Every symbol/timeframe pair is downloaded by a pool of workers sharing a
+single request budget, retries included, and resumes from the last stored
+candle. With ``--export parquet`` (or ``arrow``) every pair is also written
+next to its CSV file for ``CCXTArrowFeed``.
+'''
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+from .ccxtdatastore import CCXTDataStore
+from .ccxtstore import CCXTStore
+
+
+class RateLimiter(object):
+    '''Spaces the requests issued by several threads ``1 / rate`` seconds
+    apart. ``backoff`` (a failed request) delays the next request of every
+    thread by ``penalty`` seconds'''
+
+    def __init__(self, rate, penalty=1.0):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.penalty = penalty
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def backoff(self):
+        with self._lock:
+            self._next = max(time.monotonic(), self._next) + self.penalty
+
+
+def _to_ms(dtime):
+    return int((dtime - datetime(1970, 1, 1)).total_seconds() * 1000)
+
+
+def download(store, datastore, exchange, symbol, granularity, since, until, limit=1000):
+    '''Downloads the closed candles of ``symbol`` in ``[since, until)``,
+    resuming after the last candle in ``datastore``. The requests are
+    paced by the ``limiter`` of the store, if any. Returns the number of
+    requests issued and candles stored'''
+    period = store.exchange.parse_timeframe(granularity) * 1000
+    until = min(until, int(time.time() * 1000) - period + 1)  # closed candles only
+
+    last_ts = datastore.last_timestamp(exchange, symbol, granularity)
+    if last_ts is not None:
+        since = max(since, last_ts + period)
+
+    requests = stored = 0
+    while since < until:
+        data = store.fetch_ohlcv(symbol, timeframe=granularity, since=since, limit=limit)
+        requests += 1
+
+        rows = [r for r in sorted(data) if None not in r and since <= r[0] < until]
+        if not rows:
+            break
+
+        stored += datastore.append(exchange, symbol, granularity, rows)
+        since = rows[-1][0] + period
+
+    return requests, stored
+
+
+def parse_args(pargs=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m ccxtbt.download',
+        description='Download OHLCV history into a local data store')
+
+    parser.add_argument('--exchange', required=True, help='ccxt exchange id')
+    parser.add_argument('--symbols', nargs='*', default=[], help='Symbols, e.g. BTC/USDT')
+    parser.add_argument('--symbols-file', help='File with one symbol per line')
+    parser.add_argument('--timeframes', nargs='+', default=['1m'], help='ccxt timeframes, e.g. 1m 1h')
+    parser.add_argument('--fromdate', required=True, help='Start date YYYY-MM-DD[THH:MM]')
+    parser.add_argument('--todate', help='End date YYYY-MM-DD[THH:MM] (default: now)')
+    parser.add_argument('--root', default='data', help='Root directory of the data store')
+    parser.add_argument('--limit', type=int, default=1000, help='Candles per request')
+    parser.add_argument('--workers', type=int, default=4, help='Parallel downloads')
+    parser.add_argument('--rate', type=float, default=None,
+                        help='Requests per second for all workers (default: exchange rate limit)')
+    parser.add_argument('--retries', type=int, default=5, help='Retries per request')
+    parser.add_argument('--export', choices=['parquet', 'arrow'],
+                        help='Also write every pair in this format for CCXTArrowFeed')
+
+    return parser.parse_args(pargs)
+
+
+def _parse_date(text):
+    for fmt in ('%Y-%m-%dT%H:%M', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            pass
+    raise ValueError('invalid date: %s' % text)
+
+
+def main(pargs=None):
+    args = parse_args(pargs)
+
+    symbols = list(args.symbols)
+    if args.symbols_file:
+        with open(args.symbols_file) as f:
+            symbols.extend(line.strip() for line in f if line.strip())
+
+    since = _to_ms(_parse_date(args.fromdate))
+    until = _to_ms(_parse_date(args.todate)) if args.todate else int(time.time() * 1000)
+
+    # requests and retries are paced by the shared limiter, not by ccxt per
+    # thread nor by the rateLimit sleep of the store
+    store = CCXTStore(exchange=args.exchange, currency=None,
+                      config={'enableRateLimit': False}, retries=args.retries)
+    for granularity in args.timeframes:
+        if store.exchange.timeframes and granularity not in store.exchange.timeframes:
+            raise ValueError("'%s' exchange doesn't support fetching OHLCV data for "
+                             "%s time frame" % (store.exchange.name, granularity))
+
+    rate = args.rate or 1000.0 / store.exchange.rateLimit
+    store.limiter = RateLimiter(rate)
+    datastore = CCXTDataStore(args.root)
+
+    tasks = [(symbol, granularity) for symbol in symbols for granularity in args.timeframes]
+    total_requests = total_stored = 0
+    started = time.time()
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(download, store, datastore, args.exchange, symbol, granularity,
+                               since, until, args.limit): (symbol, granularity)
+                   for symbol, granularity in tasks}
+
+        for future in as_completed(futures):
+            symbol, granularity = futures[future]
+            try:
+                requests, stored = future.result()
+            except Exception as e:
+                print('{} {}: FAILED {}'.format(symbol, granularity, e))
+                continue
+
+            if args.export:
+                datastore.export(args.exchange, symbol, granularity,
+                                 datastore.path(args.exchange, symbol, granularity, args.export))
+
+            total_requests += requests
+            total_stored += stored
+            elapsed = time.time() - started
+            print('{} {}: {} candles in {} requests - total {} candles, {:.1f} candles/s, '
+                  '{:.2f} requests/s'.format(symbol, granularity, stored, requests, total_stored,
+                                             total_stored / elapsed, total_requests / elapsed))
+
+    elapsed = time.time() - started
+    print('Done: {} pairs, {} candles, {} requests in {:.1f}s'.format(
+        len(tasks), total_stored, total_requests, elapsed))
+
+
+if __name__ == '__main__':
+    main()
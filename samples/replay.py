@@ -0,0 +1,56 @@
+import time
+import tracemalloc
+from datetime import datetime
+
+import backtrader as bt
+
+from ccxtbt import CCXTDataStore, CCXTReplayExchange, CCXTStore
+
+# Soak test of the live code path: replays a month of 1m candles previously
+# downloaded with `python -m ccxtbt.download` at 2000x real time with a
+# simulated exchange latency of 100ms, then reports the per-bar overhead
+# and the memory growth.
+
+
+def main():
+    class SoakStrategy(bt.Strategy):
+        def __init__(self):
+            self.sma = bt.indicators.SMA(self.data, period=20)
+            self.bars = 0
+            self.started = time.time()
+            tracemalloc.start()
+            self.memstart = tracemalloc.get_traced_memory()[0]
+
+        def next(self):
+            self.bars += 1
+            if not self.position and self.data.close[0] > self.sma[0]:
+                self.buy(size=0.001)
+            elif self.position and self.data.close[0] < self.sma[0]:
+                self.sell(size=0.001)
+
+            if self.bars % 1000 == 0:
+                elapsed = time.time() - self.started
+                memory = tracemalloc.get_traced_memory()[0] - self.memstart
+                print('{} bars: {:.2f}ms per bar, memory growth {:.1f}KB'.format(
+                    self.bars, elapsed * 1000 / self.bars, memory / 1024))
+
+    since = int((datetime(2021, 1, 1) - datetime(1970, 1, 1)).total_seconds() * 1000)
+    until = int((datetime(2021, 2, 1) - datetime(1970, 1, 1)).total_seconds() * 1000)
+    exchange = CCXTReplayExchange.from_datastore(CCXTDataStore('data'), 'binance',
+                                                 [('BTC/USDT', '1m')], since, until,
+                                                 speed=2000, latency=0.1)
+
+    store = CCXTStore(exchange=exchange, currency='USDT', config={'secret': ''}, retries=5)
+
+    cerebro = bt.Cerebro(quicknotify=True)
+    cerebro.setbroker(store.getbroker(compact_orders=True, order_history=100))
+    cerebro.adddata(store.getdata(dataname='BTC/USDT', timeframe=bt.TimeFrame.Minutes,
+                                  compression=1, ohlcv_limit=100, maxbars=0))
+    cerebro.addstrategy(SoakStrategy)
+    cerebro.run(exactbars=1)
+
+    print('Exchange calls: {}'.format(dict(exchange.stats)))
+
+
+if __name__ == '__main__':
+    main()
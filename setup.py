@@ -10,4 +10,5 @@ setup(
    license='MIT',
    packages=['ccxtbt'],  
    install_requires=['backtrader','ccxt'],
+   extras_require={'arrow': ['pyarrow', 'numpy']},
 )
@@ -0,0 +1,76 @@
+import unittest
+
+import ccxt
+
+from ccxtbt import CCXTReplayExchange, CCXTStore, LatencyWindow
+
+MINUTE = 60 * 1000
+
+
+class HangingExchange(CCXTReplayExchange):
+    '''Times out the first ``fetch_ohlcv``, recording the timeout it was
+    called with'''
+
+    def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None, params={}):
+        self.timeouts = getattr(self, 'timeouts', []) + [self.timeout]
+        if len(self.timeouts) == 1:
+            raise ccxt.RequestTimeout('timed out')
+        return super(HangingExchange, self).fetch_ohlcv(symbol, timeframe, since, limit, params)
+
+
+class TestAdaptiveTimeouts(unittest.TestCase):
+
+    def setUp(self):
+        CCXTStore._singleton = None
+
+    def tearDown(self):
+        CCXTStore._singleton = None
+
+    def store(self, **kwargs):
+        rows = [[i * MINUTE, 100.0, 101.0, 99.0, 100.5, 1.0] for i in range(1, 21)]
+        exchange = HangingExchange({('BTC/USDT', '1m'): rows}, start=21 * MINUTE)
+        return CCXTStore(exchange=exchange, currency='USDT', config={}, retries=3, **kwargs)
+
+    def test_percentile(self):
+        window = LatencyWindow(size=100)
+        for i in range(1, 201):
+            window.add(i / 1000.0)
+        self.assertEqual(len(window), 100)
+        self.assertEqual(window.percentile(50), 0.15)
+        self.assertEqual(window.percentile(99), 0.199)
+        self.assertIsNone(LatencyWindow().percentile(99))
+
+    def test_timeout_from_p99(self):
+        store = self.store(timeout_factor=3.0, timeout_floor=0.1, timeout_ceiling=5.0,
+                           timeout_samples=10)
+        self.assertEqual(store.timeout('fetch_ohlcv'), 5.0)  # not enough samples
+        for _ in range(10):
+            store.metrics.observe('fetch_ohlcv', 0.2)
+        self.assertAlmostEqual(store.timeout('fetch_ohlcv'), 0.6)
+
+        store.timeout_floor = 1.0
+        self.assertEqual(store.timeout('fetch_ohlcv'), 1.0)
+        store.metrics.observe('fetch_ohlcv', 10.0)  # p99 of 11 samples
+        self.assertEqual(store.timeout('fetch_ohlcv'), 5.0)
+
+        # static timeouts by default
+        CCXTStore._singleton = None
+        self.assertIsNone(self.store().timeout('fetch_ohlcv'))
+
+    def test_timeout_is_retried_and_counted(self):
+        store = self.store(timeout_factor=3.0, timeout_floor=0.5, timeout_samples=1)
+        store.metrics.observe('fetch_ohlcv', 0.1)
+        candles = store.fetch_ohlcv('BTC/USDT', '1m', None, 5)
+        self.assertEqual(len(candles), 5)
+        self.assertEqual(store.exchange.timeouts[0], 500)
+        # the calls outside of the store keep the configured timeout
+        self.assertEqual(store.exchange.timeout, 10000)
+
+        metrics = store.metrics.snapshot()
+        self.assertEqual(metrics['counters']['fetch_ohlcv.calls'], 2)
+        self.assertEqual(metrics['counters']['fetch_ohlcv.timeouts'], 1)
+        self.assertEqual(metrics['latencies']['fetch_ohlcv']['count'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
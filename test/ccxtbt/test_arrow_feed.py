@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+from backtrader import Cerebro, Strategy
+
+from ccxtbt import CCXTArrowFeed, CCXTArrowWriter
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+MINUTE = 60 * 1000
+START = int((datetime(2021, 1, 1) - datetime(1970, 1, 1)).total_seconds() * 1000)
+
+
+class CollectStrategy(Strategy):
+
+    def __init__(self):
+        self.bars = []
+
+    def next(self):
+        self.bars.append((self.data.datetime.datetime(0), self.data.close[0]))
+
+
+@unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+class TestArrowFeed(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, name, kind='ohlcv'):
+        path = os.path.join(self.root, name)
+        writer = CCXTArrowWriter(path, kind=kind, batch_size=7)
+        for i in range(30):
+            if kind == 'ohlcv':
+                writer.write([START + i * MINUTE, 1.0, 2.0, 0.5, float(i), 10.0])
+            else:
+                writer.write([START + i * MINUTE, float(i), 1.0])
+        writer.close()
+        return path
+
+    def run_feed(self, path, **kwargs):
+        cerebro = Cerebro()
+        cerebro.adddata(CCXTArrowFeed(dataname=path, **kwargs))
+        cerebro.addstrategy(CollectStrategy)
+        return cerebro.run()[0].bars
+
+    def test_date_range(self):
+        for name in ('candles.arrow', 'candles.parquet'):
+            bars = self.run_feed(self.write(name),
+                                 fromdate=datetime(2021, 1, 1, 0, 10),
+                                 todate=datetime(2021, 1, 1, 0, 20))
+            self.assertEqual([close for _, close in bars], [float(i) for i in range(10, 21)], name)
+            self.assertEqual(bars[0][0], datetime(2021, 1, 1, 0, 10))
+
+    def test_trades(self):
+        bars = self.run_feed(self.write('trades.arrow', kind='trades'))
+        self.assertEqual(len(bars), 30)
+        self.assertEqual(bars[-1], (datetime(2021, 1, 1, 0, 29), 29.0))
+
+    def test_unknown_format(self):
+        self.assertRaises(ValueError, CCXTArrowWriter, os.path.join(self.root, 'candles.csv'))
+
+
+if __name__ == '__main__':
+    unittest.main()
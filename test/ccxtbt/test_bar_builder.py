@@ -0,0 +1,85 @@
+import unittest
+from datetime import datetime
+
+from backtrader import TimeFrame
+
+from ccxtbt import CCXTBarBuilder, bar_bounds
+
+
+def ms(*args):
+    return int((datetime(*args) - datetime(1970, 1, 1)).total_seconds() * 1000)
+
+
+class TestBarBounds(unittest.TestCase):
+
+    def test_intraday_alignment(self):
+        self.assertEqual(bar_bounds(ms(2021, 1, 1, 0, 18, 30), TimeFrame.Minutes, 15),
+                         (ms(2021, 1, 1, 0, 15), ms(2021, 1, 1, 0, 30)))
+        self.assertEqual(bar_bounds(ms(2021, 1, 1, 0, 0, 15), TimeFrame.Seconds, 10),
+                         (ms(2021, 1, 1, 0, 0, 10), ms(2021, 1, 1, 0, 0, 20)))
+
+    def test_weeks_start_on_monday(self):
+        # 2021-01-07 is a Thursday
+        self.assertEqual(bar_bounds(ms(2021, 1, 7, 12), TimeFrame.Weeks, 1),
+                         (ms(2021, 1, 4), ms(2021, 1, 11)))
+
+    def test_calendar_alignment(self):
+        self.assertEqual(bar_bounds(ms(2021, 5, 17), TimeFrame.Months, 3),
+                         (ms(2021, 4, 1), ms(2021, 7, 1)))
+        self.assertEqual(bar_bounds(ms(2021, 5, 17), TimeFrame.Years, 1),
+                         (ms(2021, 1, 1), ms(2022, 1, 1)))
+
+
+class TestBarBuilder(unittest.TestCase):
+
+    def test_time_bars(self):
+        builder = CCXTBarBuilder(TimeFrame.Seconds, 10)
+        self.assertIsNone(builder.add_trade(1000, 10.0, 1.0))
+        self.assertIsNone(builder.add_trade(5000, 12.0, 2.0))
+        self.assertIsNone(builder.add_trade(9999, 9.0, 1.0))
+
+        bar = builder.add_trade(10000, 11.0, 1.0)
+        self.assertEqual(bar, [0, 10.0, 12.0, 9.0, 9.0, 4.0])
+        self.assertEqual(builder.pending(), [10000, 11.0, 11.0, 11.0, 11.0, 1.0])
+
+    def test_flush_at_bar_close(self):
+        builder = CCXTBarBuilder(TimeFrame.Seconds, 10)
+        builder.add_trade(1000, 10.0, 1.0)
+        self.assertIsNone(builder.flush(9999))
+        self.assertEqual(builder.flush(10000), [0, 10.0, 10.0, 10.0, 10.0, 1.0])
+        self.assertIsNone(builder.pending())
+
+    def test_late_trades(self):
+        builder = CCXTBarBuilder(TimeFrame.Seconds, 10)
+        builder.add_trade(1000, 10.0, 1.0)
+        builder.flush(10000)
+        # published after its bar was flushed
+        self.assertIsNone(builder.add_trade(9000, 9.0, 1.0))
+        self.assertIsNone(builder.pending())
+        builder.add_trade(25000, 11.0, 1.0)
+        self.assertIsNone(builder.add_trade(15000, 9.0, 1.0))
+        self.assertEqual(builder.pending(), [20000, 11.0, 11.0, 11.0, 11.0, 1.0])
+        self.assertEqual(builder.late, 2)
+
+    def test_volume_bars(self):
+        builder = CCXTBarBuilder(bar_type='volume', size=3)
+        self.assertIsNone(builder.add_trade(1, 10.0, 1.0))
+        self.assertEqual(builder.add_trade(2, 11.0, 2.0), [1, 10.0, 11.0, 10.0, 11.0, 3.0])
+        self.assertIsNone(builder.pending())
+
+    def test_tick_and_value_bars(self):
+        builder = CCXTBarBuilder(bar_type='ticks', size=2)
+        self.assertIsNone(builder.add_trade(1, 10.0, 1.0))
+        self.assertEqual(builder.add_trade(2, 8.0, 1.0), [1, 10.0, 10.0, 8.0, 8.0, 2.0])
+
+        builder = CCXTBarBuilder(bar_type='value', size=100)
+        self.assertIsNone(builder.add_trade(1, 10.0, 5.0))
+        self.assertEqual(builder.add_trade(2, 10.0, 5.0), [1, 10.0, 10.0, 10.0, 10.0, 10.0])
+
+    def test_invalid_arguments(self):
+        self.assertRaises(ValueError, CCXTBarBuilder, bar_type='renko')
+        self.assertRaises(ValueError, CCXTBarBuilder, bar_type='volume')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+from datetime import datetime
+
+from backtrader import TimeFrame
+
+from ccxtbt import CCXTFeed, CCXTStore
+
+MINUTE = 60 * 1000
+
+
+def candles(start, count):
+    return [[start + i * MINUTE, 1.0 + i, 2.0 + i, 0.5, 1.5 + i, 1.0] for i in range(count)]
+
+
+class FakeExchange(object):
+    '''Serves 1m candles from a fixed history, ``limit`` at a time'''
+
+    def __init__(self, history):
+        self.history = history
+        self.calls = 0
+
+    def __call__(self, symbol, timeframe, since, limit, params={}):
+        self.calls += 1
+        rows = [c for c in self.history if since is None or c[0] >= since]
+        return [list(c) for c in rows[:limit]]
+
+
+class TestSharedBaseSeries(unittest.TestCase):
+
+    def setUp(self):
+        CCXTStore._singleton = None
+        self.fake = FakeExchange(candles(0, 30))
+        self.store = CCXTStore(exchange='binance', currency='BNB',
+                               config={'enableRateLimit': True}, retries=1)
+        self.store.fetch_ohlcv = self.fake
+
+    def make_feed(self, compression):
+        feed = CCXTFeed(exchange='binance', dataname='BNB/USDT',
+                        timeframe=TimeFrame.Minutes, compression=compression,
+                        base_timeframe=TimeFrame.Minutes, base_compression=1,
+                        fromdate=datetime(1970, 1, 1), historical=True,
+                        ohlcv_limit=10)
+        feed.start()
+        return feed
+
+    def test_fetch_once_derive_many(self):
+        series = self.store.get_series('BNB/USDT', '1m', limit=10)
+        series._now = lambda: 30 * MINUTE
+
+        feed5 = self.make_feed(5)
+        calls = self.fake.calls
+        feed15 = self.make_feed(15)
+        self.assertEqual(self.fake.calls, calls)  # history already fetched
+        self.assertIs(feed15._series, series)
+
+        feed5._fetch_resampled()
+        feed15._fetch_resampled()
+        self.assertEqual(self.fake.calls, calls)
+
+        self.assertEqual([b[0] for b in feed5._data], [0, 5 * MINUTE, 10 * MINUTE,
+                                                        15 * MINUTE, 20 * MINUTE, 25 * MINUTE])
+        self.assertEqual([b[0] for b in feed15._data], [0, 15 * MINUTE])
+        self.assertEqual(feed15._data[0], [0, 1.0, 16.0, 0.5, 15.5, 15.0])
+
+        # everything has been read by both feeds
+        self.assertEqual(series._candles, [])
+
+    def test_incomplete_candles_are_not_used(self):
+        series = self.store.get_series('BNB/USDT', '1m', limit=10)
+        series._now = lambda: 12 * MINUTE + 30 * 1000
+        series.subscribe('a', 0)
+
+        self.assertEqual(series.read('a')[-1][0], 11 * MINUTE)
+
+        # the next candle closes at 13:00, no request before that
+        calls = self.fake.calls
+        series.refresh()
+        self.assertEqual(self.fake.calls, calls)
+
+        series._now = lambda: 13 * MINUTE
+        series.refresh()
+        self.assertEqual([c[0] for c in series.read('a')], [12 * MINUTE])
+
+    def test_late_subscriber_prepends_history(self):
+        series = self.store.get_series('BNB/USDT', '1m', limit=10)
+        series._now = lambda: 30 * MINUTE
+        series.subscribe('a', 20 * MINUTE)
+        series.subscribe('b', 10 * MINUTE)
+
+        self.assertEqual(series.read('a')[0][0], 20 * MINUTE)
+        self.assertEqual(series.read('b')[0][0], 10 * MINUTE)
+        self.assertIs(series, self.store.get_series('BNB/USDT', '1m'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+import datetime
+import unittest
+from unittest import mock
+
+import backtrader as bt
+
+from ccxtbt import CCXTPaperBroker, CCXTReplayExchange, CCXTStore
+
+MINUTE = 60 * 1000
+
+
+class BracketStrategy(bt.Strategy):
+
+    def __init__(self):
+        self.orders = None
+
+    def next(self):
+        if len(self) == 2:
+            close = self.data.close[0]
+            # entry filled on the next bar, take profit 4 bars later
+            self.orders = self.buy_bracket(size=1, price=close + 1, stopprice=close - 10,
+                                           limitprice=close + 5)
+
+
+class StopLimitBracketStrategy(BracketStrategy):
+
+    def next(self):
+        if len(self) == 2:
+            close = self.data.close[0]
+            self.orders = self.buy_bracket(size=1, price=close + 1, stopprice=close - 10,
+                                           stopexec=bt.Order.StopLimit, limitprice=close + 5)
+
+
+class OcoStrategy(bt.Strategy):
+
+    def __init__(self):
+        self.orders = None
+
+    def next(self):
+        if len(self) == 2:
+            close = self.data.close[0]
+            first = self.buy(size=1, price=close + 3, exectype=bt.Order.Limit)
+            second = self.buy(size=1, price=close - 3, exectype=bt.Order.Limit, oco=first)
+            self.orders = [first, second]
+
+
+class TestBrackets(unittest.TestCase):
+
+    def setUp(self):
+        CCXTStore._singleton = None
+
+    def tearDown(self):
+        CCXTStore._singleton = None
+
+    def run_strategy(self, strategy, native, engine=None):
+        rows = [[i * MINUTE, 100.0 + i, 101.0 + i, 99.0 + i, 100.5 + i, 1.0] for i in range(1, 21)]
+        exchange = CCXTReplayExchange({('BTC/USDT', '1m'): rows}, start=21 * MINUTE)
+        store = CCXTStore(exchange=exchange, currency='USDT', config={}, retries=1)
+        broker = CCXTPaperBroker()
+        if not native:
+            broker.engine.has = lambda feature: False
+        if engine is not None:
+            engine(broker.engine)
+
+        cerebro = bt.Cerebro()
+        cerebro.setbroker(broker)
+        cerebro.adddata(store.getdata(dataname='BTC/USDT', timeframe=bt.TimeFrame.Minutes,
+                                      compression=1, historical=True, ohlcv_limit=50,
+                                      fromdate=datetime.datetime(1970, 1, 1)))
+        cerebro.addstrategy(strategy)
+        return cerebro.run()[0], broker
+
+    def check_bracket(self, native):
+        strategy, broker = self.run_strategy(BracketStrategy, native)
+        parent, stop, limit = strategy.orders
+        self.assertEqual([o.getstatusname() for o in strategy.orders],
+                         ['Completed', 'Canceled', 'Completed'])
+        self.assertEqual(parent.executed.price, 103.0)
+        self.assertEqual(limit.executed.price, 107.5)
+        self.assertEqual(broker.getposition(strategy.data).size, 0.0)
+        self.assertEqual(broker.open_orders, [])
+        return broker.engine, stop, limit
+
+    def test_emulated_bracket(self):
+        engine, _, _ = self.check_bracket(native=False)
+        # the children are sent once the entry completed
+        self.assertEqual([(o['type'], o['status']) for o in engine.orders.values()],
+                         [('limit', 'closed'), ('stop', 'canceled'), ('limit', 'closed')])
+
+    def test_native_bracket(self):
+        engine, stop, limit = self.check_bracket(native=True)
+        # the children were created by the exchange with the entry and found
+        # among its open orders
+        self.assertEqual(len(engine.orders), 3)
+        self.assertEqual((stop.ccxt_order['id'], limit.ccxt_order['id']), ('2', '3'))
+
+    def test_native_bracket_params(self):
+        def wrap(engine):
+            engine.create_order = mock.Mock(wraps=engine.create_order)
+
+        strategy, broker = self.run_strategy(BracketStrategy, native=True, engine=wrap)
+        params = broker.engine.create_order.call_args_list[0][1]['params']
+        # the take profit is a limit order at its price
+        self.assertEqual(params['takeProfit'], {'triggerPrice': 107.5, 'price': 107.5})
+        self.assertEqual(params['stopLoss'], {'triggerPrice': 92.5})
+
+    def test_native_child_not_found(self):
+        def drop_take_profit(engine):
+            create_order = engine.create_order
+
+            def create(symbol, order_type, side, amount, price, params):
+                params = dict(params)
+                params.pop('takeProfit', None)  # not created by the exchange
+                return create_order(symbol, order_type, side, amount, price, params)
+
+            engine.create_order = create
+
+        strategy, broker = self.run_strategy(BracketStrategy, native=True,
+                                             engine=drop_take_profit)
+        parent, stop, limit = strategy.orders
+        # the stop loss is adopted, the take profit sent on its own
+        self.assertEqual([o.getstatusname() for o in strategy.orders],
+                         ['Completed', 'Canceled', 'Completed'])
+        self.assertEqual(limit.executed.price, 107.5)
+        self.assertEqual((stop.ccxt_order['id'], limit.ccxt_order['id']), ('2', '3'))
+        self.assertEqual([(o['type'], o['status']) for o in broker.engine.orders.values()],
+                         [('limit', 'closed'), ('stop', 'canceled'), ('limit', 'closed')])
+        self.assertEqual(broker.open_orders, [])
+
+    def test_stop_limit_bracket(self):
+        # not attached natively, which would turn the stop limit into a stop
+        strategy, broker = self.run_strategy(StopLimitBracketStrategy, native=True)
+        self.assertEqual([o.getstatusname() for o in strategy.orders],
+                         ['Completed', 'Canceled', 'Completed'])
+        self.assertEqual([(o['type'], o['status']) for o in broker.engine.orders.values()],
+                         [('limit', 'closed'), ('stop limit', 'canceled'), ('limit', 'closed')])
+        self.assertEqual(broker.engine._attached, {})
+
+    def test_oco(self):
+        strategy, broker = self.run_strategy(OcoStrategy, native=False)
+        self.assertEqual([o.getstatusname() for o in strategy.orders], ['Completed', 'Canceled'])
+        self.assertEqual(broker.getposition(strategy.data).size, 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
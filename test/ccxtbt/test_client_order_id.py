@@ -0,0 +1,92 @@
+import datetime
+import unittest
+
+import backtrader as bt
+import ccxt
+
+from ccxtbt import CCXTPaperBroker, CCXTReplayExchange, CCXTStore
+
+MINUTE = 60 * 1000
+
+
+class FlakyExchange(CCXTReplayExchange):
+    '''Times out the first create, after (``accepted``) or before
+    reaching the matching engine'''
+
+    accepted = True
+
+    def create_order(self, symbol, type, side, amount, price=None, params={}):
+        if self.stats['create_order'] == 0 and not self.accepted:
+            self.stats['create_order'] += 1
+            raise ccxt.RequestTimeout('timed out')
+        order = super(FlakyExchange, self).create_order(symbol, type, side, amount, price, params)
+        if self.stats['create_order'] == 1:
+            raise ccxt.RequestTimeout('timed out')
+        return order
+
+
+class TwoOrders(bt.Strategy):
+
+    def next(self):
+        if len(self) == 2:
+            self.buy(size=1)
+            self.buy(size=1)
+
+
+class TestClientOrderId(unittest.TestCase):
+
+    def setUp(self):
+        CCXTStore._singleton = None
+
+    def tearDown(self):
+        CCXTStore._singleton = None
+
+    def rows(self):
+        return [[i * MINUTE, 100.0 + i, 101.0 + i, 99.0 + i, 100.5 + i, 1.0] for i in range(1, 21)]
+
+    def create(self, accepted):
+        exchange = FlakyExchange({('BTC/USDT', '1m'): self.rows()}, start=21 * MINUTE)
+        exchange.accepted = accepted
+        store = CCXTStore(exchange=exchange, currency='USDT', config={}, retries=3)
+        store.load_markets()
+        order = store.create_order('BTC/USDT', 'limit', 'buy', 1.0, 50.0,
+                                   {'clientOrderId': 'bt-1'})
+        return exchange, order, store
+
+    def test_timed_out_create_is_found(self):
+        exchange, order, store = self.create(accepted=True)
+        self.assertEqual(order['clientOrderId'], 'bt-1')
+        self.assertEqual(len(exchange.orders), 1)  # not sent twice
+        self.assertEqual(exchange.stats['create_order'], 1)
+        # looked up through the rate limited and timed store calls
+        self.assertEqual(store.metrics.counters['fetch_open_orders.calls'], 1)
+        self.assertEqual(store.metrics.counters['fetch_closed_orders.calls'], 1)
+
+    def test_lost_create_is_sent_again(self):
+        exchange, order, _ = self.create(accepted=False)
+        self.assertEqual(order['clientOrderId'], 'bt-1')
+        self.assertEqual(len(exchange.orders), 1)
+        self.assertEqual(exchange.stats['create_order'], 2)
+
+    def test_broker_ids_are_unique(self):
+        exchange = CCXTReplayExchange({('BTC/USDT', '1m'): self.rows()}, start=21 * MINUTE)
+        store = CCXTStore(exchange=exchange, currency='USDT', config={}, retries=1)
+        broker = CCXTPaperBroker()
+        cerebro = bt.Cerebro()
+        cerebro.setbroker(broker)
+        cerebro.adddata(store.getdata(dataname='BTC/USDT', timeframe=bt.TimeFrame.Minutes,
+                                      compression=1, historical=True, ohlcv_limit=50,
+                                      fromdate=datetime.datetime(1970, 1, 1)))
+        cerebro.addstrategy(TwoOrders)
+        strategy = cerebro.run()[0]
+
+        ids = [o['clientOrderId'] for o in broker.engine.orders.values()]
+        self.assertEqual(len(set(ids)), 2)
+        self.assertTrue(all(i.startswith(broker._client_prefix) for i in ids))
+        # accepted by the strictest exchanges, e.g. OKX
+        self.assertTrue(all(i.isalnum() and len(i) <= 32 for i in ids))
+        self.assertEqual(set(o.ccxt_order['clientOrderId'] for o in strategy._orders), set(ids))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+import backtrader as bt
+import ccxt
+
+from ccxtbt import CCXTArrowFeed, CCXTDataStore, CCXTReplayExchange, CCXTStore
+from ccxtbt.download import RateLimiter, download
+
+MINUTE = 60 * 1000
+
+
+def candles(start, count):
+    return [[(start + i) * MINUTE, 1.0, 2.0, 0.5, 1.5, 10.0] for i in range(count)]
+
+
+class TestDownload(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.datastore = CCXTDataStore(self.root)
+
+        history = candles(0, 25)
+        self.store = MagicMock()
+        self.store.exchange.parse_timeframe = ccxt.Exchange.parse_timeframe
+        self.store.fetch_ohlcv.side_effect = \
+            lambda symbol, timeframe, since, limit: [c for c in history if c[0] >= since][:limit]
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_download_and_resume(self):
+        requests, stored = download(self.store, self.datastore, 'binance', 'BTC/USDT', '1m',
+                                    0, 20 * MINUTE, limit=8)
+        self.assertEqual((requests, stored), (3, 20))
+        self.assertEqual(self.datastore.last_timestamp('binance', 'BTC/USDT', '1m'), 19 * MINUTE)
+
+        # resumes after the last stored candle
+        requests, stored = download(self.store, self.datastore, 'binance', 'BTC/USDT', '1m',
+                                    0, 25 * MINUTE, limit=8)
+        self.assertEqual((requests, stored), (1, 5))
+        self.assertEqual(self.store.fetch_ohlcv.call_args[1]['since'], 20 * MINUTE)
+
+        rows = list(self.datastore.read('binance', 'BTC/USDT', '1m', since=3 * MINUTE, until=5 * MINUTE))
+        self.assertEqual(rows, candles(3, 2))
+
+    def test_retries_paced_by_limiter(self):
+        CCXTStore._singleton = None
+        exchange = CCXTReplayExchange({('BTC/USDT', '1m'): candles(0, 5)}, start=5 * MINUTE,
+                                      rate_limit=60000)
+        limiter = RateLimiter(1000.0)
+        limiter.wait = MagicMock(wraps=limiter.wait)
+        limiter.backoff = MagicMock()
+        store = CCXTStore(exchange=exchange, currency='USDT', config={}, retries=3,
+                          limiter=limiter)
+        exchange.fetch_ohlcv = MagicMock(side_effect=[ccxt.RateLimitExceeded('429'),
+                                                      candles(0, 5)])
+        with unittest.mock.patch('time.sleep') as sleep:
+            self.assertEqual(len(store.fetch_ohlcv('BTC/USDT', '1m', 0, 5)), 5)
+        # every attempt waits for the shared limiter, never for rateLimit
+        self.assertEqual(limiter.wait.call_count, 2)
+        self.assertEqual(limiter.backoff.call_count, 1)
+        self.assertLess(max([c[0][0] for c in sleep.call_args_list] + [0]), 1.0)
+        CCXTStore._singleton = None
+
+    def test_read_by_feeds(self):
+        CCXTStore._singleton = None
+        self.datastore.append('replay', 'BTC/USDT', '1m', candles(0, 10))
+        exchange = CCXTReplayExchange({('BTC/USDT', '1m'): candles(0, 20)}, start=20 * MINUTE)
+        store = CCXTStore(exchange=exchange, currency='USDT', config={}, retries=1)
+        cerebro = bt.Cerebro()
+        cerebro.adddata(store.getdata(dataname='BTC/USDT', timeframe=bt.TimeFrame.Minutes,
+                                      compression=1, historical=True, ohlcv_limit=50,
+                                      fromdate=datetime.datetime(1970, 1, 1),
+                                      datastore=self.root))
+        cerebro.addstrategy(bt.Strategy)
+        strategy = cerebro.run()[0]
+        self.assertEqual(len(strategy.data), 20)
+        # one request for the candles after the stored ones
+        self.assertEqual(exchange.stats['fetch_ohlcv'], 2)
+        CCXTStore._singleton = None
+
+        path = self.datastore.path('replay', 'BTC/USDT', '1m', 'arrow')
+        self.assertEqual(self.datastore.export('replay', 'BTC/USDT', '1m', path), 10)
+        self.assertTrue(os.path.exists(path))
+        cerebro = bt.Cerebro()
+        cerebro.adddata(CCXTArrowFeed(dataname=path, timeframe=bt.TimeFrame.Minutes))
+        cerebro.addstrategy(bt.Strategy)
+        self.assertEqual(len(cerebro.run()[0].data), 10)
+
+    def test_empty_store(self):
+        self.assertIsNone(self.datastore.last_timestamp('binance', 'ETH/USDT', '1h'))
+        self.assertEqual(list(self.datastore.read('binance', 'ETH/USDT', '1h')), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
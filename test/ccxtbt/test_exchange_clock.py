@@ -0,0 +1,117 @@
+import bisect
+import datetime
+import unittest
+
+import backtrader as bt
+
+from ccxtbt import CCXTReplayExchange, CCXTStore, VirtualClock
+
+MINUTE = 60 * 1000
+
+
+class SkewedExchange(CCXTReplayExchange):
+    '''Exchange whose clock is ``skew`` milliseconds ahead of the local
+    (virtual) one, returning the candle in progress like most exchanges'''
+
+    skew = 0
+
+    def server(self):
+        return self.milliseconds() + self.skew
+
+    @property
+    def finished(self):
+        return self.server() >= self._end
+
+    def _closed(self, key):
+        idx = bisect.bisect_right(self._times[key], self.server() - self._periods[key])
+        return self._history[key], idx
+
+    def fetch_time(self, params={}):
+        return super(SkewedExchange, self).fetch_time(params) + self.skew
+
+    def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None, params={}):
+        candles = super(SkewedExchange, self).fetch_ohlcv(symbol, timeframe, since, limit, params)
+        if candles:
+            candles.append([candles[-1][0] + MINUTE, 0.0, 0.0, 0.0, 0.0, 0.0])
+        return candles
+
+
+class ClockStrategy(bt.Strategy):
+
+    def __init__(self):
+        self.bars = []
+
+    def next(self):
+        self.bars.append((self.data.datetime.datetime(0), self.data.close[0]))
+
+
+class TestExchangeClock(unittest.TestCase):
+
+    def setUp(self):
+        CCXTStore._singleton = None
+
+    def tearDown(self):
+        CCXTStore._singleton = None
+
+    def exchange(self, skew, latency):
+        rows = [[i * MINUTE, 100.0 + i, 101.0 + i, 99.0 + i, 100.5 + i, 1.0] for i in range(30)]
+        exchange = SkewedExchange({('BTC/USDT', '1m'): rows}, speed=1000, latency=latency)
+        # only moves with the latencies and sleeps, whatever the load
+        exchange.clock = VirtualClock(10 * MINUTE, manual=True)
+        exchange.skew = skew
+        return exchange
+
+    def test_offset(self):
+        exchange = self.exchange(skew=5000, latency=0.2)
+        store = CCXTStore(exchange=exchange, currency='USDT', config={}, retries=1,
+                          clock_sync=3600)
+        self.assertEqual(store.milliseconds() - exchange.milliseconds(), 5000)
+        self.assertEqual(exchange.stats['fetch_time'], 3)  # samples of the first sync
+        self.assertEqual((store.clock_offset, store.clock_rtt), (5000, 200))
+        store.milliseconds()
+        self.assertEqual(exchange.stats['fetch_time'], 3)  # not due yet
+        self.assertEqual(store.metrics.gauges['clock.offset'], 5000)
+
+        CCXTStore._singleton = None
+        store = CCXTStore(exchange=self.exchange(skew=5000, latency=0.2), currency='USDT',
+                          config={}, retries=1)
+        self.assertEqual(store.clock_offset, 0.0)  # no clock_sync, no request
+
+    def run_live(self, drop_incomplete=True, **kwargs):
+        # the exchange clock is 20s behind: the local clock alone sees the
+        # forming candle as closed during the last 20s of every minute
+        exchange = self.exchange(skew=-20000, latency=1.0)
+        store = CCXTStore(exchange=exchange, currency='USDT', config={}, retries=1, **kwargs)
+        cerebro = bt.Cerebro(quicknotify=True)
+        cerebro.setbroker(store.getbroker())
+        cerebro.adddata(store.getdata(dataname='BTC/USDT', timeframe=bt.TimeFrame.Minutes,
+                                      compression=1, ohlcv_limit=5,
+                                      drop_incomplete=drop_incomplete,
+                                      poll_at_close=True, poll_wait=5.0))
+        cerebro.addstrategy(ClockStrategy)
+        return cerebro.run()[0], exchange
+
+    def test_skewed_live_feed(self):
+        strategy, exchange = self.run_live(clock_sync=3600)
+        # the forming candles (close 0.0) are never delivered
+        minutes = [dt.minute for dt, _ in strategy.bars]
+        self.assertEqual(minutes, list(range(minutes[0], 30)))
+        self.assertNotIn(0.0, [close for _, close in strategy.bars])
+        self.assertEqual(strategy.bars[-1][0], datetime.datetime(1970, 1, 1, 0, 29))
+        # polled about once per closed candle
+        self.assertLessEqual(exchange.stats['fetch_ohlcv'], 2 * len(strategy.bars))
+
+        # poll_at_close drops the forming candle on its own
+        CCXTStore._singleton = None
+        strategy, exchange = self.run_live(drop_incomplete=False, clock_sync=3600)
+        self.assertEqual(strategy.bars[-1][0], datetime.datetime(1970, 1, 1, 0, 29))
+        self.assertNotIn(0.0, [close for _, close in strategy.bars])
+
+        # the local clock alone is 20s off, too much for the margin
+        CCXTStore._singleton = None
+        strategy, exchange = self.run_live()
+        self.assertIn(0.0, [close for _, close in strategy.bars])
+
+
+if __name__ == '__main__':
+    unittest.main()
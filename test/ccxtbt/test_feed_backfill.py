@@ -0,0 +1,67 @@
+import datetime
+import math
+import unittest
+
+import backtrader as bt
+
+from ccxtbt import CCXTReplayExchange, CCXTStore
+
+MINUTE = 60 * 1000
+
+
+class WarmupStrategy(bt.Strategy):
+
+    def __init__(self):
+        self.sma = bt.indicators.SMA(self.data, period=10)
+        self.states = []
+        self.live = []
+
+    def notify_data(self, data, status, *args, **kwargs):
+        self.states.append(data._getstatusname(status))
+
+    def prenext(self):
+        self.live.append((self.data.datetime.datetime(0), self.states[-1], float('nan')))
+
+    def next(self):
+        self.live.append((self.data.datetime.datetime(0), self.states[-1], self.sma[0]))
+
+
+class TestFeedBackfill(unittest.TestCase):
+
+    def setUp(self):
+        CCXTStore._singleton = None
+
+    def run_feed(self, **kwargs):
+        rows = [[i * MINUTE, 100.0 + i, 101.0 + i, 99.0 + i, 100.5 + i, 1.0] for i in range(60)]
+        exchange = CCXTReplayExchange({('BTC/USDT', '1m'): rows}, speed=3000,
+                                      latency=0.05, start=40 * MINUTE)
+        store = CCXTStore(exchange=exchange, currency='USDT', config={'secret': ''}, retries=1)
+
+        cerebro = bt.Cerebro(quicknotify=True)
+        cerebro.setbroker(store.getbroker())
+        cerebro.adddata(store.getdata(dataname='BTC/USDT', timeframe=bt.TimeFrame.Minutes,
+                                      compression=1, ohlcv_limit=5, **kwargs))
+        cerebro.addstrategy(WarmupStrategy)
+        return cerebro.run()[0], exchange
+
+    def test_warmup_from_minimum_period(self):
+        strategy, exchange = self.run_feed(backfill_margin=2)
+
+        self.assertEqual(strategy.states[:2], ['DELAYED', 'LIVE'])
+        delayed = [bar for bar in strategy.live if bar[1] == 'DELAYED']
+        # minimum period of 10 plus the margin, ending with the last closed candle
+        self.assertEqual(len(delayed), 12)
+        self.assertEqual(delayed[0][0], datetime.datetime(1970, 1, 1, 0, 28))
+        self.assertEqual(delayed[-1][0], datetime.datetime(1970, 1, 1, 0, 39))
+
+        # the indicator is valid on the first live bar
+        first_live = [bar for bar in strategy.live if bar[1] == 'LIVE'][0]
+        self.assertFalse(math.isnan(first_live[2]))
+
+    def test_no_backfill(self):
+        strategy, _ = self.run_feed(backfill_start=False)
+        self.assertEqual(strategy.states[0], 'LIVE')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+
+import backtrader as bt
+
+from ccxtbt import CCXTReplayExchange, CCXTStore, VirtualClock
+
+MINUTE = 60 * 1000
+
+
+class StalledExchange(CCXTReplayExchange):
+    '''Stops publishing candles from 15:00 until 24:00, then catches up'''
+
+    def fetch_ohlcv(self, symbol, timeframe='1m', since=None, limit=None, params={}):
+        candles = super(StalledExchange, self).fetch_ohlcv(symbol, timeframe, since, limit, params)
+        if self.milliseconds() < 24 * MINUTE:
+            candles = [c for c in candles if c[0] < 15 * MINUTE]
+        return candles
+
+
+class FreshnessStrategy(bt.Strategy):
+
+    def __init__(self):
+        self.data_notifs = []
+        self.store_notifs = []
+
+    def notify_data(self, data, status, *args, **kwargs):
+        self.data_notifs.append(data._getstatusname(status))
+
+    def notify_store(self, msg, *args, **kwargs):
+        self.store_notifs.append((msg, kwargs))
+
+
+class TestFeedFreshness(unittest.TestCase):
+
+    def setUp(self):
+        CCXTStore._singleton = None
+
+    def tearDown(self):
+        CCXTStore._singleton = None
+
+    def test_stale_feed(self):
+        rows = [[i * MINUTE, 100.0 + i, 101.0 + i, 99.0 + i, 100.5 + i, 1.0] for i in range(30)]
+        exchange = StalledExchange({('BTC/USDT', '1m'): rows}, speed=1000, latency=2.0)
+        # 2s of exchange time per request, whatever the load of the machine
+        exchange.clock = VirtualClock(10 * MINUTE, manual=True)
+        store = CCXTStore(exchange=exchange, currency='USDT', config={}, retries=1)
+
+        cerebro = bt.Cerebro(quicknotify=True)
+        cerebro.addstore(store)
+        cerebro.setbroker(store.getbroker())
+        data = store.getdata(dataname='BTC/USDT', timeframe=bt.TimeFrame.Minutes,
+                             compression=1, ohlcv_limit=5, max_lag=90)
+        cerebro.adddata(data)
+        cerebro.addstrategy(FreshnessStrategy)
+        strategy = cerebro.run()[0]
+
+        self.assertEqual(strategy.data_notifs, ['DELAYED', 'LIVE', 'STALE', 'LIVE',
+                                                'DISCONNECTED'])
+        msgs = [msg for msg, _ in strategy.store_notifs]
+        self.assertEqual(msgs[:2], ['STALE', 'LAGGING'])
+        self.assertIn('FRESH', msgs)
+        stale = strategy.store_notifs[0][1]['age']
+        self.assertGreater(stale, 120)
+        self.assertLess(stale, 125)  # noticed within a couple of polls
+
+        name = 'feed.BTC/USDT.1m'
+        counters = store.metrics.counters
+        self.assertEqual(counters[name + '.stale'], 1)
+        # the candles published late breach max_lag
+        self.assertGreaterEqual(counters[name + '.lagging'], 7)
+        self.assertGreater(store.metrics.percentile(name + '.lag', 99), 400)
+        self.assertLess(store.metrics.percentile(name + '.lag', 10), 90)
+        self.assertLess(data.freshness.age, 60)
+        # watching makes no request of its own
+        self.assertNotIn('fetch_time', exchange.stats)
+
+    def test_dropped_without_cerebro(self):
+        rows = [[i * MINUTE, 100.0, 101.0, 99.0, 100.5, 1.0] for i in range(20)]
+        exchange = StalledExchange({('BTC/USDT', '1m'): rows}, start=20 * MINUTE)
+        store = CCXTStore(exchange=exchange, currency='USDT', config={}, retries=1)
+        # nothing drains them unless cerebro.addstore(store)
+        store.put_notification('STALE', None, age=200.0)
+        self.assertEqual(len(store.notifs), 0)
+        store.start()
+        store.put_notification('STALE', None, age=200.0)
+        self.assertEqual(len(store.get_notifications()), 1)
+
+    def test_disabled(self):
+        rows = [[i * MINUTE, 100.0 + i, 101.0 + i, 99.0 + i, 100.5 + i, 1.0] for i in range(20)]
+        exchange = StalledExchange({('BTC/USDT', '1m'): rows}, start=20 * MINUTE)
+        store = CCXTStore(exchange=exchange, currency='USDT', config={}, retries=1)
+        data = store.getdata(dataname='BTC/USDT', timeframe=bt.TimeFrame.Minutes,
+                             compression=1, historical=True, stale_after=None)
+        cerebro = bt.Cerebro()
+        cerebro.adddata(data)
+        cerebro.addstrategy(FreshnessStrategy)
+        cerebro.run()
+        self.assertIsNone(data.freshness)
+        self.assertEqual(store.metrics.gauges, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
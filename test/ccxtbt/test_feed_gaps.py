@@ -0,0 +1,76 @@
+import unittest
+from unittest.mock import MagicMock
+
+from backtrader import TimeFrame
+
+from ccxtbt import CCXTFeed, CCXTStore
+
+MINUTE = 60 * 1000
+
+
+def candle(i):
+    return [i * MINUTE, 1.0, 1.0, 1.0, float(i), 1.0]
+
+
+class TestFeedGapRepair(unittest.TestCase):
+
+    def setUp(self):
+        CCXTStore._singleton = None
+
+    def make_feed(self, pages, **kwargs):
+        feed = CCXTFeed(exchange='binance', dataname='BNB/USDT',
+                        timeframe=TimeFrame.Minutes, compression=1,
+                        currency='BNB', config={'enableRateLimit': True},
+                        retries=1, **kwargs)
+        feed.store.fetch_ohlcv = MagicMock(side_effect=pages)
+        return feed
+
+    def test_missing_candle_is_refetched(self):
+        feed = self.make_feed([
+            [candle(1), candle(2), candle(4)],  # short page
+            [candle(3)],  # targeted repair
+            [candle(4)],  # nothing new
+        ], repair_gaps=True)
+        feed._fetch_ohlcv()
+
+        self.assertEqual([c[0] // MINUTE for c in feed._data], [1, 2, 3, 4])
+        self.assertEqual(list(feed.gaps), [])
+        repair = feed.store.fetch_ohlcv.call_args_list[1][1]
+        self.assertEqual((repair['since'], repair['limit']), (3 * MINUTE, 1))
+
+    def test_irreparable_gap_is_recorded_and_filled(self):
+        feed = self.make_feed([
+            [candle(1), candle(2), candle(5)],
+            [],  # repair returns nothing
+            [candle(5)],
+        ], repair_gaps=True, fill_gaps=True)
+        feed._fetch_ohlcv()
+
+        self.assertEqual([c[0] // MINUTE for c in feed._data], [1, 2, 3, 4, 5])
+        self.assertEqual(feed._data[2], [3 * MINUTE, 2.0, 2.0, 2.0, 2.0, 0.0])
+        self.assertEqual(list(feed.gaps), [(3 * MINUTE, 5 * MINUTE)])
+
+    def test_repair_disabled(self):
+        # the default: no request per gap on illiquid markets
+        feed = self.make_feed([
+            [candle(1), candle(3)],
+            [candle(3)],
+        ])
+        feed._fetch_ohlcv()
+
+        self.assertEqual([c[0] // MINUTE for c in feed._data], [1, 3])
+        self.assertEqual(list(feed.gaps), [(2 * MINUTE, 3 * MINUTE)])
+        self.assertEqual(feed.store.fetch_ohlcv.call_count, 2)
+
+    def test_gaps_are_bounded(self):
+        feed = self.make_feed([
+            [candle(i) for i in range(1, 20, 2)],
+            [candle(19)],
+        ], max_gaps=3)
+        feed._fetch_ohlcv()
+
+        self.assertEqual([start // MINUTE for start, _ in feed.gaps], [14, 16, 18])
+
+
+if __name__ == '__main__':
+    unittest.main()
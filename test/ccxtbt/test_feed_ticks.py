@@ -0,0 +1,90 @@
+import unittest
+from unittest.mock import MagicMock
+
+from backtrader import TimeFrame
+
+from ccxtbt import CCXTBarBuilder, CCXTFeed, CCXTStore
+
+
+def trade(tid, tstamp, price=1.0, amount=1.0):
+    return {'id': tid, 'timestamp': tstamp, 'price': price, 'amount': amount}
+
+
+class TestFeedIncrementalTrades(unittest.TestCase):
+
+    def setUp(self):
+        CCXTStore._singleton = None
+        self.feed = CCXTFeed(exchange='binance',
+                             dataname='BNB/USDT',
+                             timeframe=TimeFrame.Ticks,
+                             currency='BNB',
+                             config={'enableRateLimit': True},
+                             retries=1,
+                             trades_dedup=3)
+        self.feed.store.fetch_trades = MagicMock()
+
+    def test_first_fetch_keeps_latest_trade_only(self):
+        self.feed.store.fetch_trades.return_value = [trade('1', 1000), trade('2', 2000)]
+        trades = self.feed._fetch_trades()
+
+        self.feed.store.fetch_trades.assert_called_once_with('BNB/USDT', limit=None)
+        self.assertEqual(trades, [(2000, 1.0, 1.0)])
+        self.assertEqual(self.feed._last_ts, 2000)
+
+    def test_fetch_since_last_timestamp_and_dedup(self):
+        self.feed._last_ts = 2000
+        self.feed._trade_ids.append('b')
+        self.feed._trade_idset.add('b')
+
+        # non-monotonic, non-numeric ids sharing the last timestamp
+        self.feed.store.fetch_trades.return_value = [trade('b', 2000), trade('a', 2000), trade('c', 3000)]
+        trades = self.feed._fetch_trades()
+
+        self.feed.store.fetch_trades.assert_called_once_with('BNB/USDT', since=2000, limit=None)
+        self.assertEqual([t[0] for t in trades], [2000, 3000])
+        self.assertEqual(self.feed._last_ts, 3000)
+
+    def test_recent_id_set_is_bounded(self):
+        self.feed._last_ts = 1
+        self.feed.store.fetch_trades.return_value = [trade(str(i), i + 1) for i in range(10)]
+        trades = self.feed._fetch_trades()
+
+        self.assertEqual(len(trades), 10)
+        self.assertEqual(list(self.feed._trade_ids), ['7', '8', '9'])
+        self.assertEqual(self.feed._trade_idset, {'7', '8', '9'})
+
+
+class TestFeedTimeBars(unittest.TestCase):
+
+    def setUp(self):
+        CCXTStore._singleton = None
+        self.feed = CCXTFeed(exchange='binance', dataname='BNB/USDT',
+                             timeframe=TimeFrame.Seconds, compression=10, currency='BNB',
+                             config={'enableRateLimit': True}, retries=1,
+                             bar_type='time', bar_grace=2.0)
+        self.feed._builder = CCXTBarBuilder(TimeFrame.Seconds, 10)
+        self.feed._last_ts = 1
+        self.feed.store.fetch_trades = MagicMock()
+        self.feed.store.milliseconds = MagicMock()
+
+    def test_late_trade(self):
+        self.feed.store.fetch_trades.return_value = [trade('1', 1000), trade('2', 9000)]
+        self.feed.store.milliseconds.return_value = 11000
+        self.feed._fetch_bars()
+        self.assertEqual(len(self.feed._data), 0)  # within the grace period
+
+        # published late, still in its bar
+        self.feed.store.fetch_trades.return_value = [trade('3', 9500, amount=2.0)]
+        self.feed.store.milliseconds.return_value = 12500
+        self.feed._fetch_bars()
+        self.assertEqual(list(self.feed._data), [[0, 1.0, 1.0, 1.0, 1.0, 4.0]])
+
+        # too late: no second bar starting at 0
+        self.feed.store.fetch_trades.return_value = [trade('4', 9800)]
+        self.feed._fetch_bars()
+        self.assertEqual(len(self.feed._data), 1)
+        self.assertEqual(self.feed._builder.late, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock
+
+from ccxtbt import CCXTFuturesFeed, CCXTFuturesPoller, CCXTReplayExchange, CCXTStore
+
+HOUR = 3600 * 1000
+
+
+class TestFuturesPoller(unittest.TestCase):
+
+    def setUp(self):
+        self.store = MagicMock()
+        self.store.milliseconds.return_value = 10 ** 12
+        self.store.exchange.has = {'fetchFundingRates': True, 'fetchOpenInterest': True}
+        self.store.fetch_funding_rates.return_value = {
+            'BTC/USDT:USDT': {'timestamp': 1000, 'fundingRate': 0.0001, 'markPrice': 100.0,
+                              'indexPrice': 99.0, 'fundingTimestamp': 2000},
+            'ETH/USDT:USDT': {'timestamp': 1000, 'fundingRate': -0.0002, 'markPrice': 10.0,
+                              'indexPrice': 10.1, 'fundingTimestamp': 2000},
+        }
+        self.store.fetch_open_interest.side_effect = \
+            lambda symbol: {'timestamp': 1000, 'openInterestAmount': 5.0}
+
+    def test_batched_poll(self):
+        poller = CCXTFuturesPoller(self.store, interval=60)
+        poller.register('BTC/USDT:USDT')
+        poller.register('ETH/USDT:USDT')
+
+        self.assertTrue(poller.poll())
+        self.store.fetch_funding_rates.assert_called_once_with(['BTC/USDT:USDT', 'ETH/USDT:USDT'])
+        self.assertEqual(self.store.fetch_open_interest.call_count, 2)
+        self.assertEqual(poller.snapshots['ETH/USDT:USDT']['fundingRate'], -0.0002)
+        self.assertEqual(poller.snapshots['BTC/USDT:USDT']['openInterest'], 5.0)
+
+        # within the interval of the store clock nothing is requested
+        self.store.milliseconds.return_value += 59 * 1000
+        self.assertFalse(poller.poll())
+        self.store.fetch_funding_rates.assert_called_once()
+        self.store.milliseconds.return_value += 1000
+        self.assertTrue(poller.poll())
+
+    def test_per_symbol_fallback(self):
+        self.store.exchange.has = {'fetchFundingRates': False}
+        self.store.fetch_funding_rate.side_effect = lambda symbol: {'timestamp': 1, 'markPrice': 1.0}
+        poller = CCXTFuturesPoller(self.store, interval=60, open_interest=False)
+        poller.register('BTC/USDT:USDT')
+
+        poller.poll()
+        self.store.fetch_funding_rate.assert_called_once_with('BTC/USDT:USDT')
+        self.assertIsNone(poller.snapshots['BTC/USDT:USDT']['openInterest'])
+
+
+class TestFuturesFeed(unittest.TestCase):
+
+    def setUp(self):
+        CCXTStore._singleton = None
+
+    def tearDown(self):
+        CCXTStore._singleton = None
+
+    def test_paged_funding_history(self):
+        history = [{'timestamp': i * 8 * HOUR, 'fundingRate': 0.0001 * i} for i in range(1, 26)]
+        exchange = CCXTReplayExchange({('BTC/USDT:USDT', '1m'): [[0, 1.0, 1.0, 1.0, 1.0, 1.0]]})
+        feed = CCXTFuturesFeed(exchange=exchange, currency='USDT', config={}, retries=1,
+                               dataname='BTC/USDT:USDT', fromdate=datetime(1970, 1, 1),
+                               history_limit=10)
+        feed.store.fetch_funding_rate_history = MagicMock(
+            side_effect=lambda symbol, since, limit:
+            [r for r in history if r['timestamp'] >= since][:limit])
+        feed.start()
+
+        self.assertEqual([r['timestamp'] for r in feed._data], [r['timestamp'] for r in history])
+        calls = feed.store.fetch_funding_rate_history.call_args_list
+        self.assertEqual([c[1]['since'] for c in calls], [0, 10 * 8 * HOUR + 1, 20 * 8 * HOUR + 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+
+import backtrader as bt
+
+from ccxtbt import CCXTOrder, CCXTReplayExchange, CCXTStore
+
+MINUTE = 60 * 1000
+
+
+class TradingStrategy(bt.Strategy):
+
+    def __init__(self):
+        self.sma = bt.indicators.SMA(self.data, period=3)
+        self.buffered = []
+        self.notified = []
+
+    def notify_order(self, order):
+        self.notified.append(order)
+
+    def next(self):
+        self.buffered.append(len(self.data.close.array))
+        if len(self) in (4, 6, 8):
+            self.buy(size=1)
+        elif len(self) in (5, 7):
+            self.sell(size=1)
+
+
+class LimitStrategy(bt.Strategy):
+    '''Sell limit orders filled on a later bar, notified Created then
+    Completed'''
+
+    def __init__(self):
+        self.refs = []
+
+    def notify_order(self, order):
+        if order.status == order.Completed:
+            self.refs.append(order.ref)
+
+    def next(self):
+        if len(self) % 2 == 0:
+            self.sell(size=1, price=self.data.close[0] + 1.5, exectype=bt.Order.Limit)
+
+
+class TestMemoryBounds(unittest.TestCase):
+
+    def setUp(self):
+        CCXTStore._singleton = None
+
+    def test_bounded_live_session(self):
+        rows = [[i * MINUTE, 100.0 + i, 101.0 + i, 99.0 + i, 100.5 + i, 1.0] for i in range(30)]
+        exchange = CCXTReplayExchange({('BTC/USDT', '1m'): rows}, speed=3000,
+                                      latency=0.05, start=10 * MINUTE)
+        store = CCXTStore(exchange=exchange, currency='USDT', config={'secret': ''}, retries=1)
+
+        cerebro = bt.Cerebro(quicknotify=True)
+        cerebro.setbroker(store.getbroker(compact_orders=True, order_history=2))
+        cerebro.adddata(store.getdata(dataname='BTC/USDT', timeframe=bt.TimeFrame.Minutes,
+                                      compression=1, ohlcv_limit=5, maxbars=5))
+        cerebro.addstrategy(TradingStrategy)
+        strategy = cerebro.run()[0]
+
+        self.assertGreater(len(strategy), 10)
+        # the lines are circular buffers of maxbars bars
+        self.assertLessEqual(max(strategy.buffered), 5)
+
+        # five orders completed, only the last two are still referenced
+        self.assertEqual(len(strategy.notified), 5)
+        self.assertEqual(strategy._orders, strategy.notified[-2:])
+        for order in strategy.notified:
+            self.assertEqual(set(order.ccxt_order), set(CCXTOrder.compact_keys))
+            self.assertEqual(order.ccxt_order['status'], 'closed')
+
+    def test_orders_notified_twice(self):
+        rows = [[i * MINUTE, 100.0 + i, 101.0 + i, 99.0 + i, 100.5 + i, 1.0] for i in range(40)]
+        exchange = CCXTReplayExchange({('BTC/USDT', '1m'): rows}, speed=3000,
+                                      latency=0.05, start=10 * MINUTE)
+        store = CCXTStore(exchange=exchange, currency='USDT', config={'secret': ''}, retries=1)
+
+        cerebro = bt.Cerebro(quicknotify=True)
+        cerebro.setbroker(store.getbroker(order_history=2))
+        cerebro.adddata(store.getdata(dataname='BTC/USDT', timeframe=bt.TimeFrame.Minutes,
+                                      compression=1, ohlcv_limit=5))
+        cerebro.addstrategy(LimitStrategy)
+        strategy = cerebro.run()[0]
+
+        self.assertGreater(len(strategy.refs), 5)
+        # every notification of the evicted orders is dropped
+        open_refs = set(o.ref for o in strategy.broker.open_orders)
+        self.assertEqual(set(o.ref for o in strategy._orders),
+                         set(strategy.refs[-2:]) | open_refs)
+        self.assertLessEqual(len(strategy._orders), 2 * (2 + len(open_refs)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,243 @@
+import datetime
+import unittest
+from unittest import mock
+
+import backtrader as bt
+
+from ccxtbt import CCXTPaperBroker, CCXTReplayExchange, CCXTStore
+
+MINUTE = 60 * 1000
+
+
+class PartialExchange(CCXTReplayExchange):
+    '''Fills half of a limit order of more than two units, then lets it
+    rest. Canceling it fills ``late_fill`` more first, as if filled between
+    the last poll and the cancel. Without ``trades`` the orders carry no
+    fills, like on futures markets'''
+
+    late_fill = 0.0
+    trades = True
+
+    def _partial(self, order, amount, price):
+        order['filled'] += amount
+        order['remaining'] -= amount
+        order['cost'] += amount * price
+        order['average'] = order['cost'] / order['filled']
+        order['trades'].append({
+            'id': '%s-%d' % (order['id'], len(order['trades']) + 1), 'order': order['id'],
+            'symbol': order['symbol'], 'side': order['side'], 'amount': amount, 'price': price,
+            'cost': amount * price, 'timestamp': self.milliseconds(),
+            'datetime': self.iso8601(self.milliseconds()), 'fee': None,
+        })
+
+    def _fill(self, order, price):
+        if order['type'] == 'limit' and order['amount'] > 2:
+            self._partial(order, order['amount'] / 2, price)
+            order['partial'] = True
+        else:
+            super(PartialExchange, self)._fill(order, price)
+
+    def _match(self, order):
+        if not order.get('partial'):
+            super(PartialExchange, self)._match(order)
+
+    def _strip(self, order):
+        return order if self.trades else dict(order, trades=[])
+
+    def fetch_order(self, id, symbol=None, params={}):
+        return self._strip(super(PartialExchange, self).fetch_order(id, symbol, params))
+
+    def create_order(self, symbol, type, side, amount, price=None, params={}):
+        return self._strip(super(PartialExchange, self).create_order(symbol, type, side, amount,
+                                                                     price, params))
+
+    def cancel_order(self, id, symbol=None, params={}):
+        order = self.orders[id]
+        if order['status'] == 'open' and self.late_fill:
+            self._partial(order, self.late_fill, order['price'])
+        return self._strip(super(PartialExchange, self).cancel_order(id, symbol, params))
+
+
+class PartialStrategy(bt.Strategy):
+    '''Reprices a sell limit order once the exchange partly filled it'''
+
+    params = (('exchange', None),)
+
+    def __init__(self):
+        self.order = None
+        self.modified = False
+
+    def next(self):
+        if len(self) == 2:
+            self.order = self.sell(size=4, price=self.data.close[0] + 1.5,
+                                   exectype=bt.Order.Limit)
+        elif self.order is not None and not self.modified:
+            if self.p.exchange.orders[self.order.ccxt_order['id']]['filled']:
+                self.modified = True
+                self.broker.modify(self.order, price=self.data.close[0] - 5)
+
+
+class AmendStrategy(bt.Strategy):
+    '''Reprices a sell limit order at the market once partly filled'''
+
+    def __init__(self):
+        self.order = None
+        self.modified = False
+
+    def next(self):
+        if len(self) == 2:
+            self.order = self.sell(size=4, price=self.data.close[0] + 1.5,
+                                   exectype=bt.Order.Limit)
+        elif self.order is not None and self.order.executed.size and not self.modified:
+            self.modified = self.broker.modify(self.order, price=self.data.close[0] - 5)
+
+
+class RepriceStrategy(bt.Strategy):
+
+    def __init__(self):
+        self.order = None
+        self.modified = None
+        self.notified = []
+
+    def notify_order(self, order):
+        self.notified.append((order.ref, order.getstatusname(), order.executed.size,
+                              order.executed.price))
+
+    def next(self):
+        if len(self) == 2:
+            self.order = self.buy(size=1, price=self.data.close[0] - 50, exectype=bt.Order.Limit)
+        elif len(self) == 4:
+            # reprice above the market, filled on the next bar
+            self.modified = self.broker.modify(self.order, price=self.data.close[0] + 1)
+
+
+class TestModify(unittest.TestCase):
+
+    def setUp(self):
+        CCXTStore._singleton = None
+
+    def tearDown(self):
+        CCXTStore._singleton = None
+
+    def run_strategy(self, edit):
+        rows = [[i * MINUTE, 100.0 + i, 101.0 + i, 99.0 + i, 100.5 + i, 1.0] for i in range(1, 21)]
+        exchange = CCXTReplayExchange({('BTC/USDT', '1m'): rows}, start=21 * MINUTE)
+        store = CCXTStore(exchange=exchange, currency='USDT', config={}, retries=1)
+        broker = CCXTPaperBroker()
+        if not edit:
+            broker.engine.has = lambda feature, native=False: False
+
+        cerebro = bt.Cerebro()
+        cerebro.setbroker(broker)
+        cerebro.adddata(store.getdata(dataname='BTC/USDT', timeframe=bt.TimeFrame.Minutes,
+                                      compression=1, historical=True, ohlcv_limit=50,
+                                      fromdate=datetime.datetime(1970, 1, 1)))
+        cerebro.addstrategy(RepriceStrategy)
+        strategy = cerebro.run()[0]
+
+        # one backtrader order, filled at the open after the repricing
+        self.assertIs(strategy.modified, strategy.order)
+        ref = strategy.order.ref
+        self.assertEqual(strategy.notified, [(ref, 'Created', 0.0, 0.0),
+                                             (ref, 'Completed', 1.0, 105.0)])
+        self.assertEqual(strategy.order.price, 105.5)
+        return broker.engine
+
+    def test_native_edit(self):
+        engine = self.run_strategy(edit=True)
+        self.assertEqual([o['status'] for o in engine.orders.values()], ['closed'])
+
+    def test_cancel_replace(self):
+        engine = self.run_strategy(edit=False)
+        self.assertEqual([o['status'] for o in engine.orders.values()], ['canceled', 'closed'])
+
+    def run_partial(self, edit, late_fill=0.0, trades=True):
+        rows = [[i * MINUTE, 100.0 + i, 101.0 + i, 99.0 + i, 100.5 + i, 1.0] for i in range(40)]
+        exchange = PartialExchange({('BTC/USDT', '1m'): rows}, speed=3000, latency=0.05,
+                                   start=10 * MINUTE)
+        exchange.has = dict(exchange.has, editOrder=edit)
+        exchange.late_fill = late_fill
+        exchange.trades = trades
+        store = CCXTStore(exchange=exchange, currency='USDT', config={'secret': ''}, retries=1)
+
+        cerebro = bt.Cerebro(quicknotify=True)
+        cerebro.setbroker(store.getbroker())
+        cerebro.adddata(store.getdata(dataname='BTC/USDT', timeframe=bt.TimeFrame.Minutes,
+                                      compression=1, ohlcv_limit=5))
+        cerebro.addstrategy(PartialStrategy, exchange=exchange)
+        strategy = cerebro.run()[0]
+
+        self.assertTrue(strategy.modified)
+        self.assertEqual(strategy.order.getstatusname(), 'Completed')
+        old, new = exchange.orders.values()
+        self.assertEqual(old['status'], 'canceled')
+        self.assertEqual(new['status'], 'closed')
+        # the broker executed exactly what the exchange filled
+        self.assertEqual(-strategy.order.executed.size, old['filled'] + new['filled'])
+        return strategy.order, old, new
+
+    def test_emulated_edit_partly_filled(self):
+        # ccxt's emulated edit resends the full amount, cancel-replace is used
+        order, old, new = self.run_partial('emulated', late_fill=1.0, trades=False)
+        self.assertEqual((old['filled'], new['amount']), (3.0, 1.0))
+        self.assertEqual(order.executed.size, -4.0)  # not overfilled
+
+    def test_native_edit_partly_filled(self):
+        # the edit replaces the order, the fill before it is not lost
+        order, old, new = self.run_partial(True, late_fill=1.0)
+        self.assertNotEqual(old['id'], new['id'])
+        self.assertEqual((old['filled'], new['amount']), (3.0, 2.0))
+        self.assertEqual(order.executed.size, -5.0)
+
+    def run_amend(self, **kwargs):
+        # the paper engine amends in place, under the same id
+        rows = [[i * MINUTE, 100.0 + i, 101.0 + i, 99.0 + i, 100.5 + i, 1.0] for i in range(1, 31)]
+        exchange = CCXTReplayExchange({('BTC/USDT', '1m'): rows}, start=31 * MINUTE)
+        store = CCXTStore(exchange=exchange, currency='USDT', config={}, retries=1)
+        broker = CCXTPaperBroker(volume_ratio=0.5, **kwargs)
+        broker.engine.edit_order = mock.Mock(wraps=broker.engine.edit_order)
+
+        cerebro = bt.Cerebro()
+        cerebro.setbroker(broker)
+        cerebro.adddata(store.getdata(dataname='BTC/USDT', timeframe=bt.TimeFrame.Minutes,
+                                      compression=1, historical=True, ohlcv_limit=50,
+                                      fromdate=datetime.datetime(1970, 1, 1)))
+        cerebro.addstrategy(AmendStrategy)
+        strategy = cerebro.run()[0]
+
+        self.assertTrue(strategy.modified)
+        self.assertEqual(strategy.order.getstatusname(), 'Completed')
+        (engine_order,) = broker.engine.orders.values()
+        # not underfilled: the amount stays the total one
+        self.assertEqual(engine_order['amount'], 4.0)
+        self.assertEqual(strategy.order.executed.size, -4.0)
+        return [c[0][4] for c in broker.engine.edit_order.call_args_list]
+
+    def test_in_place_edit_partly_filled(self):
+        # learned from the answer: edited again with the total amount
+        self.assertEqual(self.run_amend(), [3.5, 4.0])
+
+    def test_in_place_edit_total_amount(self):
+        self.assertEqual(self.run_amend(edit_amount='total'), [4.0])
+
+    def test_reserved_cash(self):
+        rows = [[i * MINUTE, 100.0, 100.0, 100.0, 100.0, 1.0] for i in range(1, 5)]
+        exchange = CCXTReplayExchange({('BTC/USDT', '1m'): rows}, start=5 * MINUTE)
+        store = CCXTStore(exchange=exchange, currency='USDT', config={}, retries=1)
+        broker = store.getbroker()
+        store._cash, store._value = 50.0, 1000.0  # 100 locked by the order
+        data = mock.Mock(close=[100.0])
+        data.p.dataname = 'BTC/USDT'
+        order = mock.Mock(price=100.0, data=data)
+        order.isbuy.return_value = True
+        order.executed.remsize = 1.0
+
+        self.assertEqual(broker._reserved(order), 100.0)
+        self.assertFalse(broker.check_exchange_limit(data, 1.0, 100.0))
+        self.assertTrue(broker.check_exchange_limit(data, 1.0, 100.0, reserved=100.0))
+        order.isbuy.return_value = False
+        self.assertEqual(broker._reserved(order), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
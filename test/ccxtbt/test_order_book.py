@@ -0,0 +1,45 @@
+import unittest
+
+from ccxtbt import CCXTOrderBook
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+@unittest.skipIf(numpy is None, 'numpy is not installed')
+class TestOrderBook(unittest.TestCase):
+
+    def setUp(self):
+        self.book = CCXTOrderBook(depth=3)
+        self.book.update({'bids': [[10.0, 1.0], [9.0, 2.0], [8.0, 3.0], [7.0, 4.0]],
+                          'asks': [[11.0, 1.0], [12.0, 1.0, 5]],
+                          'timestamp': 1000, 'nonce': None})
+
+    def levels(self, side):
+        array, n = (self.book.bids, self.book.nbids) if side == 'bids' else (self.book.asks, self.book.nasks)
+        return array[:n].tolist()
+
+    def test_snapshot_is_truncated_to_depth(self):
+        self.assertEqual(self.levels('bids'), [[10.0, 1.0], [9.0, 2.0], [8.0, 3.0]])
+        self.assertEqual(self.levels('asks'), [[11.0, 1.0], [12.0, 1.0]])
+        self.assertEqual((self.book.best_bid(), self.book.best_ask()), (10.0, 11.0))
+
+    def test_diffs(self):
+        arrays = (self.book.bids, self.book.asks)
+        self.book.apply_diff(bids=[[9.5, 5.0], [8.0, 0.0]], asks=[[11.0, 0.0], [13.0, 2.0], [12.0, 4.0]])
+
+        self.assertEqual(self.levels('bids'), [[10.0, 1.0], [9.5, 5.0], [9.0, 2.0]])
+        self.assertEqual(self.levels('asks'), [[12.0, 4.0], [13.0, 2.0]])
+        # arrays are updated in place
+        self.assertIs(self.book.bids, arrays[0])
+        self.assertIs(self.book.asks, arrays[1])
+
+    def test_imbalance(self):
+        self.assertAlmostEqual(self.book.imbalance(), (6.0 - 2.0) / 8.0)
+        self.assertAlmostEqual(self.book.imbalance(levels=1), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,171 @@
+import datetime
+import unittest
+from unittest import mock
+
+import backtrader as bt
+import ccxt
+
+from ccxtbt import CCXTOrderScheduler, CCXTPaperBroker, CCXTReplayExchange, CCXTStore
+
+MINUTE = 60 * 1000
+
+
+class Order(object):
+
+    def __init__(self, ref):
+        self.ref = ref
+
+
+class BurstStrategy(bt.Strategy):
+
+    def __init__(self):
+        self.orders = []
+
+    def next(self):
+        if len(self) == 2:
+            price = self.data.close[0] - 50
+            self.orders = [self.buy(size=1, price=price, exectype=bt.Order.Limit)
+                           for _ in range(3)]
+            self.cancel(self.orders[2])  # still queued
+        elif len(self) == 3:
+            self.cancel(self.orders[0])
+            self.orders.append(self.buy(size=1))
+
+
+class ModifyStrategy(bt.Strategy):
+
+    def __init__(self):
+        self.order = None
+
+    def next(self):
+        if len(self) == 2:
+            self.order = self.buy(size=1, price=self.data.close[0] - 50, exectype=bt.Order.Limit)
+            # both wait for the budget, the second one replacing the first
+            self.broker.modify(self.order, price=self.data.close[0] - 40)
+            self.broker.modify(self.order, price=self.data.close[0] - 30)
+
+
+class TestOrderScheduler(unittest.TestCase):
+
+    def setUp(self):
+        CCXTStore._singleton = None
+
+    def tearDown(self):
+        CCXTStore._singleton = None
+
+    def test_priorities_and_budget(self):
+        now = [0.0]
+        scheduler = CCXTOrderScheduler(2, 1.0, clock=lambda: now[0])
+        entry, other, canceled, reduce_ = Order(1), Order(2), Order(3), Order(4)
+        scheduler.push(scheduler.ENTRY, ('send', entry, None))
+        scheduler.push(scheduler.ENTRY, ('send', other, None))
+        scheduler.push(scheduler.CANCEL, ('cancel', canceled))
+        self.assertFalse(scheduler.push(scheduler.CANCEL, ('cancel', canceled)))
+        scheduler.push(scheduler.REDUCE, ('send', reduce_, None))
+        self.assertEqual(len(scheduler), 4)
+
+        self.assertEqual([scheduler.pop()[1] for _ in range(2)], [canceled, reduce_])
+        self.assertIsNone(scheduler.pop())  # out of budget
+
+        now[0] = 1.0
+        self.assertTrue(scheduler.discard(entry))
+        self.assertEqual(scheduler.pop()[1], other)
+        self.assertIsNone(scheduler.pop())  # the discarded send is dropped
+        self.assertEqual(len(scheduler), 0)
+
+        scheduler.pause()
+        self.assertEqual(scheduler.budget(), 0)
+        now[0] = 2.5
+        self.assertEqual(scheduler.budget(), 2)
+
+    def test_costs_and_replace(self):
+        now = [0.0]
+        scheduler = CCXTOrderScheduler(2, 1.0, clock=lambda: now[0])
+        order, other = Order(1), Order(2)
+        scheduler.push(scheduler.ENTRY, ('send', other, None))
+        scheduler.push(scheduler.ENTRY, ('modify', order, 1.0, 10.0, 2), cost=2)
+        self.assertFalse(scheduler.push(scheduler.ENTRY, ('modify', order, 1.0, 11.0, 2), cost=2))
+        newer = ('modify', order, 1.0, 12.0, 2)
+        self.assertTrue(scheduler.push(scheduler.ENTRY, newer, cost=2, replace=True))
+        self.assertEqual(len(scheduler), 2)
+
+        self.assertEqual(scheduler.pop()[1], other)
+        self.assertIsNone(scheduler.pop())  # two requests, one left in the budget
+        now[0] = 1.0
+        self.assertIs(scheduler.pop(), newer)
+        self.assertEqual(scheduler.budget(), 0)
+        self.assertIsNone(scheduler.pop())
+        self.assertEqual(scheduler.queue, [])  # the replaced one is dropped
+
+    def test_throttled_actions_requeued(self):
+        exchange = CCXTReplayExchange({('BTC/USDT', '1m'): [[0, 1.0, 1.0, 1.0, 1.0, 1.0]]})
+        store = CCXTStore(exchange=exchange, currency='USDT', config={}, retries=3)
+        exchange.fetch_ohlcv = mock.Mock(side_effect=ccxt.RateLimitExceeded('429'))
+        with mock.patch('time.sleep'):
+            with store.raising(ccxt.DDoSProtection, ccxt.RateLimitExceeded):
+                self.assertRaises(ccxt.RateLimitExceeded, store.fetch_ohlcv, 'BTC/USDT', '1m', 0, 1)
+            self.assertEqual(exchange.fetch_ohlcv.call_count, 1)  # left to the scheduler
+
+            self.assertRaises(ccxt.RateLimitExceeded, store.fetch_ohlcv, 'BTC/USDT', '1m', 0, 1)
+            self.assertEqual(exchange.fetch_ohlcv.call_count, 4)
+
+    def test_queued_modify(self):
+        rows = [[i * MINUTE, 100.0 + i, 101.0 + i, 99.0 + i, 100.5 + i, 1.0] for i in range(1, 11)]
+        exchange = CCXTReplayExchange({('BTC/USDT', '1m'): rows}, start=11 * MINUTE)
+        store = CCXTStore(exchange=exchange, currency='USDT', config={}, retries=1)
+        broker = CCXTPaperBroker(order_rate=(1, 60.0))
+
+        cerebro = bt.Cerebro()
+        cerebro.setbroker(broker)
+        data = store.getdata(dataname='BTC/USDT', timeframe=bt.TimeFrame.Minutes,
+                             compression=1, historical=True, ohlcv_limit=50,
+                             fromdate=datetime.datetime(1970, 1, 1))
+        cerebro.adddata(data)
+        broker.scheduler.clock = lambda: round(data.datetime[0] * 86400.0)
+        bars = []
+        edit_order = broker.engine.edit_order
+
+        def edit(*args):
+            bars.append(len(data))
+            return edit_order(*args)
+
+        broker.engine.edit_order = edit
+        cerebro.addstrategy(ModifyStrategy)
+        strategy = cerebro.run()[0]
+
+        # sent a minute after the order, with the price of the last call
+        self.assertEqual(bars, [3])
+        self.assertEqual(broker.engine.orders['1']['price'], 72.5)
+        self.assertTrue(strategy.order.alive())
+
+    def test_broker(self):
+        rows = [[i * MINUTE, 100.0 + i, 101.0 + i, 99.0 + i, 100.5 + i, 1.0] for i in range(1, 21)]
+        exchange = CCXTReplayExchange({('BTC/USDT', '1m'): rows}, start=21 * MINUTE)
+        store = CCXTStore(exchange=exchange, currency='USDT', config={}, retries=1)
+        # one action per minute of bar time
+        broker = CCXTPaperBroker(order_rate=(1, 60.0))
+
+        cerebro = bt.Cerebro()
+        cerebro.setbroker(broker)
+        data = store.getdata(dataname='BTC/USDT', timeframe=bt.TimeFrame.Minutes,
+                             compression=1, historical=True, ohlcv_limit=50,
+                             fromdate=datetime.datetime(1970, 1, 1))
+        cerebro.adddata(data)
+        broker.scheduler.clock = lambda: round(data.datetime[0] * 86400.0)
+        cerebro.addstrategy(BurstStrategy)
+        strategy = cerebro.run()[0]
+
+        first, second, dropped, market = strategy.orders
+        self.assertEqual([o.getstatusname() for o in (first, dropped, market)],
+                         ['Canceled', 'Canceled', 'Completed'])
+        self.assertTrue(second.alive())
+        # the dropped order never left, the cancel went before the market order
+        self.assertEqual([(o['id'], o['type'], o['status']) for o in broker.engine.orders.values()],
+                         [('1', 'limit', 'canceled'), ('2', 'limit', 'open'),
+                          ('3', 'market', 'closed')])
+        self.assertEqual(market.executed.price, 106.0)
+        self.assertEqual(len(broker.scheduler), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
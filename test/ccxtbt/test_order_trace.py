@@ -0,0 +1,81 @@
+import datetime
+import itertools
+import unittest
+
+import backtrader as bt
+
+from ccxtbt import CCXTPaperBroker, CCXTReplayExchange, CCXTStore, LatencyHistogram
+
+MINUTE = 60 * 1000
+
+
+class TraceStrategy(bt.Strategy):
+
+    def __init__(self):
+        self.orders = []
+
+    def next(self):
+        if len(self) == 2:
+            self.orders = [self.buy(size=1),
+                           self.buy(size=1, price=self.data.close[0] - 50,
+                                    exectype=bt.Order.Limit)]
+        elif len(self) == 4:
+            self.cancel(self.orders[1])
+
+
+class TestOrderTrace(unittest.TestCase):
+
+    def setUp(self):
+        CCXTStore._singleton = None
+
+    def tearDown(self):
+        CCXTStore._singleton = None
+
+    def test_histogram(self):
+        histogram = LatencyHistogram(bounds=(0.01, 0.1, 1.0))
+        for seconds in (0.005, 0.05, 0.05, 0.5, 5.0):
+            histogram.add(seconds)
+        self.assertEqual(histogram.counts, [1, 2, 1, 1])
+        self.assertEqual(histogram.percentile(50), 0.1)
+        self.assertEqual(histogram.percentile(99), float('inf'))
+        self.assertAlmostEqual(histogram.snapshot()['mean'], 1.121)
+
+    def test_lifecycle(self):
+        rows = [[i * MINUTE, 100.0 + i, 101.0 + i, 99.0 + i, 100.5 + i, 1.0] for i in range(1, 21)]
+        exchange = CCXTReplayExchange({('BTC/USDT', '1m'): rows}, start=21 * MINUTE)
+        store = CCXTStore(exchange=exchange, currency='USDT', config={}, retries=1)
+        broker = CCXTPaperBroker()
+        broker.tracer.clock = itertools.count().__next__  # one tick per event
+
+        cerebro = bt.Cerebro()
+        cerebro.setbroker(broker)
+        cerebro.adddata(store.getdata(dataname='BTC/USDT', timeframe=bt.TimeFrame.Minutes,
+                                      compression=1, historical=True, ohlcv_limit=50,
+                                      fromdate=datetime.datetime(1970, 1, 1)))
+        cerebro.addstrategy(TraceStrategy)
+        strategy = cerebro.run()[0]
+
+        market, limit = strategy.orders
+        trace = broker.tracer.trace(market)
+        stages = sorted(trace.stages, key=trace.stages.get)
+        self.assertEqual(stages, ['submit', 'send', 'ack', 'completed', 'notified'])
+        self.assertEqual(len(trace.fills), 1)
+        self.assertTrue(trace.stages['ack'] < trace.fills[0] < trace.stages['completed'])
+        # the paper engine fills on the next bar
+        self.assertEqual(trace.exchange['fills'][0] - trace.exchange['created'], MINUTE)
+
+        trace = broker.tracer.trace(limit)
+        self.assertIn('canceled', trace.stages)
+        self.assertEqual(trace.fills, [])
+
+        histograms = broker.tracer.snapshot()
+        self.assertEqual(list(histograms), ['BTC/USDT market'])
+        spans = histograms['BTC/USDT market']
+        self.assertEqual(sorted(spans), ['ack', 'completed', 'exchange_fill', 'first_fill',
+                                         'notified', 'queued'])
+        self.assertEqual(spans['exchange_fill']['count'], 1)
+        self.assertEqual(spans['exchange_fill']['p50'], 60.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
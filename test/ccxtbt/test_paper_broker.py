@@ -0,0 +1,132 @@
+import datetime
+import inspect
+import unittest
+from unittest import mock
+
+import backtrader as bt
+
+from ccxtbt import CCXTBroker, CCXTPaperBroker, CCXTReplayExchange, CCXTStore
+
+MINUTE = 60 * 1000
+
+
+class PaperStrategy(bt.Strategy):
+
+    def __init__(self):
+        self.notified = []
+        self.trades = []
+
+    def notify_order(self, order):
+        self.notified.append((len(self), order.ccxt_order['id'], order.getstatusname()))
+
+    def notify_trade(self, trade):
+        if trade.isclosed:
+            self.trades.append((trade.pnl, trade.pnlcomm))
+
+    def next(self):
+        if len(self) == 2:
+            self.buy(size=2)
+        elif len(self) == 5:
+            # above the market, filled as maker in two bars of volume 2 * 0.5
+            self.sell(size=2, price=self.data.close[0] + 3, exectype=bt.Order.Limit)
+
+
+class TestPaperBroker(unittest.TestCase):
+
+    def setUp(self):
+        CCXTStore._singleton = None
+
+    def tearDown(self):
+        CCXTStore._singleton = None
+
+    def test_matching(self):
+        rows = [[i * MINUTE, 100.0 + i, 101.0 + i, 99.0 + i, 100.5 + i, 2.0] for i in range(1, 21)]
+        exchange = CCXTReplayExchange({('BTC/USDT', '1m'): rows}, start=21 * MINUTE)
+        markets = exchange.load_markets()
+        markets['BTC/USDT'].update(maker=0.001, taker=0.002)
+
+        store = CCXTStore(exchange=exchange, currency='USDT', config={}, retries=1)
+        broker = CCXTPaperBroker(cash=1000.0, volume_ratio=0.5)
+        self.assertIs(CCXTStore.BrokerCls, CCXTBroker)
+
+        cerebro = bt.Cerebro()
+        cerebro.setbroker(broker)
+        cerebro.adddata(store.getdata(dataname='BTC/USDT', timeframe=bt.TimeFrame.Minutes,
+                                      compression=1, historical=True, ohlcv_limit=50,
+                                      fromdate=datetime.datetime(1970, 1, 1)))
+        cerebro.addstrategy(PaperStrategy)
+        strategy = cerebro.run()[0]
+
+        # the market buy fills at the next opens, over two bars of volume
+        self.assertEqual(strategy.notified, [
+            (3, '1', 'Created'), (4, '1', 'Completed'),
+            (6, '2', 'Created'), (9, '2', 'Completed'),
+        ])
+        engine = broker.engine
+        self.assertEqual(exchange.stats['create_order'], 0)
+        self.assertEqual(engine.holdings['BTC/USDT'], 0.0)
+
+        # the limit sell at 105.5 + 3 rests until the 108 bar trades through
+        # it, the rest still fills at its price as maker when the 109 bar
+        # opens above it
+        trades = engine.orders['2']['trades']
+        self.assertEqual([(t['price'], t['takerOrMaker']) for t in trades],
+                         [(108.5, 'maker'), (108.5, 'maker')])
+
+        bought = 103.0 + 104.0
+        sold = 108.5 + 108.5
+        fees = bought * 0.002 + sold * 0.001
+        self.assertAlmostEqual(engine.cash, 1000.0 - bought + sold - fees)
+        self.assertAlmostEqual(broker.getvalue(), engine.cash)
+
+        # the fees are the commission of the trade
+        self.assertEqual(len(strategy.trades), 1)
+        pnl, pnlcomm = strategy.trades[0]
+        self.assertAlmostEqual(pnl, sold - bought)
+        self.assertAlmostEqual(pnlcomm, sold - bought - fees)
+
+    def test_broker_params(self):
+        exchange = CCXTReplayExchange({('BTC/USDT', '1m'): [[0, 1.0, 1.0, 1.0, 1.0, 1.0]]})
+        CCXTStore(exchange=exchange, currency='USDT', config={}, retries=1)
+        # the params of CCXTBroker are not passed on to the store
+        broker = CCXTPaperBroker(broker_mapping={'order_types': {bt.Order.Market: 'market'}},
+                                 debug=False, compact_orders=True, order_history=10,
+                                 state=None, sync_balance=False, order_rate=(10, 1.0),
+                                 client_order_ids=False, cash=500.0)
+        self.assertEqual(broker.order_types, {bt.Order.Market: 'market'})
+        self.assertTrue(broker.compact_orders)
+        self.assertEqual(broker.order_history, 10)
+        self.assertFalse(broker.sync_balance)
+        self.assertIsNotNone(broker.scheduler)
+        self.assertFalse(broker.client_order_ids)
+        self.assertEqual(broker.getcash(), 500.0)
+
+        params = set(inspect.signature(CCXTBroker.__init__).parameters)
+        self.assertLessEqual(params, set(inspect.signature(CCXTPaperBroker.__init__).parameters))
+
+    def test_fee_conversion(self):
+        exchange = CCXTReplayExchange({('BTC/USDT', '1m'): [[0, 1.0, 1.0, 1.0, 1.0, 1.0]],
+                                       ('BNB/USDT', '1m'): [[0, 1.0, 1.0, 1.0, 1.0, 1.0]]})
+        store = CCXTStore(exchange=exchange, currency='USDT', config={}, retries=1)
+        broker = CCXTPaperBroker()
+        order = mock.Mock(ccxt_order={'type': 'limit'})
+        order.data.p.dataname = 'BTC/USDT'
+
+        fill = {'fee': {'cost': 2.0, 'currency': 'USDT'}}
+        self.assertEqual(broker._fill_fee(order, fill, 1.0, 50000.0), 2.0)
+        fill = {'fee': {'cost': 0.001, 'currency': 'BTC'}}
+        self.assertAlmostEqual(broker._fill_fee(order, fill, 1.0, 50000.0), 50.0)
+
+        with mock.patch.object(store, 'fetch_ticker', return_value={'last': 300.0}) as ticker:
+            fill = {'fees': [{'cost': 0.1, 'currency': 'BNB'}, {'cost': 0.1, 'currency': 'BNB'}]}
+            self.assertAlmostEqual(broker._fill_fee(order, fill, 1.0, 50000.0), 60.0)
+            self.assertEqual(ticker.call_count, 1)  # conversion rate cached
+
+        # no fee reported: maker rate of the market
+        broker.markets['BTC/USDT'].update(maker=0.001, taker=0.002)
+        self.assertAlmostEqual(broker._fill_fee(order, {}, 2.0, 100.0), 0.2)
+        self.assertAlmostEqual(broker._fill_fee(order, {'takerOrMaker': 'taker'}, 2.0, 100.0), 0.4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+
+import backtrader as bt
+
+from ccxtbt import CCXTProfiler, CCXTReplayExchange, CCXTStore
+
+MINUTE = 60 * 1000
+
+
+class ProfiledStrategy(bt.Strategy):
+
+    def __init__(self):
+        self.bars = 0
+
+    def next(self):
+        self.bars += 1
+
+
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self):
+        CCXTStore._singleton = None
+
+    def tearDown(self):
+        CCXTStore._singleton = None
+
+    def test_live_cycles(self):
+        rows = [[i * MINUTE, 100.0 + i, 101.0 + i, 99.0 + i, 100.5 + i, 1.0] for i in range(30)]
+        exchange = CCXTReplayExchange({('BTC/USDT', '1m'): rows}, speed=3000,
+                                      latency=0.05, start=10 * MINUTE)
+        store = CCXTStore(exchange=exchange, currency='USDT', config={}, retries=1)
+        path = os.path.join(tempfile.mkdtemp(), 'cycles.folded')
+
+        cerebro = bt.Cerebro(quicknotify=True)
+        cerebro.setbroker(store.getbroker())
+        cerebro.adddata(store.getdata(dataname='BTC/USDT', timeframe=bt.TimeFrame.Minutes,
+                                      compression=1, ohlcv_limit=5))
+        cerebro.addstrategy(ProfiledStrategy)
+        cerebro.addanalyzer(CCXTProfiler, _name='profiler', interval=None, sample=2,
+                            flamegraph=path)
+        strategy = cerebro.run()[0]
+
+        analysis = strategy.analyzers.profiler.get_analysis()
+        # every other cycle is profiled
+        self.assertEqual(analysis['cycles'], (strategy.bars + 1) // 2)
+        sections = analysis['sections']
+        for key in ('cycle;_load BTC/USDT;_fetch_ohlcv;fetch_ohlcv',
+                    'cycle;_load BTC/USDT;_fetch_ohlcv;limiter.sleep',
+                    'cycle;broker.next', 'cycle;strategy.next'):
+            self.assertIn(key, sections)
+        self.assertEqual(sections['cycle;strategy.next']['count'], analysis['cycles'])
+        load = sections['cycle;_load BTC/USDT']
+        self.assertLessEqual(load['self'], load['total'])
+        self.assertLessEqual(load['total'], sections['cycle']['total'])
+        self.assertIsNone(store.profiler)  # detached when the run stops
+
+        with open(path) as f:
+            stacks = dict(line.rsplit(' ', 1) for line in f.read().splitlines())
+        self.assertIn('cycle;_load BTC/USDT;_fetch_ohlcv;fetch_ohlcv', stacks)
+        self.assertTrue(all(int(v) > 0 for v in stacks.values()))
+        self.assertIn('strategy.next', strategy.analyzers.profiler.summary())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import datetime
+import unittest
+
+import backtrader as bt
+
+from ccxtbt import CCXTReplayExchange, CCXTStore
+
+MINUTE = 60 * 1000
+
+
+class ReplayStrategy(bt.Strategy):
+
+    def __init__(self):
+        self.bars = []
+        self.orders = []
+
+    def notify_order(self, order):
+        self.orders.append((order.getstatusname(), order.executed.size))
+
+    def next(self):
+        self.bars.append(self.data.datetime.datetime(0))
+        if len(self.bars) == 3:
+            self.buy(size=1)
+
+
+class TestReplay(unittest.TestCase):
+
+    def setUp(self):
+        CCXTStore._singleton = None
+
+    def test_live_path_under_virtual_clock(self):
+        rows = [[i * MINUTE, 100.0 + i, 101.0 + i, 99.0 + i, 100.5 + i, 1.0] for i in range(40)]
+        exchange = CCXTReplayExchange({('BTC/USDT', '1m'): rows}, speed=3000,
+                                      latency=0.05, start=10 * MINUTE)
+        store = CCXTStore(exchange=exchange, currency='USDT', config={'secret': ''}, retries=1)
+
+        cerebro = bt.Cerebro(quicknotify=True)
+        cerebro.setbroker(store.getbroker())
+        cerebro.adddata(store.getdata(dataname='BTC/USDT', timeframe=bt.TimeFrame.Minutes,
+                                      compression=1, ohlcv_limit=5))
+        cerebro.addstrategy(ReplayStrategy)
+        strategy = cerebro.run()[0]
+
+        # every candle from the first poll on is delivered once, up to the last one
+        steps = set(b - a for a, b in zip(strategy.bars, strategy.bars[1:]))
+        self.assertEqual(steps, {datetime.timedelta(minutes=1)})
+        self.assertEqual(strategy.bars[-1], datetime.datetime(1970, 1, 1, 0, 39))
+        self.assertEqual(strategy.orders, [('Completed', 1.0)])
+        self.assertEqual(exchange.stats['create_order'], 1)
+        self.assertEqual(exchange.balances['BTC'], 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
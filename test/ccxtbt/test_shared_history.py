@@ -0,0 +1,113 @@
+import datetime
+import os
+import pickle
+import unittest
+
+import backtrader as bt
+import numpy as np
+
+from ccxtbt import CCXTReplayExchange, CCXTSharedFeed, CCXTSharedHistory, CCXTStore
+
+MINUTE = 60 * 1000
+
+
+class SmaCross(bt.Strategy):
+    params = (('period', 3),)
+
+    def __init__(self):
+        self.sma = bt.indicators.SMA(self.data.close, period=self.p.period)
+
+    def next(self):
+        if not self.position and self.data.close[0] > self.sma[0]:
+            self.buy(size=1)
+        elif self.position and self.data.close[0] < self.sma[0]:
+            self.close()
+
+
+class SharedView(bt.Analyzer):
+    '''How the running process sees the history'''
+
+    def stop(self):
+        array = self.data.p.dataname.array
+        self.rets = {'pid': os.getpid(), 'bars': len(self.data),
+                     'memmap': isinstance(array, np.memmap),
+                     'writeable': array.flags.writeable,
+                     'value': self.strategy.broker.getvalue()}
+
+    def get_analysis(self):
+        return self.rets
+
+
+class TestSharedHistory(unittest.TestCase):
+
+    def setUp(self):
+        CCXTStore._singleton = None
+
+    def tearDown(self):
+        CCXTStore._singleton = None
+
+    def history(self):
+        rows = [[i * MINUTE, 100.0 + i % 7, 101.0 + i % 7, 99.0 + i % 7, 100.5 + i % 5, 1.0]
+                for i in range(1, 61)]
+        exchange = CCXTReplayExchange({('BTC/USDT', '1m'): rows}, start=61 * MINUTE)
+        store = CCXTStore(exchange=exchange, currency='USDT', config={}, retries=1)
+        feed = store.getdata(dataname='BTC/USDT', timeframe=bt.TimeFrame.Minutes,
+                             compression=1, historical=True, ohlcv_limit=50,
+                             fromdate=datetime.datetime(1970, 1, 1),
+                             todate=datetime.datetime(1970, 1, 1, 0, 50))
+        return CCXTSharedHistory.from_feed(feed), exchange
+
+    def test_pickle_reference(self):
+        history, exchange = self.history()
+        with history:
+            self.assertEqual(len(history), 50)  # up to todate
+            self.assertEqual(history.array[-1, 0], 50 * MINUTE)
+
+            payload = pickle.dumps(history)
+            self.assertLess(len(payload), 200)  # the path, not the candles
+            attached = pickle.loads(payload)
+            self.assertIsInstance(attached.array, np.memmap)
+            self.assertFalse(attached.array.flags.writeable)
+            np.testing.assert_array_equal(attached.array, history.array)
+            attached.close()
+            self.assertTrue(os.path.exists(history.path))  # only the owner removes it
+        self.assertFalse(os.path.exists(history.path))
+
+    def test_needs_fromdate(self):
+        rows = [[i * MINUTE, 100.0, 101.0, 99.0, 100.5, 1.0] for i in range(1, 21)]
+        exchange = CCXTReplayExchange({('BTC/USDT', '1m'): rows}, start=21 * MINUTE)
+        store = CCXTStore(exchange=exchange, currency='USDT', config={}, retries=1)
+        feed = store.getdata(dataname='BTC/USDT', timeframe=bt.TimeFrame.Minutes,
+                             compression=1, historical=True)
+        with self.assertRaises(ValueError):
+            CCXTSharedHistory.from_feed(feed)
+        self.assertNotIn('fetch_ohlcv', exchange.stats)
+
+    def run_cerebro(self, history, **kwargs):
+        cerebro = bt.Cerebro(optreturn=False, **kwargs)
+        cerebro.adddata(CCXTSharedFeed(dataname=history, timeframe=bt.TimeFrame.Minutes,
+                                       fromdate=datetime.datetime(1970, 1, 1, 0, 5)))
+        cerebro.optstrategy(SmaCross, period=[2, 3, 4, 5])
+        cerebro.addanalyzer(SharedView, _name='view')
+        return sorted((run[0].p.period, run[0].analyzers.view.get_analysis())
+                      for run in cerebro.run(optdatas=False))
+
+    def test_optstrategy(self):
+        history, exchange = self.history()
+        fetched = exchange.stats['fetch_ohlcv']
+        with history:
+            serial = self.run_cerebro(history, maxcpus=1)
+            parallel = self.run_cerebro(history, maxcpus=2)
+        self.assertEqual(exchange.stats['fetch_ohlcv'], fetched)  # downloaded once
+
+        self.assertEqual([period for period, _ in parallel], [2, 3, 4, 5])
+        for (_, one), (_, view) in zip(serial, parallel):
+            self.assertEqual(view['bars'], 46)
+            self.assertEqual(view['value'], one['value'])
+            self.assertTrue(view['memmap'])
+            self.assertFalse(view['writeable'])
+        self.assertNotIn(os.getpid(), [view['pid'] for _, view in parallel])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import backtrader as bt
+
+from ccxtbt import CCXTReplayExchange, CCXTStateStore, CCXTStore
+
+MINUTE = 60 * 1000
+
+
+class FirstSession(bt.Strategy):
+
+    def __init__(self):
+        self.bars = []
+
+    def next(self):
+        self.bars.append(self.data.datetime.datetime(0))
+        if len(self.bars) == 3:
+            self.buy(size=1)
+            # fills 4 minutes later
+            self.sell(size=1, price=self.data.close[0] + 5, exectype=bt.Order.Limit)
+        elif len(self.bars) == 5:
+            self.env.runstop()
+
+
+class SecondSession(bt.Strategy):
+
+    def __init__(self):
+        self.bars = []
+        self.positions_seen = []
+        self.orders = []
+
+    def notify_order(self, order):
+        self.orders.append((order.ccxt_order['id'], order.getstatusname(), order.executed.size))
+
+    def next(self):
+        self.bars.append(self.data.datetime.datetime(0))
+        self.positions_seen.append(self.position.size)
+
+
+class TestState(unittest.TestCase):
+
+    def setUp(self):
+        CCXTStore._singleton = None
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'state.json')
+
+    def tearDown(self):
+        CCXTStore._singleton = None
+        shutil.rmtree(self.tmpdir)
+
+    def run_session(self, exchange, strategy):
+        CCXTStore._singleton = None
+        store = CCXTStore(exchange=exchange, currency='USDT', config={'secret': ''}, retries=1)
+        cerebro = bt.Cerebro(quicknotify=True)
+        cerebro.setbroker(store.getbroker(state=self.path))
+        cerebro.adddata(store.getdata(dataname='BTC/USDT', timeframe=bt.TimeFrame.Minutes,
+                                      compression=1, ohlcv_limit=5, state=self.path, state_bars=3))
+        cerebro.addstrategy(strategy)
+        return cerebro.run()[0]
+
+    def test_put_only_writes_changes(self):
+        state = CCXTStateStore(self.path)
+        state.put('a', {'b': 1})
+        os.remove(self.path)
+        state.put('a', {'b': 1})
+        self.assertFalse(os.path.exists(self.path))
+        state.put('a', {'b': 2})
+        self.assertEqual(CCXTStateStore(self.path).get('a'), {'b': 2})
+
+    def test_resume(self):
+        rows = [[i * MINUTE, 100.0 + i, 101.0 + i, 99.0 + i, 100.5 + i, 1.0] for i in range(40)]
+        exchange = CCXTReplayExchange({('BTC/USDT', '1m'): rows}, speed=3000,
+                                      latency=0.05, start=10 * MINUTE)
+
+        first = self.run_session(exchange, FirstSession)
+        saved = CCXTStateStore(self.path).get('broker')
+        self.assertEqual(saved['positions'], {'BTC/USDT': [1.0, saved['positions']['BTC/USDT'][1]]})
+        self.assertEqual([o['ccxt_order']['id'] for o in saved['orders']], ['2'])
+        tail = CCXTStateStore(self.path).get('feed:BTC/USDT:1m')['bars']
+        self.assertEqual(len(tail), 3)
+
+        second = self.run_session(exchange, SecondSession)
+
+        # the checkpointed candles come first, then the missed and live ones
+        self.assertEqual(second.bars[:3], first.bars[-3:])
+        steps = set((b - a).total_seconds() for a, b in zip(second.bars, second.bars[1:]))
+        self.assertEqual(steps, {60.0})
+
+        # the restored limit order is reconciled and closes the restored position
+        self.assertEqual(second.positions_seen[0], 1.0)
+        self.assertEqual(second.positions_seen[-1], 0.0)
+        self.assertEqual(second.orders, [('2', 'Completed', -1.0)])
+        self.assertEqual(CCXTStateStore(self.path).get('broker'), {'orders': [], 'positions': {}})
+
+
+if __name__ == '__main__':
+    unittest.main()
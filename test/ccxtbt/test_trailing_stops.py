@@ -0,0 +1,115 @@
+import datetime
+import random
+import unittest
+
+import backtrader as bt
+
+from ccxtbt import CCXTPaperBroker, CCXTReplayExchange, CCXTStore, CCXTTrailingStops
+
+MINUTE = 60 * 1000
+
+
+def close(i):
+    # up to 110 on bar 10, then down 2 per bar
+    return 100.0 + i if i <= 10 else 110.0 - 2 * (i - 10)
+
+
+class TrailStrategy(bt.Strategy):
+
+    def __init__(self):
+        self.orders = []
+
+    def next(self):
+        if len(self) == 2:
+            self.buy(size=2)
+        elif len(self) == 3:
+            self.orders = [
+                self.sell(size=1, exectype=bt.Order.StopTrail, trailamount=3),
+                self.sell(size=1, exectype=bt.Order.StopTrailLimit, price=self.data.close[0],
+                          plimit=self.data.close[0] - 5, trailpercent=0.1),
+                self.buy(size=1, exectype=bt.Order.StopTrail, trailamount=1),
+            ]
+            self.cancel(self.orders[2])
+
+
+class TestTrailingStops(unittest.TestCase):
+
+    def setUp(self):
+        CCXTStore._singleton = None
+
+    def tearDown(self):
+        CCXTStore._singleton = None
+
+    def test_books_match_naive_trailing(self):
+        rnd = random.Random(7)
+        stops = CCXTTrailingStops()
+        naive = {}  # stop -> [side, kind, trail, best price]
+        price = 100.0
+        for step in range(2000):
+            price = max(1.0, price + rnd.uniform(-1.0, 1.0))
+            high, low = price + rnd.uniform(0, 0.5), price - rnd.uniform(0, 0.5)
+            fired = dict(stops.update('X', high, low, price))
+
+            expected = {}
+            for stop, (side, kind, trail, best) in list(naive.items()):
+                if side == 'sell':
+                    trigger = best - trail if kind == 'amount' else best * (1 - trail)
+                    crossed = low <= trigger
+                else:
+                    trigger = best + trail if kind == 'amount' else best * (1 + trail)
+                    crossed = high >= trigger
+                if crossed:
+                    expected[stop] = trigger
+                    del naive[stop]
+                else:
+                    naive[stop][3] = max(best, price) if side == 'sell' else min(best, price)
+            self.assertEqual(sorted(fired), sorted(expected))
+            for stop, trigger in expected.items():
+                self.assertAlmostEqual(fired[stop], trigger)
+
+            if rnd.random() < 0.5:
+                side, kind = rnd.choice(['sell', 'buy']), rnd.choice(['amount', 'percent'])
+                trail = rnd.uniform(0.5, 3.0) if kind == 'amount' else rnd.uniform(0.005, 0.03)
+                stops.add('X', side, price, step, **{'trail' + kind: trail})
+                naive[step] = [side, kind, trail, price]
+            if naive and rnd.random() < 0.1:  # canceled
+                stop = rnd.choice(sorted(naive))
+                self.assertTrue(stops.remove('X', stop))
+                del naive[stop]
+
+        self.assertEqual(len(stops), len(naive))
+        self.assertFalse(stops.remove('X', -1))
+
+    def test_broker(self):
+        rows = [[i * MINUTE, close(i), close(i) + 0.5, close(i) - 0.5, close(i), 1.0]
+                for i in range(1, 21)]
+        exchange = CCXTReplayExchange({('BTC/USDT', '1m'): rows}, start=21 * MINUTE)
+        store = CCXTStore(exchange=exchange, currency='USDT', config={}, retries=1)
+        broker = CCXTPaperBroker()
+
+        cerebro = bt.Cerebro()
+        cerebro.setbroker(broker)
+        cerebro.adddata(store.getdata(dataname='BTC/USDT', timeframe=bt.TimeFrame.Minutes,
+                                      compression=1, historical=True, ohlcv_limit=50,
+                                      fromdate=datetime.datetime(1970, 1, 1)))
+        cerebro.addstrategy(TrailStrategy)
+        strategy = cerebro.run()[0]
+
+        amount, percent, canceled = strategy.orders
+        self.assertEqual([o.getstatusname() for o in strategy.orders],
+                         ['Completed', 'Completed', 'Canceled'])
+        # 110 - 3 crossed by the bar closing at 106, market sell at the next open
+        self.assertEqual(amount.executed.price, 104.0)
+        # 110 * 0.9 = 99 crossed by the bar closing at 98, limit 94 marketable
+        # at the next open
+        self.assertEqual(percent.executed.price, 96.0)
+        self.assertEqual(broker.getposition(strategy.data).size, 0.0)
+        # the canceled stop left its book
+        self.assertEqual(broker.trailing.books, {})
+        # only the triggered stops reached the exchange
+        self.assertEqual([(o['type'], o['side']) for o in broker.engine.orders.values()],
+                         [('market', 'buy'), ('market', 'sell'), ('limit', 'sell')])
+
+
+if __name__ == '__main__':
+    unittest.main()